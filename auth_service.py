@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+
+
+class AuthService:
+    """Вход пользователей с ограничением частоты попыток.
+
+    Проверка пароля через KDF дорогая, поэтому перед ней отсекаются:
+    - логины, заблокированные после серии неудач (экспоненциальная задержка);
+    - попытки сверх общего лимита проверок (token bucket на весь процесс);
+    - несуществующие логины из кэша отрицательных ответов (без хеширования).
+    Методы потокобезопасны и рассчитаны на вызов вне потока интерфейса.
+    """
+    MAX_TRACKED = 10000  # предел записей о логинах, чтобы перебор не раздувал память
+
+    def __init__(self, db, free_failures=3, base_delay=1.0, max_delay=300.0,
+                 rate=5.0, burst=10, negative_ttl=30.0, clock=time.monotonic):
+        self.db = db
+        self.free_failures = free_failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate  # проверок пароля в секунду в среднем
+        self.burst = burst
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = {}  # логин -> (число неудач подряд, заблокирован до)
+        self._unknown = {}  # несуществующий логин -> время истечения записи
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self.stats_counters = {'attempts': 0, 'success': 0, 'failed': 0, 'throttled': 0,
+                               'rate_limited': 0, 'unknown_cached': 0, 'hashes': 0}
+
+    def login(self, login, password):
+        """Возвращает (True, роль) или (False, сообщение об ошибке)"""
+        success, role_or_message, stale_hash = self.check_login(login, password)
+        if stale_hash is not None:
+            self.db.rehash_password(login, stale_hash, password)
+        return success, role_or_message
+
+    def check_login(self, login, password):
+        """Как login(), но ничего не пишет в базу. Третий элемент - устаревший хеш
+        пароля, который вызывающий должен перехешировать, иначе None"""
+        now = self.clock()
+        with self._lock:
+            self.stats_counters['attempts'] += 1
+            locked_for = self.locked_for(login, now)
+            if locked_for > 0:
+                self.stats_counters['throttled'] += 1
+                return False, f"Слишком много неудачных попыток. Повторите через {math.ceil(locked_for)} с", None
+            expires = self._unknown.get(login)
+            if expires is not None:
+                if expires > now:
+                    self.stats_counters['unknown_cached'] += 1
+                    self.register_failure(login, now)
+                    return False, "Неверный логин или пароль", None
+                del self._unknown[login]
+
+        record = self.db.get_password_record(login)
+        if record is None:
+            with self._lock:
+                if len(self._unknown) >= self.MAX_TRACKED:
+                    self.prune(now)
+                self._unknown[login] = now + self.negative_ttl
+                self.register_failure(login, now)
+            return False, "Неверный логин или пароль", None
+
+        with self._lock:
+            if not self.take_token(now):
+                self.stats_counters['rate_limited'] += 1
+                return False, "Слишком много попыток входа. Повторите позже", None
+            self.stats_counters['hashes'] += 1
+
+        role = self.db.verify_credentials(login, record, password, rehash=False)
+        with self._lock:
+            if role is None:
+                self.register_failure(login, self.clock())
+                return False, "Неверный логин или пароль", None
+            self._failures.pop(login, None)
+            self.stats_counters['success'] += 1
+        stored_password = record[0]
+        return True, role, stored_password if self.db.hasher.needs_rehash(stored_password) else None
+
+    def register(self, login, email, password, role='user'):
+        """Регистрация через Database.register_user; логин убирается из кэша несуществующих"""
+        result = self.db.register_user(login, email, password, role)
+        self.forget(login)
+        return result
+
+    def forget(self, login):
+        with self._lock:
+            self._unknown.pop(login, None)
+
+    def locked_for(self, login, now):
+        """Сколько секунд еще заблокирован логин (0, если не заблокирован)"""
+        failures = self._failures.get(login)
+        return max(0.0, failures[1] - now) if failures else 0.0
+
+    def register_failure(self, login, now):
+        self.stats_counters['failed'] += 1
+        if login not in self._failures and len(self._failures) >= self.MAX_TRACKED:
+            self.prune(now)
+        count = self._failures.get(login, (0, 0.0))[0] + 1
+        delay = 0.0
+        if count > self.free_failures:
+            delay = min(self.max_delay, self.base_delay * 2 ** (count - self.free_failures - 1))
+        self._failures[login] = (count, now + delay)
+
+    def prune(self, now):
+        """Удаляет истекшие записи; если их все равно слишком много, удаляет самые старые"""
+        self._unknown = {login: expires for login, expires in self._unknown.items() if expires > now}
+        self._failures = {login: entry for login, entry in self._failures.items() if entry[1] > now}
+        for table in (self._unknown, self._failures):
+            for login in list(table)[:max(0, len(table) - self.MAX_TRACKED // 2)]:
+                del table[login]
+
+    def take_token(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self.stats_counters, locked_logins=sum(
+                1 for _, until in self._failures.values() if until > self.clock()),
+                cached_unknown=len(self._unknown))
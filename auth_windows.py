@@ -3,6 +3,8 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                               QLabel, QLineEdit, QPushButton, QMessageBox)
 from PySide6.QtGui import QIcon
 from database import Database
+from auth_service import AuthService
+from query_executor import QueryExecutor
 import re
 
 # Общие стили для окон
@@ -32,6 +34,31 @@ COMMON_STYLES = """
     }
 """
 
+class DeferredWindow:
+    """Окно, которое создается фабрикой при первом обращении к get().
+    Главное окно так строится только после входа, а не при запуске."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.window = None
+
+    def get(self):
+        if self.window is None:
+            self.window = self.factory()
+        return self.window
+
+def resolve_window(window):
+    """Готовое окно: создает отложенное окно при необходимости"""
+    return window.get() if isinstance(window, DeferredWindow) else window
+
+def shared_database(main_window=None, db=None):
+    """Возвращает общий экземпляр базы: переданный явно или от главного окна"""
+    if db is not None:
+        return db
+    if main_window is not None and getattr(main_window, 'db', None) is not None:
+        return main_window.db
+    return Database()
+
 def is_valid_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -50,10 +77,16 @@ def is_valid_password(password):
 class LoginWindow(QMainWindow):
     logged_in = Signal(str)
 
-    def __init__(self, main_window=None):
+    def __init__(self, main_window=None, db=None, auth=None):
         super().__init__()
         self.main_window = main_window
-        self.db = Database()
+        self.db = shared_database(main_window, db)
+        # Один сервис на все окна, чтобы счетчики попыток не сбрасывались при переходах
+        self.auth = auth or AuthService(self.db)
+        # Проверка пароля (KDF) выполняется в фоновом потоке
+        self.auth_executor = QueryExecutor(self.db, self, max_threads=1)
+        self.auth_executor.finished.connect(self.on_login_checked)
+        self.auth_executor.failed.connect(self.on_login_failed)
         self.setWindowTitle("Авторизация")
         self.setFixedSize(400, 300)
         icon = QIcon("pineapple.ico")
@@ -113,25 +146,45 @@ class LoginWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, заполните все поля")
             return
             
-        role = self.db.check_credentials(login, password)
-        if role:
-            self.main_window.set_user(login, role)
-            self.main_window.show()  # Показываем главное окно
+        self.login_button.setEnabled(False)
+        self.pending_login = login
+        self.auth_executor.submit(self.auth.login, login, password)
+
+    def on_login_checked(self, result):
+        self.login_button.setEnabled(True)
+        success, role_or_message = result
+        if success:
+            main_window = resolve_window(self.main_window)
+            main_window.set_user(self.pending_login, role_or_message)
+            main_window.show()  # Показываем главное окно
             self.close()
         else:
-            QMessageBox.warning(self, "Ошибка", "Неверный логин или пароль")
+            QMessageBox.warning(self, "Ошибка", role_or_message)
+
+    def on_login_failed(self, message):
+        self.login_button.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Ошибка при входе: {message}")
 
     def show_register_window(self):
-        self.register_window = RegisterWindow(self.main_window)
+        self.register_window = RegisterWindow(self.main_window, self.db, self.auth)
         self.register_window.show()
         self.hide()
 
 
 class RegisterWindow(QMainWindow):
-    def __init__(self, main_window=None):
+    def __init__(self, main_window=None, db=None, auth=None):
         super().__init__()
         self.main_window = main_window
-        self.db = Database()
+        self.db = shared_database(main_window, db)
+        self.auth = auth or AuthService(self.db)
+        # Хеширование пароля (KDF) при регистрации - тоже в фоновом потоке
+        self.register_executor = QueryExecutor(self.db, self, max_threads=1)
+        self.register_executor.finished.connect(self.on_registered)
+        self.register_executor.failed.connect(self.on_register_failed)
+        # Отдельный исполнитель для подсказки о занятости: новая проверка отменяет
+        # предыдущую, но не регистрацию (editingFinished приходит и при нажатии кнопки)
+        self.availability_executor = QueryExecutor(self.db, self, max_threads=1)
+        self.availability_executor.finished.connect(self.on_availability_checked)
         self.setWindowTitle("Регистрация")
         self.setFixedSize(400, 400)
         icon = QIcon("pineapple.ico")
@@ -163,6 +216,13 @@ class RegisterWindow(QMainWindow):
         self.email_edit.setPlaceholderText("Введите email")
         form_layout.addWidget(self.email_edit)
         
+        # Проверка занятости логина и email по мере заполнения формы
+        self.availability_label = QLabel()
+        self.availability_label.setStyleSheet("color: #ffb3b3;")
+        form_layout.addWidget(self.availability_label)
+        self.login_edit.editingFinished.connect(self.check_availability)
+        self.email_edit.editingFinished.connect(self.check_availability)
+        
         self.password_edit = QLineEdit()
         self.password_edit.setPlaceholderText("Придумайте пароль")
         self.password_edit.setEchoMode(QLineEdit.Password)
@@ -215,26 +275,48 @@ class RegisterWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Пароли не совпадают")
             return
             
-        if self.db.check_login_exists(login):
-            QMessageBox.warning(self, "Ошибка", "Пользователь с таким логином уже существует")
-            return
-            
-        if self.db.check_email_exists(email):
-            QMessageBox.warning(self, "Ошибка", "Пользователь с таким email уже существует")
-            return
-            
-        if self.db.register_user(login, email, password):
+        # Занятые логин или email определяются по ошибке вставки
+        self.register_button.setEnabled(False)
+        self.register_executor.submit(self.auth.register, login, email, password)
+
+    def on_registered(self, result):
+        self.register_button.setEnabled(True)
+        success, message = result
+        if success:
             QMessageBox.information(self, "Успех", "Регистрация успешно завершена")
             if self.main_window:
-                self.main_window.show()
+                resolve_window(self.main_window).show()
             self.close()
         else:
-            QMessageBox.warning(self, "Ошибка", "Ошибка при регистрации")
+            QMessageBox.warning(self, "Ошибка", message)
+
+    def on_register_failed(self, message):
+        self.register_button.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Ошибка при регистрации: {message}")
+
+    def check_availability(self):
+        """Подсказка при вводе: занят ли логин или email (один индексный запрос в фоновом потоке)"""
+        login = self.login_edit.text() or None
+        email = self.email_edit.text() or None
+        if not login and not email:
+            self.availability_executor.abort()
+            self.availability_label.clear()
+            return
+        self.availability_executor.submit(self.db.check_availability, login, email)
+
+    def on_availability_checked(self, result):
+        login_taken, email_taken = result
+        messages = []
+        if login_taken:
+            messages.append("Логин уже занят")
+        if email_taken:
+            messages.append("Email уже используется")
+        self.availability_label.setText("\n".join(messages))
 
     def back_to_login(self):
         if hasattr(self, 'login_window'):
             self.login_window.show()
         else:
-            self.login_window = LoginWindow(self.main_window)
+            self.login_window = LoginWindow(self.main_window, self.db, self.auth)
             self.login_window.show()
         self.hide()
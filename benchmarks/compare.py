@@ -0,0 +1,77 @@
+"""Сравнение двух прогонов benchmarks.run.
+
+    python -m benchmarks.compare old.json new.json --threshold 0.1
+
+Код возврата 1, если у какой-либо операции p50 или p95 выросли больше
+чем на threshold (доля) и больше чем на min_delta_ms, или изменился план
+поискового запроса.
+"""
+import argparse
+import json
+import sys
+
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'ops_per_sec')
+# Метрики, рост которых считается регрессией; p99 на малом числе замеров шумит
+REGRESSION_METRICS = ('p50_ms', 'p95_ms')
+# Параметры прогона, при расхождении которых сравнение теряет смысл
+SCALE_KEYS = ('flights', 'users', 'seats', 'iterations', 'kdf', 'query_stats')
+
+
+def scale_mismatch(baseline, current):
+    """Параметры, которыми различаются прогоны"""
+    old, new = baseline.get('meta', {}), current.get('meta', {})
+    return [key for key in SCALE_KEYS if old.get(key) != new.get(key)]
+
+
+def compare(baseline, current, threshold=0.10, min_delta_ms=0.05):
+    """Строки сравнения (операция, метрика, было, стало, изменение, регрессия) и число регрессий.
+    Рост меньше min_delta_ms не считается регрессией: на микросекундах доля шумит."""
+    rows = []
+    regressions = 0
+    old_results = baseline.get('results', {})
+    for name, new in current.get('results', {}).items():
+        old = old_results.get(name)
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = old.get(metric, 0.0), new.get(metric, 0.0)
+            change = (after - before) / before if before else 0.0
+            regressed = (metric in REGRESSION_METRICS and change > threshold
+                         and after - before > min_delta_ms)
+            regressions += regressed
+            rows.append((name, metric, before, after, change, regressed))
+    if baseline.get('search_plan') and baseline.get('search_plan') != current.get('search_plan'):
+        regressions += 1
+        rows.append(('search_plan', 'changed', 0.0, 0.0, 0.0, True))
+    return rows, regressions
+
+
+def print_comparison(rows, file=sys.stdout):
+    print(f"{'операция':<24}{'метрика':<14}{'было':>12}{'стало':>12}{'изменение':>12}", file=file)
+    for name, metric, before, after, change, regressed in rows:
+        mark = '  РЕГРЕССИЯ' if regressed else ''
+        print(f"{name:<24}{metric:<14}{before:>12.3f}{after:>12.3f}{change:>+11.1%}{mark}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение результатов benchmarks.run")
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    parser.add_argument('--min-delta-ms', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    mismatch = scale_mismatch(baseline, current)
+    if mismatch:
+        print(f"Внимание: прогоны различаются параметрами {', '.join(mismatch)}", file=sys.stderr)
+    rows, regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+    print_comparison(rows)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
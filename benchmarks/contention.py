@@ -0,0 +1,170 @@
+"""Одновременная работа нескольких терминалов с одним файлом базы.
+
+Запуск из корня проекта:
+    python -m benchmarks.contention --readers 4 --writers 2 --seconds 10
+    python -m benchmarks.contention --modes wal --output contention.json
+
+Для каждого режима хранения (wal - StorageConfig по умолчанию, legacy -
+журнал отката, как было раньше) создается своя синтетическая база, после
+чего отдельные процессы одновременно ищут рейсы (читатели) и покупают билеты
+(писатели). Выводятся задержки поиска во время записи, число ошибок
+"database is locked" и пропускная способность покупок.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from database import Database, StorageConfig
+from benchmarks.run import summarize
+from benchmarks.synthetic import populate
+
+MODES = {
+    'wal': StorageConfig,
+    'legacy': StorageConfig.legacy,
+}
+
+
+def reader(db_path, mode, routes, seconds, seed, start, results):
+    db = Database(db_path, storage=MODES[mode]())
+    rng = random.Random(seed)
+    timings = []
+    errors = 0
+    start.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        origin, destination, day = routes[rng.randrange(len(routes))]
+        # Каждый поиск идет в базу, а не в кэш
+        db.search_cache.clear()
+        started = time.perf_counter()
+        try:
+            db.search_tickets(origin, destination, day)
+        except sqlite3.OperationalError:
+            errors += 1
+        timings.append(time.perf_counter() - started)
+    db.pool.close_all()
+    results.put(('search_tickets', timings, errors, 0))
+
+
+def writer(db_path, mode, flight_ids, user_ids, seconds, seed, start, results):
+    db = Database(db_path, storage=MODES[mode]())
+    rng = random.Random(seed)
+    timings = []
+    errors = 0
+    start.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        success, message = db.purchase_ticket(rng.randint(*flight_ids), rng.randint(*user_ids),
+                                              'Пассажир', 'bench@bench.local', '+70000000000')
+        timings.append(time.perf_counter() - started)
+        # "Нет доступных мест" - нормальный исход, ошибкой считается только сбой транзакции
+        if not success and message == "Ошибка при покупке билетов":
+            errors += 1
+    retries = db.pool.stats()['busy_retries']
+    db.pool.close_all()
+    results.put(('purchase_ticket', timings, errors, retries))
+
+
+def run_mode(mode, workdir, args):
+    db_path = os.path.join(workdir, f'{mode}.db')
+    db = Database(db_path, storage=MODES[mode]())
+    data = populate(db, flights=args.flights, users=args.users, seats=args.seats, seed=args.seed)
+    with db.pool.connection() as conn:
+        settings = db.pool.storage.settings(conn)
+    db.pool.close_all()
+
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=reader, args=(db_path, mode, data['routes'], args.seconds,
+                                                      args.seed + n, start, results))
+                 for n in range(args.readers)]
+    processes += [context.Process(target=writer, args=(db_path, mode, data['flight_ids'], data['user_ids'],
+                                                       args.seconds, args.seed + 1000 + n, start, results))
+                  for n in range(args.writers)]
+    for process in processes:
+        process.start()
+    # Процессы открывают базу до старта замера
+    time.sleep(1.0)
+    start.set()
+
+    collected = {}
+    for _ in processes:
+        operation, timings, errors, retries = results.get()
+        entry = collected.setdefault(operation, {'timings': [], 'errors': 0, 'busy_retries': 0})
+        entry['timings'].extend(timings)
+        entry['errors'] += errors
+        entry['busy_retries'] += retries
+    for process in processes:
+        process.join()
+
+    report = {'settings': settings}
+    for operation, entry in collected.items():
+        summary = summarize(entry['timings'], entry['errors'])
+        summary['max_ms'] = max(entry['timings'], default=0.0) * 1000
+        # Пропускная способность всех процессов вместе, а не одного
+        summary['ops_per_sec'] = len(entry['timings']) / args.seconds
+        if operation == 'purchase_ticket':
+            summary['busy_retries'] = entry['busy_retries']
+        report[operation] = summary
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск и покупка из нескольких процессов над одной базой")
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['legacy', 'wal'])
+    parser.add_argument('--readers', type=int, default=4, help="процессов, выполняющих поиск")
+    parser.add_argument('--writers', type=int, default=2, help="процессов, покупающих билеты")
+    parser.add_argument('--seconds', type=float, default=10.0, help="длительность замера в каждом режиме")
+    parser.add_argument('--flights', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--seats', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='anavia_contention_')
+    try:
+        results = {}
+        for mode in args.modes:
+            print(f"Режим {mode}: {args.readers} читателей, {args.writers} писателей, {args.seconds:.0f} с",
+                  file=sys.stderr)
+            results[mode] = run_mode(mode, workdir, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'readers': args.readers,
+            'writers': args.writers,
+            'seconds': args.seconds,
+            'flights': args.flights,
+            'users': args.users,
+            'seats': args.seats,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
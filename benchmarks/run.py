@@ -0,0 +1,217 @@
+"""Замеры задержек слоя Database на синтетической базе.
+
+Запуск из корня проекта:
+    python -m benchmarks.run --scale small --output results.json
+    python -m benchmarks.run --flights 50000 --users 20000 --baseline results.json
+
+База создается во временном каталоге (airline_system.db) и заполняется
+benchmarks.synthetic. Для каждой операции выводятся p50/p95/p99 в мс и
+пропускная способность в операциях в секунду; с --baseline результаты
+сравниваются с прошлым прогоном (см. benchmarks.compare).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import Database
+from query_stats import QueryStats
+from benchmarks.compare import compare, print_comparison, scale_mismatch
+from benchmarks.synthetic import BENCH_PASSWORD, bench_login, populate
+
+# Масштабы: (рейсов, пользователей, мест на рейс). На 1 млн рейсов схема мест
+# сокращена до 20 мест, иначе таблица Tickets занимает десятки гигабайт
+SCALES = {
+    'small': (10_000, 100_000, 100),
+    'large': (1_000_000, 100_000, 20),
+}
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings, errors=0):
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        'n': len(timings),
+        'errors': errors,
+        'mean_ms': total / len(timings) * 1000 if timings else 0.0,
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'ops_per_sec': len(timings) / total if total else 0.0,
+    }
+
+
+def measure(operation, iterations, before=None):
+    """Вызывает operation(i) iterations раз; before(i) выполняется вне замера.
+    Операция считается неудачной, если вернула False или (False, ...)."""
+    timings = []
+    errors = 0
+    for i in range(iterations):
+        if before:
+            before(i)
+        started = time.perf_counter()
+        result = operation(i)
+        timings.append(time.perf_counter() - started)
+        if result is False or (isinstance(result, tuple) and result and result[0] is False):
+            errors += 1
+    return summarize(timings, errors)
+
+
+def run_benchmarks(db, data, iterations, seed=1):
+    rng = random.Random(seed)
+    routes = data['routes']
+    first_flight, last_flight = data['flight_ids']
+    first_user, last_user = data['user_ids']
+    results = {}
+
+    def search(i):
+        origin, destination, day = routes[rng.randrange(len(routes))]
+        return db.search_tickets(origin, destination, day)
+
+    # Поиск без кэша (кэш сбрасывается перед каждым вызовом) и повторный поиск из кэша
+    results['search_tickets'] = measure(search, iterations, before=lambda i: db.search_cache.clear())
+    cached_route = routes[0]
+    db.search_tickets(*cached_route)
+    results['search_tickets_cached'] = measure(lambda i: db.search_tickets(*cached_route), iterations)
+
+    # Маршруты с пересадками: граф в памяти строится до замеров
+    db.routes.ensure_loaded()
+    results['search_connections'] = measure(
+        lambda i: db.search_connections(*routes[rng.randrange(len(routes))], max_stops=2), iterations)
+
+    results['get_user_tickets'] = measure(
+        lambda i: db.get_user_tickets(rng.randint(first_user, last_user)), iterations)
+
+    # Проверка пароля зависит в основном от стоимости KDF, поэтому замеров меньше
+    results['check_credentials'] = measure(
+        lambda i: db.check_credentials(bench_login(rng.randrange(data['users'])), BENCH_PASSWORD),
+        max(10, iterations // 10))
+
+    results['purchase_ticket'] = measure(
+        lambda i: db.purchase_ticket(rng.randint(first_flight, last_flight), rng.randint(first_user, last_user),
+                                     'Пассажир', 'bench@bench.local', '+70000000000'),
+        iterations)
+
+    start = datetime.strptime(data['start_date'], '%Y-%m-%d')
+
+    def add_flight(i):
+        origin, destination = rng.sample(data['cities'], 2)
+        departure = start + timedelta(days=rng.randrange(data['days']), minutes=rng.randrange(0, 24 * 60, 5))
+        arrival = departure + timedelta(hours=2)
+        return db.add_flight(rng.choice(data['airlines']), origin, destination,
+                             departure.strftime('%Y-%m-%d %H:%M:%S'), arrival.strftime('%Y-%m-%d %H:%M:%S'),
+                             float(rng.randrange(3000, 50000, 100)))
+
+    results['add_flight'] = measure(add_flight, iterations)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры задержек Database на синтетической базе")
+    parser.add_argument('--scale', choices=sorted(SCALES), help="готовый масштаб данных")
+    parser.add_argument('--flights', type=int, help="число рейсов (по умолчанию 10000)")
+    parser.add_argument('--users', type=int, help="число пользователей (по умолчанию 10000)")
+    parser.add_argument('--seats', type=int, help="мест на рейс (по умолчанию 100)")
+    parser.add_argument('--iterations', type=int, default=200, help="вызовов каждой операции")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help="не удалять временную базу")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    parser.add_argument('--query-stats', action='store_true',
+                        help="собирать статистику запросов во время замеров (добавляет накладные расходы)")
+    parser.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="допустимый рост p50/p95 относительно baseline (доля)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help="рост меньше этого значения в мс не считается регрессией")
+    args = parser.parse_args(argv)
+
+    flights, users, seats = SCALES[args.scale] if args.scale else (10_000, 10_000, 100)
+    flights = args.flights if args.flights is not None else flights
+    users = args.users if args.users is not None else users
+    seats = args.seats if args.seats is not None else seats
+
+    workdir = tempfile.mkdtemp(prefix='anavia_bench_')
+    db_path = os.path.join(workdir, 'airline_system.db')
+    try:
+        # Без демонстрационного расписания: в базе только данные populate(), и прогоны
+        # с разными --flights сравнимы. Статистика запросов по умолчанию выключена
+        # (и без журнала медленных запросов), чтобы не влиять на замеры
+        query_stats = QueryStats(slow_ms=float('inf'), explain=False) if args.query_stats else False
+        db = Database(db_path, query_stats=query_stats, seed_sample=False)
+        started = time.perf_counter()
+        data = populate(db, flights=flights, users=users, seats=seats, seed=args.seed)
+        populate_seconds = time.perf_counter() - started
+        print(f"База заполнена за {populate_seconds:.1f} с: {flights} рейсов, {users} пользователей, "
+              f"{data['purchases']} билетов", file=sys.stderr)
+
+        plan = db.explain_search_plan()
+        with db.pool.connection() as conn:
+            storage = db.pool.storage.settings(conn)
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'flights': flights,
+                'users': users,
+                'seats': seats,
+                'purchases': data['purchases'],
+                'iterations': args.iterations,
+                'seed': args.seed,
+                'populate_seconds': populate_seconds,
+                'kdf': f'{db.hasher.algorithm}:{db.hasher.cost}',
+                'query_stats': args.query_stats,
+                'storage': storage,
+            },
+            'search_plan': plan,
+            'results': None,
+        }
+        # Статистика запросов - только за время замеров, без заполнения базы
+        if db.query_stats:
+            db.query_stats.reset()
+        report['results'] = run_benchmarks(db, data, args.iterations, args.seed)
+        if db.query_stats:
+            report['query_stats'] = db.query_stats.snapshot(top=10)
+        db.pool.close_all()
+    finally:
+        if args.keep:
+            print(f"База сохранена: {db_path}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatch = scale_mismatch(baseline, report)
+        if mismatch:
+            print(f"Внимание: прогоны различаются параметрами {', '.join(mismatch)}", file=sys.stderr)
+        rows, regressions = compare(baseline, report, args.threshold, args.min_delta_ms)
+        print_comparison(rows, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Время запуска приложения до окна входа.
+
+Запуск из корня проекта:
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+Каждый прогон - отдельный процесс `python -X importtime`, который выполняет
+main.start() (как при обычном запуске) и завершается, когда окно входа
+показано. Выводится время от старта интерпретатора до окна входа, самые
+долгие импорты модуля main по данным -X importtime и список тяжелых
+модулей, которые не должны загружаться до входа (openpyxl, модуль
+главного окна); если какой-то из них загружен, код выхода 1.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Модули, загрузка которых откладывается до входа или до экспорта
+DEFERRED_MODULES = ('openpyxl', 'mainwindow', 'excel_export', 'flight_import', 'booking_client')
+MARKER = 'LOGIN_WINDOW_SHOWN '
+
+PROBE = f'''
+import sys
+import main
+app, login_window = main.start(['main.py', '--db', sys.argv[1]])
+app.processEvents()
+print({MARKER!r} + repr(sorted(m for m in {DEFERRED_MODULES!r} if m in sys.modules)), flush=True)
+'''
+
+
+def parse_importtime(stderr):
+    """Строки -X importtime: {модуль: (глубина вложенности, суммарное время в мс)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        # Каждый уровень вложенности импорта - два пробела отступа
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (depth, int(cumulative_us) / 1000)
+    return modules
+
+
+def run_probe(db_path, env):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE, db_path],
+                             capture_output=True, text=True, env=env, timeout=120)
+    elapsed = (time.perf_counter() - started) * 1000
+    shown = [line for line in process.stdout.splitlines() if line.startswith(MARKER)]
+    if process.returncode != 0 or not shown:
+        raise RuntimeError(f"запуск не дошел до окна входа:\n{process.stderr[-2000:]}")
+    loaded = ast.literal_eval(shown[0][len(MARKER):])
+    return elapsed, loaded, parse_importtime(process.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время запуска приложения до окна входа (-X importtime)")
+    parser.add_argument('--runs', type=int, default=5, help="число запусков")
+    parser.add_argument('--top', type=int, default=15, help="сколько самых долгих импортов показать")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+
+    workdir = tempfile.mkdtemp(prefix='anavia_startup_')
+    db_path = os.path.join(workdir, 'airline_system.db')
+    try:
+        # Первый запуск создает и заполняет базу и не учитывается
+        run_probe(db_path, env)
+        timings = []
+        import_totals = []
+        for _ in range(args.runs):
+            elapsed, loaded, modules = run_probe(db_path, env)
+            timings.append(elapsed)
+            import_totals.append(sum(cumulative for depth, cumulative in modules.values() if depth == 0))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # Импорты, которые выполняет сам main.py: что именно загружается до окна входа
+    slowest = sorted(((m, cumulative) for m, (depth, cumulative) in modules.items() if depth == 1),
+                     key=lambda item: -item[1])[:args.top]
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': args.runs,
+        },
+        'time_to_login_window_ms': {
+            'p50': statistics.median(timings),
+            'min': min(timings),
+            'max': max(timings),
+        },
+        'import_ms_p50': statistics.median(import_totals),
+        'slowest_imports_ms': dict(slowest),
+        'deferred_modules_loaded': loaded,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return 1 if loaded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
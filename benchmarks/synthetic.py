@@ -0,0 +1,104 @@
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+
+import sample_data
+from seat_inventory import SEAT_SOLD
+
+BENCH_PASSWORD = 'Benchmark1'
+CHUNK_SIZE = 10000
+WORKLOAD_ROUTES = 10000
+
+
+def bench_login(n):
+    return f'bench{n}'
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def populate(db, flights=10000, users=10000, seats=100, tickets_per_user=2, cities=200,
+             days=60, start_date='2030-01-01', seed=1):
+    """Заполняет базу синтетическими данными заданного масштаба.
+
+    Справочники, расписание и схемы мест строит sample_data.generate (сеть
+    дополняется синтетическими городами до cities, частота рейсов
+    масштабируется до flights). Сверху добавляются пользователи с одним
+    паролем BENCH_PASSWORD (хеш считается один раз) и их покупки. Все
+    вставки выполняются в одной транзакции. Возвращает описание данных для
+    построения нагрузки.
+    """
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    seat_labels = [label for label, _, _ in islice(db.seats.layout_seats(), seats)]
+    hashed_password, salt = db.hash_password(BENCH_PASSWORD)
+
+    with db.pool.transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        summary = sample_data.generate(cursor, db.seats, seed=seed, start_date=start_date, days=days,
+                                       extra_cities=max(0, cities - len(sample_data.CITIES)),
+                                       flights=flights, capacity=seats)
+        first_flight, last_flight = summary['flight_ids']
+
+        user_base = cursor.execute('SELECT COALESCE(MAX(user_id), 0) FROM users').fetchone()[0] + 1
+        for chunk in chunks(range(users), CHUNK_SIZE):
+            cursor.executemany('INSERT INTO users (user_id, login, email, password, salt) VALUES (?, ?, ?, ?, ?)',
+                               [(user_base + n, bench_login(n), f'{bench_login(n)}@bench.local', hashed_password, salt)
+                                for n in chunk])
+
+        # Покупки: места продаются с конца салона (эконом)
+        sold = {}
+        purchases = []
+        for n in range(users * tickets_per_user if first_flight else 0):
+            flight_id = rng.randint(first_flight, last_flight)
+            index = sold.get(flight_id, 0)
+            if index >= seats:
+                continue
+            sold[flight_id] = index + 1
+            user = n // tickets_per_user
+            purchases.append((flight_id, user_base + user,
+                              (start - timedelta(days=rng.randrange(1, 30))).strftime('%Y-%m-%d %H:%M:%S'),
+                              f'Пассажир {user}', f'{bench_login(user)}@bench.local', '+70000000000',
+                              seat_labels[seats - 1 - index], 'active'))
+        cursor.executemany('''
+            INSERT INTO PurchasedTickets (FlightID, UserID, PurchaseDate, PassengerName,
+                                        PassengerEmail, PassengerPhone, SeatNumber, Status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', purchases)
+        cursor.executemany('UPDATE Tickets SET Status = ? WHERE FlightID = ? AND SeatNumber = ?',
+                           [(SEAT_SOLD, flight_id, seat) for flight_id, _, _, _, _, _, seat, _ in purchases])
+        cursor.executemany('UPDATE Flights SET AvailableSeats = AvailableSeats - ? WHERE FlightID = ?',
+                           [(count, flight_id) for flight_id, count in sold.items()])
+
+    # Данные вставлены в обход Database: кэши в памяти сбрасываются
+    db.refdata.reset()
+    db.search_cache.clear()
+    db.seats.invalidate()
+
+    # Нагрузка для поиска: маршруты и даты случайных существующих рейсов
+    routes = []
+    if first_flight:
+        with db.pool.connection() as conn:
+            cursor = conn.cursor()
+            for _ in range(min(WORKLOAD_ROUTES, summary['flights'])):
+                routes.append(db.flight_route(cursor, rng.randint(first_flight, last_flight)))
+
+    return {
+        'flights': summary['flights'],
+        'users': users,
+        'seats': seats,
+        'purchases': len(purchases),
+        'flight_ids': (first_flight, last_flight),
+        'user_ids': (user_base, user_base + users - 1),
+        'routes': routes,
+        'cities': summary['cities'],
+        'airlines': summary['airlines'],
+        'start_date': start_date,
+        'days': days,
+    }
@@ -0,0 +1,222 @@
+import http.client
+import json
+import select
+import socket
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from database import FARE_CALENDAR_DAYS, SEARCH_PAGE_SIZE
+
+
+class RemoteError(Exception):
+    """Сервер бронирования недоступен или отклонил запрос"""
+
+
+class RemoteCancelled(RemoteError):
+    """Запрос прерван через RemotePool.interrupt(); такой запрос не повторяется"""
+
+
+class RemotePool:
+    """HTTP-соединения с сервером: по одному keep-alive соединению на поток.
+
+    Повторяет интерфейс ConnectionManager, который нужен QueryExecutor:
+    interrupt() закрывает сокет потока, и ожидающий ответа запрос
+    завершается ошибкой RemoteCancelled, как прерванный SQL.
+    """
+
+    def __init__(self, host, port, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # идентификатор потока -> соединение
+        self._interrupted = set()  # потоки, запрос которых прерван interrupt()
+        self.opened = 0
+        self.reused = 0
+
+    def connection(self):
+        with self._lock:
+            self._interrupted.discard(threading.get_ident())
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+            # Простаивающий сокет читается только после закрытия сервером: новое соединение
+            self.discard()
+            conn = None
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+                self.opened += 1
+        else:
+            with self._lock:
+                self.reused += 1
+        return conn
+
+    def discard(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                self._connections.pop(threading.get_ident(), None)
+
+    def interrupt(self, thread_id):
+        with self._lock:
+            conn = self._connections.get(thread_id)
+            self._interrupted.add(thread_id)
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def interrupted(self):
+        """True, если текущий запрос потока прерван interrupt()"""
+        with self._lock:
+            return threading.get_ident() in self._interrupted
+
+    def stats(self):
+        with self._lock:
+            return {'opened': self.opened, 'reused': self.reused, 'open': len(self._connections)}
+
+    def close_all(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+
+
+class RemoteDatabase:
+    """Клиент сервера бронирования (booking_server) с интерфейсом Database.
+
+    Реализует методы, которые вызывают окна приложения, поэтому MainWindow
+    и окна входа работают с ним так же, как с локальной базой. Пользователь
+    определяется сессией после RemoteAuthService.login(); аргумент user_id
+    методов сохранен для совместимости и сервером не используется.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        parts = urlsplit(url if '//' in url else f'http://{url}')
+        self.url = f'http://{parts.hostname}:{parts.port or 80}'
+        self.pool = RemotePool(parts.hostname, parts.port or 80, timeout)
+        self.token = None
+        self.user_id = None
+
+    def request(self, method, path, params=None, body=None):
+        if params:
+            path += '?' + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        # Одна повторная попытка - только если сервер не мог получить запрос (ошибка
+        # при отправке) или запрос не меняет данных (GET): повтор отправленного POST
+        # после обрыва соединения мог бы, например, купить билеты дважды
+        for attempt in range(2):
+            conn = self.pool.connection()
+            sent = False
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                payload = json.loads(response.read() or b'null')
+                break
+            except (http.client.HTTPException, ConnectionError, OSError) as e:
+                self.pool.discard()
+                if self.pool.interrupted():
+                    raise RemoteCancelled("Запрос отменен") from e
+                if attempt or isinstance(e, socket.timeout) or (sent and method != 'GET'):
+                    raise RemoteError(f"Сервер бронирования недоступен: {e}") from e
+        if response.status != 200:
+            raise RemoteError(payload.get('error') if isinstance(payload, dict) else response.reason)
+        return payload
+
+    def get_user_id(self, login):
+        if self.token is None:
+            return None
+        return self.request('GET', '/api/me')['user_id']
+
+    def check_availability(self, login=None, email=None):
+        result = self.request('GET', '/api/availability', {'login': login, 'email': email})
+        return result['login_taken'], result['email_taken']
+
+    def search_tickets(self, origin_city, destination_city, departure_date, return_date=None, passenger_count=1,
+                       travel_class='Economy', page=0, page_size=SEARCH_PAGE_SIZE):
+        result = self.request('GET', '/api/search', {
+            'origin': origin_city, 'destination': destination_city, 'date': departure_date,
+            'return_date': return_date, 'passengers': passenger_count, 'class': travel_class,
+            'page': page, 'page_size': page_size})
+        return [tuple(row) for row in result['outbound']], [tuple(row) for row in result['return']]
+
+    def fare_calendar(self, origin_city, destination_city, center_date, days=FARE_CALENDAR_DAYS,
+                      passenger_count=1, travel_class='Economy'):
+        return self.request('GET', '/api/fares', {
+            'origin': origin_city, 'destination': destination_city, 'date': center_date,
+            'days': days, 'passengers': passenger_count, 'class': travel_class})
+
+    def search_connections(self, origin_city, destination_city, departure_date, passenger_count=1,
+                           travel_class='Economy', max_stops=1, limit=5):
+        result = self.request('GET', '/api/connections', {
+            'origin': origin_city, 'destination': destination_city, 'date': departure_date,
+            'passengers': passenger_count, 'class': travel_class, 'max_stops': max_stops, 'limit': limit})
+
+        def itineraries(found):
+            return [(price, duration, [tuple(row) for row in route]) for price, duration, route in found]
+
+        return itineraries(result['cheapest']), itineraries(result['fastest'])
+
+    def suggest_places(self, text, limit=10):
+        result = self.request('GET', '/api/places', {'text': text, 'limit': limit})
+        return [tuple(item) for item in result['suggestions']]
+
+    def purchase_tickets_batch(self, flight_id, user_id, passengers, travel_class='Economy'):
+        result = self.request('POST', '/api/purchase', body={
+            'flight_id': flight_id, 'passengers': passengers, 'class': travel_class})
+        return result['ok'], result['message'], result['seats']
+
+    def purchase_ticket(self, flight_id, user_id, passenger_name, passenger_email, passenger_phone,
+                        travel_class='Economy'):
+        passenger = {'name': passenger_name, 'email': passenger_email, 'phone': passenger_phone}
+        success, message, seats = self.purchase_tickets_batch(flight_id, user_id, [passenger], travel_class)
+        return success, message
+
+    def get_user_tickets(self, user_id):
+        return [tuple(row) for row in self.request('GET', '/api/tickets')['tickets']]
+
+    def iter_user_tickets(self, user_id, batch_size=500):
+        yield from self.get_user_tickets(user_id)
+
+    def count_user_tickets(self, user_id):
+        return self.request('GET', '/api/tickets/count')['count']
+
+    def cancel_ticket(self, ticket_id, user_id):
+        result = self.request('POST', '/api/tickets/cancel', body={'ticket_id': ticket_id})
+        return result['ok'], result['message']
+
+    def add_flight(self, airline_name, from_city, to_city, departure_datetime, arrival_datetime, price):
+        return self.request('POST', '/api/flights', body={
+            'airline': airline_name, 'from_city': from_city, 'to_city': to_city,
+            'departure': departure_datetime, 'arrival': arrival_datetime, 'price': price})['ok']
+
+
+class RemoteAuthService:
+    """Вход и регистрация через сервер; ограничение попыток выполняет сервер (AuthService)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def login(self, login, password):
+        """Возвращает (True, роль) или (False, сообщение об ошибке)"""
+        result = self.db.request('POST', '/api/login', body={'login': login, 'password': password})
+        if not result['ok']:
+            return False, result['message']
+        self.db.token = result['token']
+        self.db.user_id = result['user_id']
+        return True, result['role']
+
+    def register(self, login, email, password, role='user'):
+        result = self.db.request('POST', '/api/register', body={'login': login, 'email': email, 'password': password})
+        return result['ok'], result['message']
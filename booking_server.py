@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import json
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from auth_service import AuthService
+from database import Database, FARE_CALENDAR_DAYS, SEARCH_PAGE_SIZE, configured_hasher
+from query_stats import QueryStats, SLOW_QUERY_MS
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY = 1024 * 1024
+SESSION_TTL = 12 * 60 * 60  # с
+MAX_STOPS = 2  # пересадок в поиске маршрутов, не больше
+
+
+class ApiError(Exception):
+    """Ошибка запроса с HTTP-статусом ответа"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class BookingServer:
+    """Локальный HTTP/JSON сервер бронирования поверх одного экземпляра Database.
+
+    Все терминалы работают через один процесс, поэтому кэши поиска,
+    справочники и граф маршрутов прогреваются один раз и общие для всех.
+    Чтение (поиск, история билетов, проверка пароля) выполняется в пуле
+    потоков, каждый со своим постоянным соединением. Изменения (регистрация,
+    покупка, отмена, новые рейсы) проходят через очередь и выполняются
+    единственной задачей-писателем по одному, так что терминалы не
+    соревнуются за блокировку файла базы.
+    """
+
+    def __init__(self, db, host=DEFAULT_HOST, port=DEFAULT_PORT, auth=None, read_threads=4,
+                 session_ttl=SESSION_TTL):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.auth = auth or AuthService(db)
+        self.session_ttl = session_ttl
+        self.readers = ThreadPoolExecutor(read_threads, thread_name_prefix='booking-read')
+        # Один поток - одно соединение для записи
+        self.write_executor = ThreadPoolExecutor(1, thread_name_prefix='booking-write')
+        self.write_queue = None
+        self.sessions = {}  # токен -> {'login', 'role', 'user_id', 'expires'}
+        self.stats_counters = {'requests': 0, 'errors': 0, 'writes': 0}
+        self.routes = {
+            ('POST', '/api/login'): (self.login, None),
+            ('POST', '/api/logout'): (self.logout, 'user'),
+            ('POST', '/api/register'): (self.register, None),
+            ('GET', '/api/availability'): (self.availability, None),
+            ('GET', '/api/me'): (self.me, 'user'),
+            ('GET', '/api/search'): (self.search, None),
+            ('GET', '/api/fares'): (self.fares, None),
+            ('GET', '/api/connections'): (self.connections, None),
+            ('GET', '/api/places'): (self.places, None),
+            ('POST', '/api/purchase'): (self.purchase, 'user'),
+            ('GET', '/api/tickets'): (self.tickets, 'user'),
+            ('GET', '/api/tickets/count'): (self.tickets_count, 'user'),
+            ('POST', '/api/tickets/cancel'): (self.cancel, 'user'),
+            ('POST', '/api/flights'): (self.add_flight, 'admin'),
+            ('GET', '/api/stats'): (self.stats, 'admin'),
+        }
+
+    async def serve(self):
+        self.write_queue = asyncio.Queue()
+        writer_task = asyncio.create_task(self.writer())
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Сервер бронирования: http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer_task.cancel()
+            self.readers.shutdown(wait=False)
+            self.write_executor.shutdown(wait=True)
+            self.db.pool.close_all()
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, fn, *args)
+
+    async def write(self, fn, *args):
+        """Ставит изменение в очередь писателя и ждет результата"""
+        future = asyncio.get_running_loop().create_future()
+        await self.write_queue.put((fn, args, future))
+        return await future
+
+    async def writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, future = await self.write_queue.get()
+            try:
+                result = await loop.run_in_executor(self.write_executor, fn, *args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            self.stats_counters['writes'] += 1
+
+    async def handle_client(self, reader, writer):
+        """HTTP/1.1 с keep-alive: клиент держит одно соединение на поток"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                       {'error': "Слишком большой запрос"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        self.stats_counters['requests'] += 1
+        url = urlsplit(target)
+        try:
+            route = self.routes.get((method, url.path))
+            if route is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, "Неизвестный запрос")
+            handler, required_role = route
+            params = dict(parse_qsl(url.query))
+            if body:
+                params.update(json.loads(body))
+            session = self.session(headers, required_role)
+            return HTTPStatus.OK, await handler(params, session)
+        except ApiError as e:
+            self.stats_counters['errors'] += 1
+            return e.status, {'error': str(e)}
+        except (KeyError, ValueError, TypeError) as e:
+            self.stats_counters['errors'] += 1
+            return HTTPStatus.BAD_REQUEST, {'error': f"Неверные параметры запроса: {e}"}
+        except Exception as e:
+            self.stats_counters['errors'] += 1
+            print(f"Error handling {method} {url.path}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Внутренняя ошибка сервера"}
+
+    def session(self, headers, required_role):
+        """Сессия по заголовку Authorization: Bearer <токен>; проверяет роль, если она нужна"""
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        session = self.sessions.get(token) if scheme.lower() == 'bearer' else None
+        now = time.monotonic()
+        if session is not None and session['expires'] < now:
+            del self.sessions[token]
+            session = None
+        if session is not None:
+            session['expires'] = now + self.session_ttl
+            session['token'] = token
+        if required_role and session is None:
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "Необходимо войти в систему")
+        if required_role == 'admin' and session['role'] != 'admin':
+            raise ApiError(HTTPStatus.FORBIDDEN, "Недостаточно прав")
+        return session
+
+    # Авторизация
+
+    async def login(self, params, session):
+        login, password = params['login'], params['password']
+        # Проверка пароля (KDF) и новый хеш для устаревшего пароля считаются в потоке
+        # чтения; сама замена хеша - изменение и идет через писателя
+        success, role_or_message, stale_hash = await self.read(self.auth.check_login, login, password)
+        if not success:
+            return {'ok': False, 'message': role_or_message}
+        if stale_hash is not None:
+            hashed_password, salt = await self.read(self.db.hash_password, password)
+            await self.write(self.db.replace_password_hash, login, stale_hash, hashed_password, salt)
+        user_id = await self.read(self.db.get_user_id, login)
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = {'login': login, 'role': role_or_message, 'user_id': user_id,
+                                'expires': time.monotonic() + self.session_ttl}
+        return {'ok': True, 'role': role_or_message, 'user_id': user_id, 'token': token}
+
+    async def logout(self, params, session):
+        self.sessions.pop(session['token'], None)
+        return {'ok': True}
+
+    async def register(self, params, session):
+        # Как при входе: KDF - в потоке чтения, писателю достается только INSERT
+        login = params['login']
+        hashed_password, salt = await self.read(self.db.hash_password, params['password'])
+        success, message = await self.write(self.db.insert_user, login, params['email'], hashed_password, salt)
+        self.auth.forget(login)
+        return {'ok': success, 'message': message}
+
+    async def availability(self, params, session):
+        login_taken, email_taken = await self.read(self.db.check_availability,
+                                                   params.get('login'), params.get('email'))
+        return {'login_taken': login_taken, 'email_taken': email_taken}
+
+    async def me(self, params, session):
+        return {'login': session['login'], 'role': session['role'], 'user_id': session['user_id']}
+
+    # Поиск
+
+    async def search(self, params, session):
+        outbound, returning = await self.read(
+            self.db.search_tickets, params['origin'], params['destination'], params['date'],
+            params.get('return_date') or None, int(params.get('passengers', 1)),
+            params.get('class', 'Economy'), int(params.get('page', 0)),
+            int(params.get('page_size', SEARCH_PAGE_SIZE)))
+        return {'outbound': outbound, 'return': returning}
+
+    async def fares(self, params, session):
+        return await self.read(
+            self.db.fare_calendar, params['origin'], params['destination'], params['date'],
+            int(params.get('days', FARE_CALENDAR_DAYS)), int(params.get('passengers', 1)),
+            params.get('class', 'Economy'))
+
+    async def connections(self, params, session):
+        cheapest, fastest = await self.read(
+            self.db.search_connections, params['origin'], params['destination'], params['date'],
+            int(params.get('passengers', 1)), params.get('class', 'Economy'),
+            min(int(params.get('max_stops', 1)), MAX_STOPS), int(params.get('limit', 5)))
+        return {'cheapest': cheapest, 'fastest': fastest}
+
+    async def places(self, params, session):
+        return {'suggestions': await self.read(self.db.suggest_places, params['text'], int(params.get('limit', 10)))}
+
+    # Билеты пользователя (user_id берется только из сессии)
+
+    async def purchase(self, params, session):
+        passengers = [{'name': p['name'], 'email': p['email'], 'phone': p['phone']}
+                      for p in params['passengers']]
+        success, message, seats = await self.write(
+            self.db.purchase_tickets_batch, int(params['flight_id']), session['user_id'], passengers,
+            params.get('class', 'Economy'))
+        return {'ok': success, 'message': message, 'seats': seats}
+
+    async def tickets(self, params, session):
+        return {'tickets': await self.read(self.db.get_user_tickets, session['user_id'])}
+
+    async def tickets_count(self, params, session):
+        return {'count': await self.read(self.db.count_user_tickets, session['user_id'])}
+
+    async def cancel(self, params, session):
+        success, message = await self.write(self.db.cancel_ticket, int(params['ticket_id']), session['user_id'])
+        return {'ok': success, 'message': message}
+
+    async def add_flight(self, params, session):
+        success = await self.write(self.db.add_flight, params['airline'], params['from_city'], params['to_city'],
+                                   params['departure'], params['arrival'], float(params['price']))
+        return {'ok': bool(success)}
+
+    async def stats(self, params, session):
+        return {
+            'server': dict(self.stats_counters, sessions=len(self.sessions),
+                           write_queue=self.write_queue.qsize()),
+            'pool': self.db.pool.stats(),
+            'search_cache': self.db.search_cache.stats(),
+            'auth': self.auth.stats(),
+            'queries': self.db.query_stats.snapshot() if self.db.query_stats else None,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный сервер бронирования AnAvia (HTTP/JSON)")
+    parser.add_argument('--db', default='airline_system.db', help="файл базы данных")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--read-threads', type=int, default=4, help="потоков для чтения")
+    parser.add_argument('--slow-ms', type=float, default=SLOW_QUERY_MS, help="порог медленного запроса, мс")
+    parser.add_argument('--slow-log', help="журнал медленных запросов (по умолчанию - stderr)")
+    parser.add_argument('--slow-log-params', action='store_true',
+                        help="писать в журнал значения параметров запросов (по умолчанию только их типы)")
+    parser.add_argument('--kdf-cost', type=int,
+                        help="стоимость хеширования паролей (scrypt N); по умолчанию подбирается при первом запуске")
+    args = parser.parse_args()
+
+    db = Database(args.db, hasher=configured_hasher(args.db, args.kdf_cost),
+                  query_stats=QueryStats(args.slow_ms, args.slow_log,
+                                         log_params=args.slow_log_params))
+    server = BookingServer(db, args.host, args.port, read_threads=args.read_threads)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
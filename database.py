@@ -1,20 +1,399 @@
 import sqlite3
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import hashlib
+import hmac
 import os
+import random
+import threading
+import time
+from reference_data import ReferenceData
+from place_index import PlaceIndex
+from query_stats import InstrumentedConnection, QueryStats, timed
+import sample_data
+from route_search import RouteGraph
+from search_cache import SearchCache
+from seat_inventory import SEAT_FREE, SeatInventory, SeatsUnavailable
+
+# Аэропорты городов берутся из справочников в памяти (ReferenceData), поэтому рейсы
+# ищутся по индексу idx_flights_route_date сразу по маршруту и интервалу дат, без
+# соединений с City и Airports; названия для вывода подставляются тоже из справочников.
+# Цена и число свободных мест берутся из схемы мест (Tickets) для выбранного класса
+# по индексу idx_tickets_flight; рейсы, где мест меньше, чем пассажиров, отсекаются в SQL.
+SEARCH_FLIGHTS_QUERY = '''
+SELECT * FROM (
+    SELECT 
+        f.FlightID,
+        f.AirlineID,
+        f.OriginAirportID,
+        f.DestinationAirportID,
+        date(f.DepartureDate) as DepartureDate,
+        time(f.DepartureDate) as DepartureTime,
+        time(f.ArrivalDate) as ArrivalTime,
+        (SELECT MIN(t.Price) FROM Tickets t
+         WHERE t.FlightID = f.FlightID AND t.Class = :travel_class AND t.Status = :free) as Price,
+        (SELECT COUNT(*) FROM Tickets t
+         WHERE t.FlightID = f.FlightID AND t.Class = :travel_class AND t.Status = :free) as FreeSeats
+    FROM Flights f
+    WHERE f.OriginAirportID IN ({origins})
+    AND f.DestinationAirportID IN ({destinations})
+    AND f.DepartureDate >= :day_start AND f.DepartureDate < :day_end
+    AND f.AvailableSeats >= :passengers
+)
+WHERE FreeSeats >= :passengers
+ORDER BY Price ASC, FlightID ASC
+LIMIT :limit OFFSET :offset
+'''
+SEARCH_PAGE_SIZE = 50
+
+# Минимальная цена выбранного класса по дням для маршрута: одним запросом по тем же
+# индексам, что и поиск (idx_flights_route_date, idx_tickets_flight), с группировкой по дате
+FARE_CALENDAR_QUERY = '''
+SELECT Day, MIN(Price) FROM (
+    SELECT 
+        date(f.DepartureDate) as Day,
+        (SELECT MIN(t.Price) FROM Tickets t
+         WHERE t.FlightID = f.FlightID AND t.Class = :travel_class AND t.Status = :free) as Price,
+        (SELECT COUNT(*) FROM Tickets t
+         WHERE t.FlightID = f.FlightID AND t.Class = :travel_class AND t.Status = :free) as FreeSeats
+    FROM Flights f
+    WHERE f.OriginAirportID IN ({origins})
+    AND f.DestinationAirportID IN ({destinations})
+    AND f.DepartureDate >= :day_start AND f.DepartureDate < :day_end
+    AND f.AvailableSeats >= :passengers
+)
+WHERE FreeSeats >= :passengers
+GROUP BY Day
+'''
+FARE_CALENDAR_DAYS = 7
+
+# Настройки, общие для всех процессов, работающих с файлом базы (стоимость KDF и т.п.)
+SETTINGS_TABLE = 'CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)'
+KDF_SETTING = 'password_kdf'
+KDF_TARGET_MS = 250
+
+
+class StorageConfig:
+    """Настройки хранения, применяемые к каждому новому соединению.
+
+    По умолчанию WAL: читатели не блокируются пишущей транзакцией, а пишущие
+    терминалы ждут друг друга до busy_timeout мс. synchronous=NORMAL в режиме
+    WAL не теряет согласованность базы при сбое, только последние транзакции.
+    Если блокировку на запись не удалось получить за busy_timeout, BEGIN
+    IMMEDIATE повторяется до busy_retries раз с экспоненциальной задержкой.
+    """
+
+    def __init__(self, journal_mode='WAL', synchronous='NORMAL', busy_timeout=5000,
+                 mmap_size=256 * 1024 * 1024, cache_size=-32000, temp_store='MEMORY',
+                 busy_retries=5, retry_delay=0.05, max_retry_delay=1.0):
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout  # мс
+        self.mmap_size = mmap_size  # байт
+        self.cache_size = cache_size  # отрицательное значение - в КиБ
+        self.temp_store = temp_store
+        self.busy_retries = busy_retries
+        self.retry_delay = retry_delay  # с
+        self.max_retry_delay = max_retry_delay
+
+    @classmethod
+    def legacy(cls):
+        """Прежнее поведение: журнал отката и настройки sqlite3 по умолчанию"""
+        return cls(journal_mode='DELETE', synchronous='FULL', mmap_size=0, cache_size=-2000,
+                   temp_store='DEFAULT', busy_retries=0)
+
+    def connect(self, db_name, factory=sqlite3.Connection):
+        conn = sqlite3.connect(db_name, timeout=self.busy_timeout / 1000, check_same_thread=False,
+                               factory=factory)
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+        if self.journal_mode:
+            conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size = {int(self.cache_size)}')
+        conn.execute(f'PRAGMA temp_store = {self.temp_store}')
+        return conn
+
+    def settings(self, conn):
+        """Фактические значения настроек соединения"""
+        names = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+        return {name: conn.execute(f'PRAGMA {name}').fetchone()[0] for name in names}
+
+    @staticmethod
+    def is_busy(error):
+        message = str(error).lower()
+        return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+    def retry_delays(self):
+        """Задержки между повторами: экспоненциальный рост со случайным разбросом"""
+        for attempt in range(self.busy_retries):
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** attempt)
+            yield delay * random.uniform(0.5, 1.0)
+
+
+class ConnectionManager:
+    """Держит открытыми соединения с базой: по одному на поток, с повторным использованием"""
+
+    def __init__(self, db_name, storage=None, query_stats=None):
+        self.db_name = db_name
+        self.storage = storage or StorageConfig()
+        self.query_stats = query_stats  # QueryStats: замеры каждого запроса
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # идентификатор потока -> соединение
+        self.opened = 0
+        self.reused = 0
+        self.busy_retries = 0
+
+    def _acquire(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Соединение живет столько же, сколько поток, поэтому проверку потока отключаем
+            # только ради close_all(), который может вызываться из другого потока
+            if self.query_stats is not None:
+                conn = self.storage.connect(self.db_name, InstrumentedConnection)
+                conn.stats = self.query_stats
+            else:
+                conn = self.storage.connect(self.db_name)
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+                self.opened += 1
+        else:
+            with self._lock:
+                self.reused += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Соединение текущего потока для чтения, без управления транзакцией"""
+        yield self._acquire()
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Соединение текущего потока в транзакции: commit при успехе, rollback при ошибке.
+        Вложенные вызовы входят во внешнюю транзакцию. С immediate=True блокировка
+        на запись берется сразу (BEGIN IMMEDIATE), а не при первом изменении: в
+        режиме WAL отложенная транзакция, прочитавшая устаревший снимок, получает
+        SQLITE_BUSY без ожидания, поэтому все пишущие методы используют immediate."""
+        conn = self._acquire()
+        if immediate and self._local.depth == 0 and not conn.in_transaction:
+            self._begin_immediate(conn)
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.rollback()
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.commit()
+
+    def _begin_immediate(self, conn):
+        """BEGIN IMMEDIATE с повторами, если другой процесс дольше busy_timeout держит запись"""
+        for delay in self.storage.retry_delays():
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if not self.storage.is_busy(e):
+                    raise
+            with self._lock:
+                self.busy_retries += 1
+            time.sleep(delay)
+        conn.execute('BEGIN IMMEDIATE')
+
+    def stats(self):
+        """Счетчики открытых и повторно использованных соединений и повторов при занятой базе"""
+        with self._lock:
+            return {'opened': self.opened, 'reused': self.reused, 'open': len(self._connections),
+                    'busy_retries': self.busy_retries}
+
+    def interrupt(self, thread_id):
+        """Прерывает запрос, выполняющийся в соединении указанного потока"""
+        with self._lock:
+            conn = self._connections.get(thread_id)
+        if conn is not None:
+            conn.interrupt()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            conn.close()
+        # Соединения других потоков закрыты, при следующем обращении откроются заново
+        self._local = threading.local()
+
+
+class PasswordHasher:
+    """Хеширование паролей через KDF с настраиваемой стоимостью.
+
+    Хеш хранится в столбце users.password в виде "алгоритм$стоимость$hex", соль -
+    в users.salt. Для scrypt стоимость - параметр N (r=8, p=1), для pbkdf2_sha256 -
+    число итераций. Старые хеши (SHA-256 от пароля с солью, 64 hex-символа без
+    префикса) проверяются как раньше, needs_rehash() для них возвращает True.
+    """
+    DEFAULT_COSTS = {'scrypt': 2 ** 14, 'pbkdf2_sha256': 600_000}
+    SCRYPT_R = 8
+    SCRYPT_P = 1
+
+    def __init__(self, algorithm='scrypt', cost=None):
+        if algorithm not in self.DEFAULT_COSTS:
+            raise ValueError(f"Неизвестный алгоритм хеширования: {algorithm}")
+        self.algorithm = algorithm
+        self.cost = cost or self.DEFAULT_COSTS[algorithm]
+
+    @classmethod
+    def derive(cls, algorithm, cost, password, salt):
+        if algorithm == 'scrypt':
+            # maxmem с запасом: по умолчанию OpenSSL ограничивает память 32 МБ
+            return hashlib.scrypt(password.encode(), salt=salt, n=cost, r=cls.SCRYPT_R, p=cls.SCRYPT_P,
+                                  maxmem=256 * cls.SCRYPT_R * cost + 2 ** 20)
+        if algorithm == 'pbkdf2_sha256':
+            return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, cost)
+        raise ValueError(f"Неизвестный алгоритм хеширования: {algorithm}")
+
+    def hash(self, password, salt):
+        digest = self.derive(self.algorithm, self.cost, password, salt)
+        return f"{self.algorithm}${self.cost}${digest.hex()}"
+
+    @staticmethod
+    def legacy_hash(password, salt):
+        return hashlib.sha256(password.encode() + salt).hexdigest()
+
+    def verify(self, stored_password, salt, password):
+        """Проверка пароля; сравнение за постоянное время"""
+        if '$' not in stored_password:
+            expected, provided = stored_password, self.legacy_hash(password, salt)
+        else:
+            try:
+                algorithm, cost, expected = stored_password.split('$')
+                provided = self.derive(algorithm, int(cost), password, salt).hex()
+            except ValueError:
+                return False
+        return hmac.compare_digest(expected.encode(), provided.encode())
+
+    def needs_rehash(self, stored_password):
+        """True, если хеш получен другим алгоритмом или с другой стоимостью"""
+        return not stored_password.startswith(f"{self.algorithm}${self.cost}$")
+
+    @classmethod
+    def calibrate(cls, target_ms=250, algorithm='scrypt', salt=b'\0' * 32):
+        """Подбирает стоимость, при которой проверка пароля на этой машине
+        занимает не меньше target_ms. Возвращает (стоимость, время в мс)."""
+        def measure(cost):
+            started = time.perf_counter()
+            cls.derive(algorithm, cost, 'calibration', salt)
+            return (time.perf_counter() - started) * 1000
+
+        if algorithm == 'pbkdf2_sha256':
+            # Время PBKDF2 линейно по числу итераций
+            probe = 100_000
+            cost = max(probe, int(probe * target_ms / max(measure(probe), 1e-3)))
+            return cost, measure(cost)
+
+        # N для scrypt - степень двойки; память растет вместе с N
+        cost = 2 ** 12
+        elapsed = measure(cost)
+        while elapsed < target_ms and cost < 2 ** 20:
+            cost *= 2
+            elapsed = measure(cost)
+        return cost, elapsed
+
+
+def configured_hasher(db_name, cost=None, algorithm='scrypt', target_ms=KDF_TARGET_MS, storage=None):
+    """PasswordHasher для файла базы со стоимостью из таблицы settings.
+
+    При первом запуске стоимость подбирается PasswordHasher.calibrate() и
+    сохраняется, так что все процессы (окна, сервер бронирования) хешируют
+    одинаково и не перехешируют пароли друг за другом. cost (--kdf-cost)
+    задает и сохраняет стоимость явно.
+    """
+    conn = (storage or StorageConfig()).connect(db_name)
+    try:
+        with conn:
+            conn.execute(SETTINGS_TABLE)
+        if cost is not None:
+            # Явная стоимость заменяет сохраненную
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)',
+                             (KDF_SETTING, f'{algorithm}${cost}'))
+        elif conn.execute('SELECT 1 FROM settings WHERE name = ?', (KDF_SETTING,)).fetchone() is None:
+            cost, elapsed = PasswordHasher.calibrate(target_ms, algorithm)
+            print(f"Стоимость хеширования паролей подобрана: {algorithm} {cost} ({elapsed:.0f} мс)")
+            # Если другой процесс успел сохранить свою калибровку, используется она
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)',
+                             (KDF_SETTING, f'{algorithm}${cost}'))
+        value = conn.execute('SELECT value FROM settings WHERE name = ?', (KDF_SETTING,)).fetchone()[0]
+    finally:
+        conn.close()
+    algorithm, cost = value.split('$')
+    return PasswordHasher(algorithm, int(cost))
+
 
 class Database:
-    def __init__(self, db_name='airline_system.db'):
+    # Нумерованные шаги миграции схемы. Номер последнего примененного шага хранится
+    # в PRAGMA user_version, поэтому на актуальной базе при запуске DDL не выполняется.
+    # Шаги идемпотентны: базы, созданные до появления миграций (user_version = 0),
+    # проходят их без потери данных. Новые индексы и столбцы добавляются в конец списка.
+    MIGRATIONS = (
+        (1, 'create_tables'),
+        (2, 'create_indexes'),
+        (3, 'seed_sample_data'),
+        (4, 'create_seat_indexes'),
+        (5, 'build_seat_maps'),
+        (6, 'create_ticket_history_index'),
+        (7, 'create_settings'),
+    )
+    SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+    def __init__(self, db_name='airline_system.db', hasher=None, storage=None, query_stats=None,
+                 seed_sample=True):
         self.db_name = db_name
-        self.create_tables()
-        # Проверяем, есть ли уже данные в таблицах
-        if self.is_database_empty():
-            self.insert_sample_data()
+        # seed_sample=False: новая база без демонстрационного расписания (для замеров)
+        self.seed_sample = seed_sample
+        self.hasher = hasher or PasswordHasher()
+        # Замеры методов и запросов включены по умолчанию; query_stats=False отключает их
+        self.query_stats = QueryStats() if query_stats is None else query_stats or None
+        # Общий файл базы для нескольких терминалов: WAL и ожидание блокировок (StorageConfig)
+        self.pool = ConnectionManager(db_name, storage, self.query_stats)
+        self.seats = SeatInventory()
+        self.search_cache = SearchCache()
+        self.refdata = ReferenceData(self.pool)
+        self.places = PlaceIndex(self.refdata)
+        self.routes = RouteGraph(self.pool)
+        self.migrate()
+
+    def schema_version(self):
+        with self.pool.connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    @timed
+    def migrate(self):
+        """Применяет недостающие миграции и возвращает итоговую версию схемы"""
+        version = self.schema_version()
+        if version >= self.SCHEMA_VERSION:
+            return version
+
+        for number, step in self.MIGRATIONS:
+            # Каждый шаг в своей транзакции; IMMEDIATE не дает двум процессам
+            # выполнить одну и ту же миграцию параллельно
+            with self.pool.transaction(immediate=True) as conn:
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if number <= version:
+                    continue
+                getattr(self, step)(conn.cursor())
+                conn.execute(f'PRAGMA user_version = {number}')
+        return self.SCHEMA_VERSION
+
+    def create_tables(self, cursor):
+        """Миграция 1: базовая схема и учетная запись администратора"""
     
-    def create_tables(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
         # Создание таблицы users
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -26,7 +405,7 @@ class Database:
             role VARCHAR(20) DEFAULT 'user'
         )
         ''')
-        
+    
         # Check if admin exists
         cursor.execute('SELECT * FROM users WHERE login = ?', ('admin',))
         if not cursor.fetchone():
@@ -47,7 +426,7 @@ class Database:
             ContactInfo VARCHAR(255)
         )
         ''')
-        
+    
         # Create Country table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS Country (
@@ -55,7 +434,7 @@ class Database:
             Name VARCHAR(255) NOT NULL
         )
         ''')
-        
+    
         # Create City table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS City (
@@ -65,7 +444,7 @@ class Database:
             FOREIGN KEY (CountryID) REFERENCES Country(CountryID)
         )
         ''')
-        
+    
         # Create Airports table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS Airports (
@@ -76,7 +455,7 @@ class Database:
             FOREIGN KEY (CityID) REFERENCES City(CityID)
         )
         ''')
-        
+    
         # Create Flights table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS Flights (
@@ -93,7 +472,7 @@ class Database:
             FOREIGN KEY (DestinationAirportID) REFERENCES Airports(AirportID)
         )
         ''')
-        
+    
         # Create Purchased Tickets table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS PurchasedTickets (
@@ -110,7 +489,7 @@ class Database:
             FOREIGN KEY (UserID) REFERENCES users(user_id)
         )
         ''')
-        
+    
         # Create Passengers table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS Passengers (
@@ -121,7 +500,7 @@ class Database:
             PhoneNumber VARCHAR(15)
         )
         ''')
-        
+    
         # Create Tickets table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS Tickets (
@@ -137,386 +516,536 @@ class Database:
             FOREIGN KEY (FlightID) REFERENCES Flights(FlightID)
         )
         ''')
-        
-        conn.commit()
-        conn.close()
+
+    def create_indexes(self, cursor):
+        """Миграция 2: вторичные индексы для поиска рейсов по маршруту и дате"""
+        # Поиск идет от названия города к его аэропортам, затем к рейсам по маршруту и дате
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_city_name ON City(Name)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_airports_city ON Airports(CityID)')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_flights_route_date
+        ON Flights(OriginAirportID, DestinationAirportID, DepartureDate)
+        ''')
+    
+    def create_seat_indexes(self, cursor):
+        """Миграция 4: индекс схемы мест (Tickets) по рейсу, классу и статусу; Price делает его
+        покрывающим для цены класса в поиске"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_flight ON Tickets(FlightID, Class, Status, Price)')
+    
+    def build_seat_maps(self, cursor):
+        """Миграция 5: схемы мест для всех рейсов, чтобы поиск видел места каждого класса"""
+        flight_ids = [row[0] for row in cursor.execute('SELECT FlightID FROM Flights').fetchall()]
+        for flight_id in flight_ids:
+            self.seats.ensure_seat_map(cursor, flight_id)
+    
+    def create_ticket_history_index(self, cursor):
+        """Миграция 6: индекс истории покупок пользователя (get_user_tickets)"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_purchased_user ON PurchasedTickets(UserID, PurchaseDate)')
+    
+    def create_settings(self, cursor):
+        """Миграция 7: общие настройки базы (стоимость KDF, см. configured_hasher)"""
+        cursor.execute(SETTINGS_TABLE)
     
     def hash_password(self, password, salt=None):
-        """Хеширует пароль с использованием SHA-256 и соли"""
+        """Хеширует пароль через KDF (self.hasher) с солью"""
         if salt is None:
             salt = os.urandom(32)  # 32 байта случайной соли
-        # Комбинируем пароль и соль
-        salted_password = password.encode() + salt
-        # Хешируем комбинацию
-        hashed = hashlib.sha256(salted_password).hexdigest()
-        return hashed, salt
+        return self.hasher.hash(password, salt), salt
 
     def verify_password(self, stored_password, stored_salt, provided_password):
         """Проверяет соответствие введенного пароля хешированному"""
-        # Хешируем предоставленный пароль с сохраненной солью
-        hashed_provided, _ = self.hash_password(provided_password, stored_salt)
-        return stored_password == hashed_provided
+        return self.hasher.verify(stored_password, stored_salt, provided_password)
 
     def is_database_empty(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        # Проверяем количество записей в основных таблицах
-        cursor.execute("SELECT COUNT(*) FROM Airlines")
-        airlines_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM Country")
-        country_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM Flights")
-        flights_count = cursor.fetchone()[0]
-        
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Проверяем количество записей в основных таблицах
+            cursor.execute("SELECT COUNT(*) FROM Airlines")
+            airlines_count = cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(*) FROM Country")
+            country_count = cursor.fetchone()[0]
+            
+            cursor.execute("SELECT COUNT(*) FROM Flights")
+            flights_count = cursor.fetchone()[0]
         
         # Возвращаем True, если все таблицы пустые
         return airlines_count == 0 and country_count == 0 and flights_count == 0
     
+    @timed
     def register_user(self, login, email, password, role='user'):
-        if self.check_login_exists(login):
-            return False, "Логин уже существует"
-        if self.check_email_exists(email):
-            return False, "Email уже существует"
-        
-        # Хешируем пароль перед сохранением
         hashed_password, salt = self.hash_password(password)
-        
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        return self.insert_user(login, email, hashed_password, salt, role)
+
+    @timed
+    def insert_user(self, login, email, hashed_password, salt, role='user'):
+        """Добавляет пользователя с готовым хешем пароля (одиночный INSERT без KDF)"""
+        # Уникальность логина и email проверяет сама база (UNIQUE), без предварительных запросов
         try:
-            cursor.execute('INSERT INTO users (login, email, password, salt, role) VALUES (?, ?, ?, ?, ?)',
-                          (login, email, hashed_password, salt, role))
-            conn.commit()
+            with self.pool.transaction(immediate=True) as conn:
+                conn.execute('INSERT INTO users (login, email, password, salt, role) VALUES (?, ?, ?, ?, ?)',
+                             (login, email, hashed_password, salt, role))
             return True, "Регистрация успешна"
+        except sqlite3.IntegrityError as e:
+            if 'users.login' in str(e):
+                return False, "Пользователь с таким логином уже существует"
+            if 'users.email' in str(e):
+                return False, "Пользователь с таким email уже существует"
+            return False, f"Ошибка при регистрации: {str(e)}"
         except Exception as e:
             return False, f"Ошибка при регистрации: {str(e)}"
-        finally:
-            conn.close()
 
+    @timed
+    def check_availability(self, login=None, email=None):
+        """Одним запросом проверяет, заняты ли логин и email: (логин занят, email занят).
+        Оба поиска идут по индексам ограничений UNIQUE и не читают саму таблицу."""
+        with self.pool.connection() as conn:
+            login_taken, email_taken = conn.execute(
+                'SELECT EXISTS(SELECT 1 FROM users WHERE login = ?), EXISTS(SELECT 1 FROM users WHERE email = ?)',
+                (login, email)).fetchone()
+        return bool(login_taken), bool(email_taken)
+
+    @timed
     def check_credentials(self, login, password):
         """Проверяет учетные данные пользователя и возвращает роль в случае успеха"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        record = self.get_password_record(login)
+        if record:
+            return self.verify_credentials(login, record, password)
+        return None
+
+    @timed
+    def get_password_record(self, login):
+        """(хеш пароля, соль, роль) пользователя или None, если логина нет"""
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT password, salt, role FROM users WHERE login = ?', (login,)).fetchone()
+
+    @timed
+    def verify_credentials(self, login, record, password, rehash=True):
+        """Проверяет пароль по записи из get_password_record; возвращает роль или None.
+        rehash=False: устаревший хеш не перезаписывается, это делает вызывающий"""
+        stored_password, stored_salt, role = record
+        if self.verify_password(stored_password, stored_salt, password):
+            if rehash and self.hasher.needs_rehash(stored_password):
+                self.rehash_password(login, stored_password, password)
+            return role
+        return None
+
+    @timed
+    def rehash_password(self, login, stored_password, password):
+        """Перехеширует пароль текущим KDF после успешного входа (старые SHA-256 хеши и смена стоимости)"""
+        hashed_password, salt = self.hash_password(password)
+        self.replace_password_hash(login, stored_password, hashed_password, salt)
+
+    @timed
+    def replace_password_hash(self, login, stored_password, hashed_password, salt):
+        """Записывает готовый новый хеш пароля вместо stored_password (одиночный UPDATE без KDF)"""
         try:
-            # Получаем хешированный пароль и соль для данного логина
-            cursor.execute('SELECT password, salt, role FROM users WHERE login = ?', (login,))
-            result = cursor.fetchone()
-            
-            if result:
-                stored_password, stored_salt, role = result
-                # Проверяем пароль
-                if self.verify_password(stored_password, stored_salt, password):
-                    return role
-            return None
-        finally:
-            conn.close()
+            with self.pool.transaction(immediate=True) as conn:
+                # Условие на старый хеш: если пароль успели сменить, ничего не перезаписываем
+                conn.execute('UPDATE users SET password = ?, salt = ? WHERE login = ? AND password = ?',
+                             (hashed_password, salt, login, stored_password))
+        except Exception as e:
+            print(f"Ошибка при обновлении хеша пароля: {e}")
 
     def check_user_exists(self, login, password):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT role FROM users WHERE login = ? AND password = ?', (login, password))
-        result = cursor.fetchone()
-        conn.close()
+        with self.pool.connection() as conn:
+            result = conn.execute('SELECT role FROM users WHERE login = ? AND password = ?',
+                                  (login, password)).fetchone()
         if result:
             return True, result[0]  # Return True and user role
         return False, None
     
     def check_login_exists(self, login):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE login = ?', (login,))
-        user = cursor.fetchone()
-        conn.close()
-        return user is not None
+        return self.check_availability(login=login)[0]
     
     def check_email_exists(self, email):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-        user = cursor.fetchone()
-        conn.close()
-        return user is not None
+        return self.check_availability(email=email)[1]
 
+    @timed
     def get_user_id(self, login):
         """Получает ID пользователя по логину"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_id FROM users WHERE login = ?', (login,))
-        result = cursor.fetchone()
-        conn.close()
+        with self.pool.connection() as conn:
+            result = conn.execute('SELECT user_id FROM users WHERE login = ?', (login,)).fetchone()
         return result[0] if result else None
 
-    def search_tickets(self, origin_city, destination_city, departure_date, return_date=None, passenger_count=1, travel_class='Economy'):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        query = '''
-        SELECT 
-            f.FlightID,
-            a.Name as Airline,
-            f.FlightID as FlightNumber,
-            oc.Name as Origin,
-            o.IATA_Code as OriginCode,
-            dc.Name as Destination,
-            d.IATA_Code as DestinationCode,
-            date(f.DepartureDate) as DepartureDate,
-            time(f.DepartureDate) as DepartureTime,
-            time(f.ArrivalDate) as ArrivalTime,
-            f.Price
-        FROM Flights f
-        JOIN Airlines a ON f.AirlineID = a.AirlineID
-        JOIN Airports o ON f.OriginAirportID = o.AirportID
-        JOIN Airports d ON f.DestinationAirportID = d.AirportID
-        JOIN City oc ON o.CityID = oc.CityID
-        JOIN City dc ON d.CityID = dc.CityID
-        WHERE oc.Name = ? AND dc.Name = ?
-        AND date(f.DepartureDate) = ?
-        ORDER BY f.Price ASC
-        '''
-        
-        params = [origin_city, destination_city, departure_date]
-        cursor.execute(query, params)
-        outbound_tickets = cursor.fetchall()
-        
+    @staticmethod
+    def day_range(day):
+        """Полуоткрытый интервал [day, day + 1) для сравнения с DepartureDate без функций над столбцом"""
+        start = datetime.strptime(day, '%Y-%m-%d')
+        return start.strftime('%Y-%m-%d'), (start + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    def search_query(self, origin_airports, destination_airports, departure_date, passenger_count=1,
+                     travel_class='Economy', page=0, page_size=SEARCH_PAGE_SIZE, query=SEARCH_FLIGHTS_QUERY):
+        """Текст запроса поиска и его параметры для заданных списков аэропортов"""
+        day_start, day_end = self.day_range(departure_date)
+        params = {
+            'day_start': day_start, 'day_end': day_end,
+            'passengers': passenger_count, 'travel_class': travel_class, 'free': SEAT_FREE,
+            'limit': page_size, 'offset': page * page_size,
+        }
+        params.update((f'o{n}', airport_id) for n, airport_id in enumerate(origin_airports))
+        params.update((f'd{n}', airport_id) for n, airport_id in enumerate(destination_airports))
+        query = query.format(
+            origins=', '.join(f':o{n}' for n in range(len(origin_airports))),
+            destinations=', '.join(f':d{n}' for n in range(len(destination_airports))))
+        return query, params
+
+    @timed
+    def search_tickets(self, origin_city, destination_city, departure_date, return_date=None, passenger_count=1,
+                       travel_class='Economy', page=0, page_size=SEARCH_PAGE_SIZE):
+        """Ищет рейсы с ценой выбранного класса, на которые хватает мест для всех пассажиров.
+        Результаты отсортированы по цене и разбиты на страницы по page_size строк."""
+        outbound_tickets = self.search_leg(origin_city, destination_city, departure_date,
+                                           passenger_count, travel_class, page, page_size)
         return_tickets = []
         if return_date:
-            cursor.execute(query, [destination_city, origin_city, return_date])
-            return_tickets = cursor.fetchall()
-        
-        conn.close()
+            return_tickets = self.search_leg(destination_city, origin_city, return_date,
+                                             passenger_count, travel_class, page, page_size)
         return outbound_tickets, return_tickets
 
-    def insert_sample_data(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
+    def airports_for_place(self, name):
+        """Аэропорты города по точному названию, иначе - без учета регистра, по коду IATA или аэропорту"""
+        return self.refdata.airports_for_city_name(name) or self.places.airports_for(name)
+
+    @timed
+    def suggest_places(self, text, limit=10):
+        """Подсказки при вводе города: [(название города, подпись)]"""
+        return self.places.suggest(text, limit)
+
+    @timed
+    def search_leg(self, origin_city, destination_city, departure_date, passenger_count=1,
+                   travel_class='Economy', page=0, page_size=SEARCH_PAGE_SIZE):
+        """Рейсы в одну сторону; повторные поиски обслуживаются из search_cache.
+        Ключ кэша - найденные аэропорты, а не введенный текст (см. SearchCache)."""
+        origin_airports = self.airports_for_place(origin_city)
+        destination_airports = self.airports_for_place(destination_city)
+        if not origin_airports or not destination_airports:
+            # Неизвестное место не кэшируется: рейс в новый город найдется сразу после добавления
+            return []
+        key = (tuple(sorted(origin_airports)), tuple(sorted(destination_airports)), departure_date,
+               travel_class, passenger_count, page, page_size)
+        tickets = self.search_cache.get(key)
+        if tickets is None:
+            # Отметка до запроса: покупка, завершившаяся во время чтения, не даст закэшировать старые места
+            generation = self.search_cache.generation(key)
+            query, params = self.search_query(origin_airports, destination_airports, departure_date,
+                                              passenger_count, travel_class, page, page_size)
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+            tickets = [self.render_flight(row) for row in rows]
+            self.search_cache.put(key, tickets, generation)
+        return tickets
+
+    def render_flight(self, row):
+        """Строка результата поиска в прежнем формате, названия - из справочников"""
+        flight_id, airline_id, origin_id, destination_id, date, departure, arrival, price, free_seats = row
+        _, origin_city, origin_code = self.refdata.airport(origin_id)
+        _, destination_city, destination_code = self.refdata.airport(destination_id)
+        return (flight_id, self.refdata.airline_name(airline_id), flight_id,
+                origin_city, origin_code, destination_city, destination_code,
+                date, departure, arrival, price, free_seats)
+
+    @timed
+    def search_connections(self, origin_city, destination_city, departure_date, passenger_count=1,
+                           travel_class='Economy', max_stops=1, limit=5):
+        """Маршруты с пересадками (включая прямые рейсы) с первым вылетом в departure_date.
+
+        Возвращает (самые дешевые, самые быстрые): списки (цена за пассажира,
+        длительность в минутах, рейсы), где рейсы - строки в формате search_tickets.
+        Кандидаты ищет RouteGraph в памяти; цены выбранного класса и наличие мест
+        на всех рейсах проверяются одним запросом."""
+        origin_airports = self.airports_for_place(origin_city)
+        destination_airports = self.airports_for_place(destination_city)
+        if not origin_airports or not destination_airports:
+            return [], []
+
+        # С запасом: часть маршрутов отсеется по местам выбранного класса
+        candidates = {
+            order: self.routes.search(origin_airports, destination_airports, departure_date,
+                                      max_stops=max_stops, order=order, limit=limit * 3)
+            for order in ('price', 'duration')
+        }
+        flight_ids = sorted({flight_id for found in candidates.values() for _, _, path in found
+                             for flight_id in path})
+        if not flight_ids:
+            return [], []
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT f.FlightID, f.AirlineID, f.OriginAirportID, f.DestinationAirportID,
+                       date(f.DepartureDate), time(f.DepartureDate), time(f.ArrivalDate),
+                       MIN(t.Price), COUNT(t.TicketID)
+                FROM Flights f
+                JOIN Tickets t ON t.FlightID = f.FlightID AND t.Class = ? AND t.Status = ?
+                WHERE f.FlightID IN ({', '.join('?' * len(flight_ids))})
+                GROUP BY f.FlightID
+                HAVING COUNT(t.TicketID) >= ?
+            ''', (travel_class, SEAT_FREE, *flight_ids, passenger_count)).fetchall()
+        legs = {row[0]: self.render_flight(row) for row in rows}
+
+        def itineraries(found):
+            result = []
+            for _, duration, path in found:
+                if all(flight_id in legs for flight_id in path):
+                    route = [legs[flight_id] for flight_id in path]
+                    result.append((sum(leg[10] for leg in route), duration, route))
+            return result
+
+        cheapest = sorted(itineraries(candidates['price']), key=lambda item: (item[0], item[1]))
+        fastest = sorted(itineraries(candidates['duration']), key=lambda item: (item[1], item[0]))
+        return cheapest[:limit], fastest[:limit]
+
+    @timed
+    def fare_calendar(self, origin_city, destination_city, center_date, days=FARE_CALENDAR_DAYS,
+                      passenger_count=1, travel_class='Economy'):
+        """Минимальная цена по дням в окне center_date ± days: {дата: цена}, дни без рейсов пропускаются.
+
+        Цена каждого дня кэшируется в search_cache под ключом аэропортов маршрута и даты,
+        поэтому покупка или новый рейс сбрасывают только свой день. Дни, которых нет в
+        кэше, читаются одним запросом с группировкой по дате."""
+        center = datetime.strptime(center_date, '%Y-%m-%d')
+        window = [(center + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(-days, days + 1)]
+        origin_airports = self.airports_for_place(origin_city)
+        destination_airports = self.airports_for_place(destination_city)
+        if not origin_airports or not destination_airports:
+            return {}
+        origins, destinations = tuple(sorted(origin_airports)), tuple(sorted(destination_airports))
+
+        def key(day):
+            return origins, destinations, day, travel_class, passenger_count, 'fare'
+
+        fares = {}
+        missing = []
+        generations = {}
+        for day in window:
+            cached = self.search_cache.get(key(day))
+            if cached is None:
+                missing.append(day)
+                generations[day] = self.search_cache.generation(key(day))
+            elif cached:
+                fares[day] = cached[0]
+        if not missing:
+            return fares
+
+        query, params = self.search_query(origin_airports, destination_airports, missing[0],
+                                          passenger_count, travel_class, query=FARE_CALENDAR_QUERY)
+        params['day_end'] = self.day_range(missing[-1])[1]
+        with self.pool.connection() as conn:
+            found = dict(conn.execute(query, params).fetchall())
+        for day in missing:
+            price = found.get(day)
+            # Дни без рейсов тоже кэшируются, чтобы не запрашивать их снова
+            self.search_cache.put(key(day), [price] if price is not None else [], generations[day])
+            if price is not None:
+                fares[day] = price
+        return fares
+
+    def search_cache_stats(self):
+        """Статистика кэша поиска: попадания, промахи, вытеснения"""
+        return self.search_cache.stats()
+
+    def flight_airports(self, cursor, flight_id):
+        """(аэропорт отправления, аэропорт прибытия, дата вылета) рейса - ключ инвалидации кэша поиска"""
+        return cursor.execute(
+            'SELECT OriginAirportID, DestinationAirportID, date(DepartureDate) FROM Flights WHERE FlightID = ?',
+            (flight_id,)).fetchone()
+
+    def flight_route(self, cursor, flight_id):
+        """(город отправления, город прибытия, дата вылета) рейса"""
+        row = self.flight_airports(cursor, flight_id)
+        if not row:
+            return None
+        origin_id, destination_id, departure_date = row
+        return self.refdata.airport(origin_id)[1], self.refdata.airport(destination_id)[1], departure_date
+
+    def explain_search_plan(self, origin_airports=(1,), destination_airports=(2,), departure_date='2000-01-01'):
+        """Возвращает EXPLAIN QUERY PLAN запроса поиска рейсов (для проверки использования индексов)"""
+        query, params = self.search_query(origin_airports, destination_airports, departure_date)
+        with self.pool.connection() as conn:
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + query, params).fetchall()
+        return [row[3] for row in rows]
+
+    def seed_sample_data(self, cursor):
+        """Миграция 3: тестовые данные для пустой базы"""
+        if self.seed_sample and self.is_database_empty():
+            summary = sample_data.generate(cursor, self.seats)
+            print(f"Тестовые данные успешно добавлены: {summary['flights']} рейсов "
+                  f"на {summary['days']} дней с {summary['start_date']}")
+
+    @timed
+    def insert_sample_data(self, seed=1, start_date=None, days=30, extra_cities=0, flights=None):
+        """Добавляет сгенерированное расписание (см. sample_data.generate) одной транзакцией"""
         try:
-            # Insert Countries
-            cursor.execute("INSERT OR IGNORE INTO Country (Name) VALUES ('Россия'), ('США'), ('Франция'), ('Германия'), ('Италия'), ('Испания'), ('Турция')")
-            
-            # Insert Cities
-            city_data = [
-                ('Москва', 'Россия'),
-                ('Санкт-Петербург', 'Россия'),
-                ('Нью-Йорк', 'США'),
-                ('Париж', 'Франция'),
-                ('Берлин', 'Германия'),
-                ('Рим', 'Италия'),
-                ('Барселона', 'Испания'),
-                ('Стамбул', 'Турция'),
-                ('Сочи', 'Россия'),
-                ('Казань', 'Россия')
-            ]
-            for city, country in city_data:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO City (Name, CountryID)
-                    SELECT ?, CountryID FROM Country WHERE Name = ?
-                """, (city, country))
-            
-            # Insert Airlines
-            airlines_data = [
-                ('Aeroflot', 'SU'),
-                ('Air France', 'AF'),
-                ('American Airlines', 'AA'),
-                ('Lufthansa', 'LH'),
-                ('Turkish Airlines', 'TK'),
-                ('S7 Airlines', 'S7')
-            ]
-            cursor.executemany("INSERT OR IGNORE INTO Airlines (Name, IATA_Code) VALUES (?, ?)", airlines_data)
-            
-            # Insert Airports
-            airports_data = [
-                ('Международный аэропорт Шереметьево', 'Москва', 'SVO'),
-                ('Международный аэропорт Домодедово', 'Москва', 'DME'),
-                ('Аэропорт Пулково', 'Санкт-Петербург', 'LED'),
-                ('Аэропорт Шарль-де-Голль', 'Париж', 'CDG'),
-                ('Международный аэропорт Джона Кеннеди', 'Нью-Йорк', 'JFK'),
-                ('Аэропорт Берлин-Бранденбург', 'Берлин', 'BER'),
-                ('Аэропорт Леонардо да Винчи', 'Рим', 'FCO'),
-                ('Аэропорт Эль-Прат', 'Барселона', 'BCN'),
-                ('Аэропорт Стамбул', 'Стамбул', 'IST'),
-                ('Международный аэропорт Сочи', 'Сочи', 'AER'),
-                ('Международный аэропорт Казань', 'Казань', 'KZN')
-            ]
-            for airport_name, city_name, iata in airports_data:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO Airports (AirportName, CityID, IATA_Code)
-                    SELECT ?, CityID, ? FROM City WHERE Name = ?
-                """, (airport_name, iata, city_name))
-            
-            # Insert Flights
-            flights_data = [
-                # Внутренние рейсы
-                ('Aeroflot', 'SVO', 'LED', '2024-12-20 10:00:00', '2024-12-20 11:30:00', 8500.00),
-                ('Aeroflot', 'LED', 'SVO', '2024-12-20 15:00:00', '2024-12-20 16:30:00', 8000.00),
-                ('S7 Airlines', 'DME', 'LED', '2024-12-20 12:00:00', '2024-12-20 13:30:00', 7500.00),
-                ('S7 Airlines', 'LED', 'DME', '2024-12-20 17:00:00', '2024-12-20 18:30:00', 7000.00),
-                ('Aeroflot', 'SVO', 'AER', '2024-12-21 09:00:00', '2024-12-21 11:30:00', 12000.00),
-                ('Aeroflot', 'AER', 'SVO', '2024-12-25 12:00:00', '2024-12-25 14:30:00', 11500.00),
-                ('S7 Airlines', 'DME', 'KZN', '2024-12-22 08:00:00', '2024-12-22 09:30:00', 6500.00),
-                ('S7 Airlines', 'KZN', 'DME', '2024-12-26 10:00:00', '2024-12-26 11:30:00', 6000.00),
-
-                # Международные рейсы
-                ('Aeroflot', 'SVO', 'CDG', '2024-12-21 08:00:00', '2024-12-21 10:30:00', 35000.00),
-                ('Air France', 'CDG', 'SVO', '2024-12-25 11:00:00', '2024-12-25 13:30:00', 34000.00),
-                ('Lufthansa', 'DME', 'BER', '2024-12-22 09:00:00', '2024-12-22 11:00:00', 32000.00),
-                ('Lufthansa', 'BER', 'DME', '2024-12-26 12:00:00', '2024-12-26 14:00:00', 31000.00),
-                ('Turkish Airlines', 'SVO', 'IST', '2024-12-23 10:00:00', '2024-12-23 13:30:00', 28000.00),
-                ('Turkish Airlines', 'IST', 'SVO', '2024-12-27 14:00:00', '2024-12-27 17:30:00', 27000.00),
-                ('Aeroflot', 'SVO', 'FCO', '2024-12-24 11:00:00', '2024-12-24 13:30:00', 33000.00),
-                ('S7 Airlines', 'DME', 'BCN', '2024-12-24 12:00:00', '2024-12-24 15:30:00', 36000.00)
-            ]
-            
-            for airline, origin, dest, dep_time, arr_time, price in flights_data:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO Flights (AirlineID, DepartureDate, ArrivalDate, 
-                                   OriginAirportID, DestinationAirportID, Price)
-                    SELECT 
-                        a.AirlineID,
-                        ?, ?,
-                        o.AirportID,
-                        d.AirportID,
-                        ?
-                    FROM Airlines a
-                    CROSS JOIN Airports o
-                    CROSS JOIN Airports d
-                    WHERE a.Name = ?
-                    AND o.IATA_Code = ?
-                    AND d.IATA_Code = ?
-                """, (dep_time, arr_time, price, airline, origin, dest))
-            
-            # Insert Tickets for each flight with different classes
-            cursor.execute("SELECT FlightID, Price FROM Flights")
-            flights = cursor.fetchall()
-            
-            for flight in flights:
-                flight_id, base_price = flight
-                
-                # Economy class tickets (3 seats)
-                for seat_num in ['1A', '2A', '3A']:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO Tickets (FlightID, SeatNumber, Price, Status, Class)
-                        VALUES (?, ?, ?, 'Доступен', 'Economy')
-                    """, (flight_id, seat_num, base_price))
-                
-                # Business class tickets (2 seats)
-                for seat_num in ['10A', '10B']:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO Tickets (FlightID, SeatNumber, Price, Status, Class)
-                        VALUES (?, ?, ?, 'Доступен', 'Business')
-                    """, (flight_id, seat_num, base_price * 2))
-                
-                # First class ticket (1 seat)
-                cursor.execute("""
-                    INSERT OR IGNORE INTO Tickets (FlightID, SeatNumber, Price, Status, Class)
-                    VALUES (?, ?, ?, 'Доступен', 'First')
-                """, (flight_id, '20A', base_price * 3))
-            
-            conn.commit()
-            print("Тестовые данные успешно добавлены")
+            with self.pool.transaction(immediate=True) as conn:
+                summary = sample_data.generate(conn.cursor(), self.seats, seed=seed, start_date=start_date,
+                                               days=days, extra_cities=extra_cities, flights=flights)
+            print(f"Тестовые данные успешно добавлены: {summary['flights']} рейсов "
+                  f"на {summary['days']} дней с {summary['start_date']}")
+            return summary
             
         except sqlite3.Error as e:
+            # Транзакция уже откачена менеджером соединений
             print(f"Ошибка при добавлении тестовых данных: {e}")
-            conn.rollback()
+            return None
         finally:
-            conn.close()
+            # Справочники и рейсы добавлены в обход кэшей
+            self.refdata.reset()
+            self.search_cache.clear()
+            self.routes.reset()
 
+    @timed
     def add_flight(self, airline_name, from_city, to_city, departure_datetime, arrival_datetime, price):
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
+            with self.pool.transaction(immediate=True) as conn:
+                cursor = conn.cursor()
+                airline_id, origin_airport_id, dest_airport_id = self.resolve_flight_refs(
+                    cursor, airline_name, from_city, to_city)
             
-            # Get or create airline
-            cursor.execute('SELECT AirlineID FROM Airlines WHERE Name = ?', (airline_name,))
-            airline_result = cursor.fetchone()
-            if airline_result:
-                airline_id = airline_result[0]
-            else:
-                cursor.execute('INSERT INTO Airlines (Name) VALUES (?)', (airline_name,))
-                airline_id = cursor.lastrowid
-            
-            # Get or create cities and airports
-            def get_or_create_city_and_airport(city_name):
-                cursor.execute('SELECT CityID FROM City WHERE Name = ?', (city_name,))
-                city_result = cursor.fetchone()
-                if city_result:
-                    city_id = city_result[0]
-                else:
-                    cursor.execute('INSERT INTO City (Name, CountryID) VALUES (?, 1)', (city_name,))
-                    city_id = cursor.lastrowid
-                
-                cursor.execute('SELECT AirportID FROM Airports WHERE CityID = ?', (city_id,))
-                airport_result = cursor.fetchone()
-                if airport_result:
-                    return airport_result[0]
-                else:
-                    cursor.execute('INSERT INTO Airports (AirportName, CityID) VALUES (?, ?)',
-                                 (f"{city_name} Airport", city_id))
-                    return cursor.lastrowid
-            
-            origin_airport_id = get_or_create_city_and_airport(from_city)
-            dest_airport_id = get_or_create_city_and_airport(to_city)
+                # Add flight
+                cursor.execute('''
+                    INSERT INTO Flights (AirlineID, DepartureDate, ArrivalDate, 
+                                       OriginAirportID, DestinationAirportID, Price)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (airline_id, departure_datetime, arrival_datetime,
+                      origin_airport_id, dest_airport_id, price))
+                flight_id = cursor.lastrowid
             
-            # Add flight
-            cursor.execute('''
-                INSERT INTO Flights (AirlineID, DepartureDate, ArrivalDate, 
-                                   OriginAirportID, DestinationAirportID, Price)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (airline_id, departure_datetime, arrival_datetime,
-                  origin_airport_id, dest_airport_id, price))
+                # Схема мест нового рейса по классам
+                self.seats.ensure_seat_map(cursor, flight_id)
             
-            conn.commit()
-            conn.close()
+            self.search_cache.invalidate_route(origin_airport_id, dest_airport_id, departure_datetime[:10])
+            self.routes.add_flight(flight_id, origin_airport_id, dest_airport_id,
+                                   departure_datetime, arrival_datetime, price)
             return True
             
         except Exception as e:
+            # Справочники могли получить ID из откаченной транзакции
+            self.refdata.reset()
             print(f"Error adding flight: {e}")
             return False
 
-    def purchase_ticket(self, flight_id, user_id, passenger_name, passenger_email, passenger_phone):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
+    def resolve_flight_refs(self, cursor, airline_name, from_city, to_city):
+        """ID авиакомпании и аэропортов рейса по справочникам в памяти; недостающие записи создаются"""
+        # Get or create airline
+        airline_id = self.refdata.airline_id(airline_name)
+        if airline_id is None:
+            cursor.execute('INSERT INTO Airlines (Name) VALUES (?)', (airline_name,))
+            airline_id = cursor.lastrowid
+            self.refdata.add_airline(airline_id, airline_name)
+        
+        # Get or create cities and airports
+        def get_or_create_city_and_airport(city_name):
+            city_id = self.refdata.city_id(city_name)
+            if city_id is None:
+                cursor.execute('INSERT INTO City (Name, CountryID) VALUES (?, 1)', (city_name,))
+                city_id = cursor.lastrowid
+                self.refdata.add_city(city_id, city_name, 1)
             
-            # Check if flight exists and has available seats
-            cursor.execute('SELECT AvailableSeats FROM Flights WHERE FlightID = ?', (flight_id,))
-            result = cursor.fetchone()
-            if not result or result[0] <= 0:
-                return False, "Нет доступных мест"
+            airports = self.refdata.city_airports(city_id)
+            if airports:
+                return airports[0]
+            airport_name = f"{city_name} Airport"
+            cursor.execute('INSERT INTO Airports (AirportName, CityID) VALUES (?, ?)', (airport_name, city_id))
+            self.refdata.add_airport(cursor.lastrowid, airport_name, city_id)
+            return cursor.lastrowid
+        
+        return airline_id, get_or_create_city_and_airport(from_city), get_or_create_city_and_airport(to_city)
+
+    def purchase_ticket(self, flight_id, user_id, passenger_name, passenger_email, passenger_phone,
+                        travel_class='Economy'):
+        passenger = {'name': passenger_name, 'email': passenger_email, 'phone': passenger_phone}
+        success, message, seats = self.purchase_tickets_batch(flight_id, user_id, [passenger], travel_class)
+        if not success:
+            return False, message
+        return True, f"Билет успешно куплен. Номер места: {seats[0]}"
+
+    @timed
+    def purchase_tickets_batch(self, flight_id, user_id, passengers, travel_class='Economy'):
+        """Покупает билеты сразу для всей группы пассажиров в одной транзакции.
+        Возвращает (успех, сообщение, список мест в порядке пассажиров); при ошибке
+        не покупается ни один билет."""
+        if not passengers:
+            return False, "Не указаны пассажиры", []
+        try:
+            # BEGIN IMMEDIATE: блокировка на запись берется до выбора мест,
+            # поэтому два клиента не получат одно и то же место
+            with self.pool.transaction(immediate=True) as conn:
+                cursor = conn.cursor()
             
-            # Generate seat number (simple implementation)
-            cursor.execute('SELECT COUNT(*) FROM PurchasedTickets WHERE FlightID = ?', (flight_id,))
-            seat_count = cursor.fetchone()[0]
-            seat_number = f"A{seat_count + 1}"
+                # Списываем места только если их хватает на всю группу
+                cursor.execute('''
+                    UPDATE Flights SET AvailableSeats = AvailableSeats - ?
+                    WHERE FlightID = ? AND AvailableSeats >= ?
+                ''', (len(passengers), flight_id, len(passengers)))
+                if cursor.rowcount == 0:
+                    return False, "Нет доступных мест", []
             
-            # Add purchased ticket
-            cursor.execute('''
-                INSERT INTO PurchasedTickets 
-                (FlightID, UserID, PassengerName, PassengerEmail, PassengerPhone, SeatNumber)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (flight_id, user_id, passenger_name, passenger_email, passenger_phone, seat_number))
+                # Места нужного класса из схемы мест рейса
+                seats = self.seats.allocate(cursor, flight_id, travel_class, len(passengers))
             
-            # Update available seats
-            cursor.execute('UPDATE Flights SET AvailableSeats = AvailableSeats - 1 WHERE FlightID = ?', 
-                         (flight_id,))
+                # Add purchased tickets
+                cursor.executemany('''
+                    INSERT INTO PurchasedTickets 
+                    (FlightID, UserID, PassengerName, PassengerEmail, PassengerPhone, SeatNumber)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(flight_id, user_id, p['name'], p['email'], p['phone'], seat)
+                      for p, seat in zip(passengers, seats)])
+                route = self.flight_airports(cursor, flight_id)
             
-            conn.commit()
-            conn.close()
-            return True, f"Билет успешно куплен. Номер места: {seat_number}"
+            # Свободных мест стало меньше - результаты поиска по этому направлению устарели
+            if route:
+                self.search_cache.invalidate_route(*route)
+            return True, "Билеты успешно куплены", seats
             
+        except SeatsUnavailable:
+            # Транзакция откачена, кэш схемы мест мог успеть измениться
+            self.seats.invalidate(flight_id)
+            return False, "Нет доступных мест выбранного класса", []
+        except Exception as e:
+            self.seats.invalidate(flight_id)
+            print(f"Error purchasing tickets: {e}")
+            return False, "Ошибка при покупке билетов", []
+
+    @timed
+    def cancel_ticket(self, ticket_id, user_id):
+        """Отменяет купленный билет и возвращает место в продажу"""
+        try:
+            with self.pool.transaction(immediate=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT FlightID, SeatNumber FROM PurchasedTickets
+                    WHERE TicketID = ? AND UserID = ? AND Status = 'active'
+                ''', (ticket_id, user_id))
+                result = cursor.fetchone()
+                if not result:
+                    return False, "Билет не найден"
+                flight_id, seat_number = result
+                cursor.execute("UPDATE PurchasedTickets SET Status = 'cancelled' WHERE TicketID = ?", (ticket_id,))
+                cursor.execute('UPDATE Flights SET AvailableSeats = AvailableSeats + 1 WHERE FlightID = ?',
+                               (flight_id,))
+                self.seats.release(cursor, flight_id, seat_number)
+                route = self.flight_airports(cursor, flight_id)
+            if route:
+                self.search_cache.invalidate_route(*route)
+            return True, "Билет отменен"
         except Exception as e:
-            print(f"Error purchasing ticket: {e}")
-            return False, "Ошибка при покупке билета"
+            self.seats.invalidate()
+            print(f"Error cancelling ticket: {e}")
+            return False, "Ошибка при отмене билета"
 
+    @timed
     def get_user_tickets(self, user_id):
         """Получает все билеты пользователя с детальной информацией"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
+        return list(self.iter_user_tickets(user_id))
+
+    @timed
+    def count_user_tickets(self, user_id):
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM PurchasedTickets WHERE UserID = ?', (user_id,)).fetchone()[0]
+
+    def iter_user_tickets(self, user_id, batch_size=500):
+        """Построчно отдает билеты пользователя, читая курсор порциями по batch_size строк"""
         query = """
         SELECT 
             pt.TicketID,
@@ -544,7 +1073,10 @@ class Database:
         ORDER BY pt.PurchaseDate DESC
         """
         
-        cursor.execute(query, (user_id,))
-        tickets = cursor.fetchall()
-        conn.close()
-        return tickets
\ No newline at end of file
+        with self.pool.connection() as conn:
+            cursor = conn.execute(query, (user_id,))
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
\ No newline at end of file
@@ -0,0 +1,105 @@
+import os
+from itertools import chain, islice
+
+# openpyxl импортируется внутри функций: он нужен только при экспорте,
+# а его загрузка заметно удлиняет запуск приложения
+
+TICKET_HEADERS = [
+    "Номер билета", "Пассажир", "Email", "Телефон", "Место",
+    "Дата покупки", "Авиакомпания", "Аэропорт отправления",
+    "Город отправления", "Аэропорт прибытия", "Город прибытия",
+    "Дата вылета", "Дата прибытия", "Цена"
+]
+
+# В режиме write-only ширину столбцов нужно задать до первой строки,
+# поэтому она считается по заголовкам и первым WIDTH_SAMPLE_ROWS строкам
+WIDTH_SAMPLE_ROWS = 1000
+PROGRESS_STEP = 500
+
+
+class ExportCancelled(Exception):
+    """Выгрузка отменена пользователем; файл не создан"""
+
+
+def ticket_styles():
+    """Именованные стили: регистрируются в книге один раз и разделяются всеми ячейками"""
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+    header = NamedStyle(name="ticket_header")
+    header.font = Font(bold=True, color="FFFFFF")
+    header.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+    header.alignment = Alignment(horizontal="center")
+
+    cell = NamedStyle(name="ticket_cell")
+    cell.alignment = Alignment(horizontal="center")
+    return header, cell
+
+
+def styled_row(ws, values, style):
+    from openpyxl.cell import WriteOnlyCell
+
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        row.append(cell)
+    return row
+
+
+def export_tickets(db, user_id, filepath, progress=None, cancelled=None):
+    """Потоково выгружает билеты пользователя в файл Excel.
+
+    Строки читаются из Database.iter_user_tickets и сразу пишутся в книгу
+    openpyxl в режиме write-only, так что память не растет с числом билетов.
+    progress(percent) вызывается по ходу записи. cancelled() проверяется
+    каждые PROGRESS_STEP строк и после сохранения: при отмене недописанный
+    файл удаляется и выбрасывается ExportCancelled. Возвращает число строк.
+    """
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+
+    total = db.count_user_tickets(user_id)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Мои билеты")
+    header_style, cell_style = ticket_styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
+
+    rows = db.iter_user_tickets(user_id)
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+
+    # Ширина столбцов по заголовкам и первой порции строк
+    widths = [len(header) for header in TICKET_HEADERS]
+    for ticket in sample:
+        for col, value in enumerate(ticket):
+            widths[col] = max(widths[col], len(str(value)))
+    for col, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width + 2
+
+    ws.append(styled_row(ws, TICKET_HEADERS, header_style.name))
+
+    written = 0
+    for ticket in chain(sample, rows):
+        ws.append(styled_row(ws, ticket, cell_style.name))
+        written += 1
+        if written % PROGRESS_STEP == 0:
+            if cancelled and cancelled():
+                # Лист закрывается, чтобы openpyxl завершил запись своего временного файла
+                ws.close()
+                raise ExportCancelled()
+            if progress:
+                progress(written * 100 // max(total, 1))
+
+    try:
+        wb.save(filepath)
+        if cancelled and cancelled():
+            raise ExportCancelled()
+    except BaseException:
+        # Недописанный или уже ненужный файл не оставляем
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+    if progress:
+        progress(100)
+    return written
@@ -0,0 +1,55 @@
+from PySide6.QtCore import QDate, QRect, Qt
+from PySide6.QtGui import QColor, QFont
+from PySide6.QtWidgets import QCalendarWidget
+
+
+def load_fares(db, origin_city, destination_city, center_date, days, passenger_count, travel_class):
+    """Цены для календаря вместе с ключом маршрута, по которому они получены (выполняется в фоне)"""
+    route = (origin_city, destination_city, passenger_count, travel_class)
+    return route, db.fare_calendar(origin_city, destination_city, center_date, days, passenger_count, travel_class)
+
+
+class FareCalendarWidget(QCalendarWidget):
+    """Календарь выбора даты с минимальной ценой под номером дня; самый дешевый день выделен"""
+    PRICE_COLOR = QColor("#4e4376")
+    CHEAPEST_COLOR = QColor("#2e7d32")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.route = None
+        self.fares = {}  # QDate -> цена
+        self.setMinimumSize(460, 320)
+
+    def set_fares(self, result):
+        """Принимает (маршрут, {дата: цена}); цены того же маршрута дополняются, другого - заменяются"""
+        route, fares = result
+        if route != self.route:
+            self.route = route
+            self.fares = {}
+        for day, price in fares.items():
+            self.fares[QDate.fromString(day, "yyyy-MM-dd")] = price
+        self.updateCells()
+
+    def clear_fares(self):
+        self.route = None
+        self.fares = {}
+        self.updateCells()
+
+    @staticmethod
+    def format_price(price):
+        return f"{price / 1000:.1f}к" if price >= 1000 else f"{price:.0f}"
+
+    def paintCell(self, painter, rect, date):
+        super().paintCell(painter, rect, date)
+        price = self.fares.get(date)
+        if price is None:
+            return
+        cheapest = min(self.fares.values())
+        painter.save()
+        font = QFont(painter.font())
+        font.setPointSizeF(max(6.0, font.pointSizeF() * 0.7))
+        painter.setFont(font)
+        painter.setPen(self.CHEAPEST_COLOR if price == cheapest else self.PRICE_COLOR)
+        price_rect = QRect(rect.left(), rect.top() + rect.height() // 2, rect.width(), rect.height() // 2)
+        painter.drawText(price_rect, Qt.AlignHCenter | Qt.AlignBottom, self.format_price(price))
+        painter.restore()
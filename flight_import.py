@@ -0,0 +1,208 @@
+import argparse
+import csv
+import os
+import time
+from datetime import datetime
+from itertools import chain, islice
+
+from seat_inventory import SeatInventory
+
+# Порядок столбцов файла расписания
+IMPORT_COLUMNS = ('airline', 'from_city', 'to_city', 'departure', 'arrival', 'price')
+# Допустимые названия столбцов в строке заголовка
+HEADER_ALIASES = {
+    'airline': 'airline', 'авиакомпания': 'airline',
+    'from_city': 'from_city', 'from': 'from_city', 'откуда': 'from_city',
+    'to_city': 'to_city', 'to': 'to_city', 'куда': 'to_city',
+    'departure': 'departure', 'вылет': 'departure',
+    'arrival': 'arrival', 'прилет': 'arrival', 'прилёт': 'arrival',
+    'price': 'price', 'цена': 'price',
+}
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d.%m.%Y %H:%M')
+CHUNK_SIZE = 5000
+MAX_REPORTED_REJECTS = 1000
+
+
+class ImportFailed(Exception):
+    """Ошибка посреди импорта; порции, загруженные до нее, остаются в базе"""
+
+    def __init__(self, error, imported):
+        super().__init__(f"{error} (до ошибки импортировано рейсов: {imported})")
+        self.imported = imported
+
+
+def read_rows(path):
+    """Построчно читает файл расписания (CSV или XLSX), не загружая его целиком"""
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample else csv.excel
+            yield from csv.reader(f, dialect)
+
+
+def header_mapping(row):
+    """Индексы столбцов по строке заголовка или None, если это строка данных"""
+    names = [HEADER_ALIASES.get(str(value).strip().lower()) if value is not None else None for value in row]
+    if not set(IMPORT_COLUMNS) <= set(names):
+        return None
+    return [names.index(column) for column in IMPORT_COLUMNS]
+
+
+def parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"неверный формат даты: {text!r}")
+
+
+def parse_row(row, columns):
+    """Проверяет строку файла и возвращает (авиакомпания, откуда, куда, вылет, прилет, цена)"""
+    if len(row) <= max(columns):
+        raise ValueError("не хватает столбцов")
+    airline, from_city, to_city, departure, arrival, price = (row[i] for i in columns)
+    airline, from_city, to_city = (str(v).strip() if v is not None else '' for v in (airline, from_city, to_city))
+    if not all([airline, from_city, to_city]) or departure in (None, '') or arrival in (None, ''):
+        raise ValueError("заполнены не все поля")
+    departure = parse_datetime(departure)
+    arrival = parse_datetime(arrival)
+    if arrival < departure:
+        raise ValueError("прилет раньше вылета")
+    try:
+        price = float(str(price).replace(',', '.').replace(' ', ''))
+    except ValueError:
+        raise ValueError(f"неверная цена: {price!r}")
+    if price < 0:
+        raise ValueError("отрицательная цена")
+    return (airline, from_city, to_city,
+            departure.strftime('%Y-%m-%d %H:%M:%S'), arrival.strftime('%Y-%m-%d %H:%M:%S'), price)
+
+
+def import_flights(db, rows, progress=None, chunk_size=CHUNK_SIZE, cancelled=None):
+    """Загружает рейсы из итератора строк (первая строка может быть заголовком).
+
+    Авиакомпании, города и аэропорты разрешаются через справочники в памяти
+    (Database.refdata), рейсы и их схемы мест вставляются executemany, по
+    chunk_size строк в одной транзакции. progress(n) получает число
+    обработанных строк. cancelled() проверяется перед каждой порцией: при
+    отмене импорт останавливается, в отчете cancelled=True, а imported -
+    число рейсов из уже сохраненных порций. Ошибка посреди импорта
+    выбрасывается как ImportFailed с тем же числом. Возвращает отчет со
+    счетчиками, скоростью и причинами отклонения строк.
+    """
+    started = time.perf_counter()
+    db.refdata.ensure_loaded()
+    seats = SeatInventory()
+    report = {'rows': 0, 'imported': 0, 'rejected': 0, 'errors': [], 'cancelled': False}
+
+    rows = iter(rows)
+    first = next(rows, None)
+    columns = header_mapping(first) if first is not None else None
+    line = 1  # номер строки файла для отчета об ошибках
+    if columns is None:
+        # Заголовка нет: столбцы в порядке IMPORT_COLUMNS, первая строка - данные
+        columns = list(range(len(IMPORT_COLUMNS)))
+        if first is not None:
+            rows = chain([first], rows)
+            line = 0
+
+    def reject(line_no, reason):
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_REPORTED_REJECTS:
+            report['errors'].append((line_no, reason))
+
+    try:
+        while True:
+            if cancelled and cancelled():
+                report['cancelled'] = True
+                break
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            with db.pool.transaction(immediate=True) as conn:
+                cursor = conn.cursor()
+                flights = []
+                for row in chunk:
+                    line += 1
+                    if not row or all(value in (None, '') for value in row):
+                        continue
+                    report['rows'] += 1
+                    try:
+                        airline, from_city, to_city, departure, arrival, price = parse_row(row, columns)
+                    except ValueError as e:
+                        reject(line, str(e))
+                        continue
+                    airline_id, origin_id, destination_id = db.resolve_flight_refs(
+                        cursor, airline, from_city, to_city)
+                    flights.append((airline_id, departure, arrival, origin_id, destination_id, price))
+
+                last_id = cursor.execute('SELECT COALESCE(MAX(FlightID), 0) FROM Flights').fetchone()[0]
+                cursor.executemany('''
+                    INSERT INTO Flights (AirlineID, DepartureDate, ArrivalDate,
+                                       OriginAirportID, DestinationAirportID, Price)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', flights)
+
+                # Схемы мест новых рейсов одним executemany; под блокировкой на запись
+                # все рейсы с ID больше last_id вставлены этой транзакцией
+                seat_rows = []
+                for flight_id, price, capacity in cursor.execute(
+                        'SELECT FlightID, Price, AvailableSeats FROM Flights WHERE FlightID > ?', (last_id,)):
+                    seat_rows.extend(seats.new_seat_rows(flight_id, price, capacity))
+                cursor.executemany('''
+                    INSERT INTO Tickets (FlightID, SeatNumber, Price, Status, Class)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', seat_rows)
+            report['imported'] += len(flights)
+            if progress:
+                progress(report['rows'])
+    except Exception as e:
+        # Справочники могли получить ID из откаченной транзакции
+        db.refdata.reset()
+        raise ImportFailed(e, report['imported']) from e
+    finally:
+        # Новые рейсы могут попасть в любой из закэшированных поисков и маршрутов
+        db.search_cache.clear()
+        db.routes.reset()
+
+    report['seconds'] = time.perf_counter() - started
+    report['rows_per_sec'] = report['rows'] / report['seconds'] if report['seconds'] else 0.0
+    return report
+
+
+def import_file(db, path, progress=None, chunk_size=CHUNK_SIZE, cancelled=None):
+    """Импорт расписания из файла CSV или XLSX"""
+    return import_flights(db, read_rows(path), progress, chunk_size, cancelled)
+
+
+if __name__ == "__main__":
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Импорт расписания рейсов из CSV/XLSX")
+    parser.add_argument('path', help="файл расписания: " + ', '.join(IMPORT_COLUMNS))
+    parser.add_argument('--db', default='airline_system.db', help="файл базы данных")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        parser.error(f"файл не найден: {args.path}")
+    result = import_file(Database(args.db), args.path,
+                         progress=lambda n: print(f"\rОбработано строк: {n}", end=''),
+                         chunk_size=args.chunk_size)
+    print()
+    print(f"Импортировано: {result['imported']}, отклонено: {result['rejected']}, "
+          f"{result['rows_per_sec']:.0f} строк/с")
+    for line_no, reason in result['errors'][:20]:
+        print(f"  строка {line_no}: {reason}")
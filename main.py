@@ -1,17 +1,64 @@
+import argparse
 import sys
+import time
 from PySide6.QtWidgets import QApplication
-from auth_windows import LoginWindow
-from mainwindow import MainWindow
+from auth_windows import DeferredWindow, LoginWindow
+from database import Database, configured_hasher
+from query_stats import QueryStats, SLOW_QUERY_MS
 
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    
-    # Создаем главное окно, но не показываем его
-    main_window = MainWindow()
-    
+def start(argv):
+    """Создает приложение и показывает окно входа; главное окно строится только после входа"""
+    parser = argparse.ArgumentParser(description="AnAvia")
+    parser.add_argument('--server', help="адрес сервера бронирования (booking_server.py), например 127.0.0.1:8765")
+    parser.add_argument('--db', default='airline_system.db', help="файл базы данных")
+    parser.add_argument('--slow-ms', type=float, default=SLOW_QUERY_MS, help="порог медленного запроса, мс")
+    parser.add_argument('--slow-log', help="журнал медленных запросов (по умолчанию - stderr)")
+    parser.add_argument('--slow-log-params', action='store_true',
+                        help="писать в журнал значения параметров запросов (по умолчанию только их типы)")
+    parser.add_argument('--query-stats', help="файл JSON, в который при выходе сохраняется статистика запросов")
+    parser.add_argument('--kdf-cost', type=int,
+                        help="стоимость хеширования паролей (scrypt N); по умолчанию подбирается при первом запуске")
+    args, qt_args = parser.parse_known_args(argv[1:])
+    app = QApplication(argv[:1] + qt_args)
+    started = time.perf_counter()
+
+    if args.server:
+        # Общий сервер бронирования: кэши и запись в базу - в одном процессе на все терминалы
+        from booking_client import RemoteAuthService, RemoteDatabase
+        db = RemoteDatabase(args.server)
+        auth = RemoteAuthService(db)
+    else:
+        # Одна база (соединения, миграции, кэши) на все окна приложения; стоимость KDF
+        # хранится в самой базе и общая для всех терминалов и сервера бронирования
+        db = Database(args.db, hasher=configured_hasher(args.db, args.kdf_cost),
+                      query_stats=QueryStats(args.slow_ms, args.slow_log,
+                                             log_params=args.slow_log_params))
+        auth = None
+        if args.query_stats:
+            app.aboutToQuit.connect(lambda: db.query_stats.dump(args.query_stats))
+    db_ready = time.perf_counter()
+
+    def build_main_window():
+        # Модуль главного окна (и все его зависимости) загружается только после входа
+        built = time.perf_counter()
+        from mainwindow import MainWindow
+        window = MainWindow(db)
+        print(f"Главное окно: {(time.perf_counter() - built) * 1000:.1f} мс")
+        return window
+
     # Показываем окно авторизации
-    login_window = LoginWindow(main_window)
+    login_window = LoginWindow(DeferredWindow(build_main_window), db, auth)
     login_window.show()
-    
+
+    finished = time.perf_counter()
+    print(f"Запуск: база {(db_ready - started) * 1000:.1f} мс, "
+          f"окно входа {(finished - db_ready) * 1000:.1f} мс, "
+          f"всего {(finished - started) * 1000:.1f} мс, "
+          f"соединений открыто: {db.pool.stats()['opened']}")
+    return app, login_window
+
+
+if __name__ == "__main__":
+    app, login_window = start(sys.argv)
     sys.exit(app.exec())
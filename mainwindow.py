@@ -7,15 +7,26 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
                            QPalette, QPixmap, QRadialGradient, QTransform)
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton,
                                QLabel, QLineEdit, QMessageBox, QComboBox, QCalendarWidget,
-                               QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView,
-                               QTimeEdit, QGridLayout, QDateEdit)
-from database import Database
+                               QHBoxLayout, QTableView, QHeaderView,
+                               QTimeEdit, QGridLayout, QDateEdit, QProgressDialog, QFileDialog)
+from database import Database, FARE_CALENDAR_DAYS, SEARCH_PAGE_SIZE
 from purchase_window import PurchaseDialog
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from query_executor import QueryExecutor
+from tickets_model import BuyButtonDelegate, TicketsTableModel
+from excel_export import export_tickets
+from flight_import import import_file
+from fare_calendar import FareCalendarWidget, load_fares
+from place_completer import PlaceCompleter
 import os
 from datetime import datetime
 
+# Названия классов в интерфейсе и в базе данных
+CLASS_MAP = {
+    "Эконом": "Economy",
+    "Бизнес": "Business",
+    "Первый": "First"
+}
+
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
         if not MainWindow.objectName():
@@ -106,13 +117,9 @@ class Ui_MainWindow(object):
         self.resultsLabel.hide()
         self.mainLayout.addWidget(self.resultsLabel)
 
-        # Results table
-        self.resultsTable = QTableWidget(self.centralwidget)
-        self.resultsTable.setColumnCount(7)
-        self.resultsTable.setHorizontalHeaderLabels([
-            "Авиакомпания", "Откуда", "Куда", "Дата вылета", "Время вылета", "Время прилета", "Цена"
-        ])
-        self.resultsTable.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Results table (модель и делегат подключает MainWindow)
+        self.resultsTable = QTableView(self.centralwidget)
+        self.resultsTable.setMouseTracking(True)
         self.resultsTable.hide()
         self.mainLayout.addStretch()
         self.mainLayout.addWidget(self.resultsTable)
@@ -131,19 +138,53 @@ class Ui_MainWindow(object):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, db=None):
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
-        self.db = Database()
+        # База создается один раз в main.py и передается во все окна
+        self.db = db if db is not None else Database()
         self.current_role = "user"
 
         # Set window title
         self.setWindowTitle("AnAvia")
 
+        # Поиск выполняется в фоновом потоке, результаты приходят в поток интерфейса
+        self.search_executor = QueryExecutor(self.db, self)
+        self.search_executor.finished.connect(self.on_search_finished)
+        self.search_executor.failed.connect(self.on_search_failed)
+        self.export_executor = QueryExecutor(self.db, self, max_threads=1)
+        self.export_executor.finished.connect(self.on_export_finished)
+        self.export_executor.failed.connect(self.on_export_failed)
+        self.export_executor.progress.connect(lambda value: self.export_progress.setValue(value))
+        self.import_executor = QueryExecutor(self.db, self, max_threads=1)
+        self.import_executor.finished.connect(self.on_import_finished)
+        self.import_executor.failed.connect(self.on_import_failed)
+        self.import_executor.progress.connect(
+            lambda rows: self.import_progress.setLabelText(f"Импорт расписания... обработано строк: {rows}"))
+
+        # Результаты поиска: модель над кортежами и делегат для кнопки "Купить"
+        self.setup_results_view()
+
         # Connect signals
         self.ui.searchButton.clicked.connect(self.search_tickets)
 
+        # Подсказки городов по началу названия, коду IATA или аэропорту
+        self.from_completer = PlaceCompleter(self.ui.fromCity, self.db)
+        self.to_completer = PlaceCompleter(self.ui.toCity, self.db)
+
+        # Календарь даты вылета с ценами по дням; цены загружаются в фоне одним запросом
+        self.fare_calendar = FareCalendarWidget()
+        self.ui.departDate.setCalendarWidget(self.fare_calendar)
+        self.fare_executor = QueryExecutor(self.db, self, max_threads=1)
+        self.fare_executor.finished.connect(self.fare_calendar.set_fares)
+        self.ui.fromCity.editingFinished.connect(self.update_fare_calendar)
+        self.ui.toCity.editingFinished.connect(self.update_fare_calendar)
+        self.ui.departDate.dateChanged.connect(self.update_fare_calendar)
+        self.ui.passengersCount.currentIndexChanged.connect(self.update_fare_calendar)
+        self.ui.travelClass.currentIndexChanged.connect(self.update_fare_calendar)
+        self.fare_calendar.currentPageChanged.connect(self.load_fare_month)
+
         # Set current date as minimum
         current_date = QDate.currentDate()
         self.ui.departDate.setMinimumDate(current_date)
@@ -211,14 +252,14 @@ class MainWindow(QMainWindow):
                 font-size: 14px;
                 min-width: 150px;
             }
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 color: black;
                 border: 2px solid #4e4376;
                 border-radius: 4px;
                 font-size: 14px;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
             }
             QHeaderView::section {
@@ -280,6 +321,13 @@ class MainWindow(QMainWindow):
         self.ui.addTicketButton.clicked.connect(self.add_ticket)
         admin_layout.addWidget(self.ui.addTicketButton)
 
+        # Массовая загрузка расписания из CSV/XLSX
+        self.ui.importScheduleButton = QPushButton("Импорт расписания")
+        self.ui.importScheduleButton.clicked.connect(self.import_schedule)
+        admin_layout.addWidget(self.ui.importScheduleButton)
+        # Импорт пишет в файл базы напрямую, с сервером бронирования он недоступен
+        self.ui.importScheduleButton.setVisible(isinstance(self.db, Database))
+
         self.admin_widget.setLayout(admin_layout)
         self.ui.mainLayout.addWidget(self.admin_widget)
         self.admin_widget.hide()  # Hide by default
@@ -356,113 +404,98 @@ class MainWindow(QMainWindow):
         return_date = self.ui.returnDate.date().toString("yyyy-MM-dd")
         passengers = int(self.ui.passengersCount.currentText())
 
-        # Debug prints
-        print(f"Searching for flights:")
-        print(f"From: {from_city}")
-        print(f"To: {to_city}")
-        print(f"Departure: {depart_date}")
-        print(f"Return: {return_date}")
-
         # Convert class names to database format
-        class_map = {
-            "Эконом": "Economy",
-            "Бизнес": "Business",
-            "Первый": "First"
-        }
-        travel_class = class_map[self.ui.travelClass.currentText()]
-        print(f"Class: {travel_class}")
+        travel_class = CLASS_MAP[self.ui.travelClass.currentText()]
+
+        # Search for tickets (предыдущий незавершенный поиск отменяется)
+        self.search_args = (from_city, to_city, depart_date, return_date, passengers, travel_class)
+        self.search_page = 0
+        self.run_search()
+
+    def update_fare_calendar(self):
+        """Цены на дни вокруг выбранной даты вылета"""
+        self.request_fares(self.ui.departDate.date(), FARE_CALENDAR_DAYS)
+
+    def load_fare_month(self, year, month):
+        """Цены на весь месяц, открытый в календаре"""
+        self.request_fares(QDate(year, month, 15), 16)
+
+    def request_fares(self, center, days):
+        from_city = self.ui.fromCity.text()
+        to_city = self.ui.toCity.text()
+        if not from_city or not to_city:
+            self.fare_calendar.clear_fares()
+            return
+        self.fare_executor.submit(load_fares, self.db, from_city, to_city, center.toString("yyyy-MM-dd"), days,
+                                  int(self.ui.passengersCount.currentText()),
+                                  CLASS_MAP[self.ui.travelClass.currentText()])
 
-        # Search for tickets
-        outbound_tickets, return_tickets = self.db.search_tickets(
-            from_city, to_city, depart_date, return_date,
-            passengers, travel_class
+    def run_search(self):
+        from_city, to_city, depart_date, return_date, passengers, travel_class = self.search_args
+        self.ui.resultsLabel.setText("Поиск...")
+        self.ui.resultsLabel.show()
+        self.search_executor.submit(
+            self.db.search_tickets,
+            from_city, to_city, depart_date,
+            # Обратные рейсы нужны только для первой страницы
+            return_date if self.search_page == 0 else None,
+            passengers, travel_class,
+            page=self.search_page
         )
 
-        # Debug prints
-        print(f"Found outbound tickets: {len(outbound_tickets)}")
-        print(f"Found return tickets: {len(return_tickets)}")
+    def show_more_tickets(self):
+        self.search_page += 1
+        self.run_search()
+
+    def on_search_finished(self, result):
+        # Время и число строк поиска собирает Database.query_stats
+        outbound_tickets, return_tickets = result
 
         # Show results
-        self.ui.resultsLabel.show()
-        self.display_tickets(outbound_tickets, return_tickets)
+        self.ui.resultsLabel.setText("Результаты поиска:")
+        # Исполнитель отдает только результат последнего запроса, так что search_args -
+        # параметры именно этих строк; покупка берет класс и число пассажиров отсюда
+        self.results_args = self.search_args
+        if self.search_page == 0:
+            self.display_tickets(outbound_tickets, return_tickets)
+        else:
+            self.results_model.append_rows(outbound_tickets)
+        # Полная страница значит, что в базе могут быть еще рейсы
+        self.more_button.setVisible(len(outbound_tickets) == SEARCH_PAGE_SIZE)
 
-    def display_tickets(self, outbound_tickets, return_tickets):
-        # Clear previous results
-        self.ui.resultsTable.clear()
-        self.ui.resultsTable.setRowCount(0)
-
-        # Set up table headers
-        headers = ["Авиакомпания", "Откуда", "Куда", "Дата вылета", "Время вылета", "Время прилета", "Цена", "Действия"]
-        self.ui.resultsTable.setColumnCount(len(headers))
-        self.ui.resultsTable.setHorizontalHeaderLabels(headers)
-        self.ui.resultsTable.verticalHeader().setVisible(False)
-
-        # Create a dictionary to store unique flights per airline
-        unique_flights = {}
-
-        # Process outbound tickets
-        if outbound_tickets:
-            for ticket in outbound_tickets:
-                airline = ticket[1]
-                if airline not in unique_flights:
-                    unique_flights[airline] = ticket
-
-        # Display unique flights
-        if unique_flights:
-            row_count = len(unique_flights)
-            self.ui.resultsTable.setRowCount(row_count)
-
-            for i, (airline, ticket) in enumerate(unique_flights.items()):
-                airline_item = QTableWidgetItem(airline)
-                origin = QTableWidgetItem(f"{ticket[3]} ({ticket[4]})")
-                dest = QTableWidgetItem(f"{ticket[5]} ({ticket[6]})")
-                date = QTableWidgetItem(ticket[7])
-                dep_time = QTableWidgetItem(ticket[8])
-                arr_time = QTableWidgetItem(ticket[9])
-                price = QTableWidgetItem(f"{ticket[10]:.2f} ₽")
-
-                self.ui.resultsTable.setItem(i, 0, airline_item)
-                self.ui.resultsTable.setItem(i, 1, origin)
-                self.ui.resultsTable.setItem(i, 2, dest)
-                self.ui.resultsTable.setItem(i, 3, date)
-                self.ui.resultsTable.setItem(i, 4, dep_time)
-                self.ui.resultsTable.setItem(i, 5, arr_time)
-                self.ui.resultsTable.setItem(i, 6, price)
-
-                # Add Buy button with fixed size
-                buy_button = QPushButton("Купить")
-                buy_button.setFixedSize(100, 30)  # Устанавливаем фиксированный размер кнопки
-                buy_button.clicked.connect(lambda checked, t=ticket: self.buy_ticket(t))
-                buy_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #4e4376;
-                        color: white;
-                        border: none;
-                        border-radius: 4px;
-                        padding: 5px;
-                    }
-                    QPushButton:hover {
-                        background-color: #5e5386;
-                    }
-                """)
-                
-                # Создаем виджет-контейнер для центрирования кнопки
-                container = QWidget()
-                layout = QHBoxLayout(container)
-                layout.addWidget(buy_button)
-                layout.setAlignment(Qt.AlignCenter)
-                layout.setContentsMargins(0, 0, 0, 0)
-                self.ui.resultsTable.setCellWidget(i, 7, container)
+    def on_search_failed(self, message):
+        self.ui.resultsLabel.setText("Результаты поиска:")
+        QMessageBox.warning(self, "Ошибка", f"Не удалось выполнить поиск: {message}")
+
+    def setup_results_view(self):
+        self.results_model = TicketsTableModel(self)
+        self.buy_delegate = BuyButtonDelegate(self)
+        self.buy_delegate.clicked.connect(lambda row: self.buy_ticket(self.results_model.ticket(row)))
+
+        table = self.ui.resultsTable
+        table.setModel(self.results_model)
+        table.setItemDelegateForColumn(TicketsTableModel.ACTION_COLUMN, self.buy_delegate)
+        table.verticalHeader().setVisible(False)
 
         # Настраиваем размеры таблицы
-        self.ui.resultsTable.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         # Устанавливаем фиксированную ширину для колонки с кнопками
-        self.ui.resultsTable.horizontalHeader().setSectionResizeMode(7, QHeaderView.Fixed)
-        self.ui.resultsTable.setColumnWidth(7, 120)
-        
-        # Настраиваем автоматическое изменение размера строк
-        self.ui.resultsTable.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
-        self.ui.resultsTable.verticalHeader().setDefaultSectionSize(40)
+        table.horizontalHeader().setSectionResizeMode(TicketsTableModel.ACTION_COLUMN, QHeaderView.Fixed)
+        table.setColumnWidth(TicketsTableModel.ACTION_COLUMN, 120)
+
+        # Фиксированная высота строк: таблице не нужно измерять содержимое каждой строки
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        table.verticalHeader().setDefaultSectionSize(40)
+
+        # Следующая страница результатов
+        self.more_button = QPushButton("Показать еще", self)
+        self.more_button.clicked.connect(self.show_more_tickets)
+        self.more_button.hide()
+        self.ui.mainLayout.insertWidget(self.ui.mainLayout.indexOf(table) + 1, self.more_button)
+
+    def display_tickets(self, outbound_tickets, return_tickets):
+        # Фильтрация по классу и числу мест уже выполнена в базе
+        self.results_model.set_rows(outbound_tickets)
 
         # Show table
         self.ui.resultsTable.show()
@@ -473,6 +506,9 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Необходимо войти в систему")
             return
             
+        # Класс и число пассажиров - из поиска, которым получена строка, а не из текущих полей
+        _, _, _, _, passenger_count, travel_class = self.results_args
+
         # Prepare flight data for the purchase dialog
         flight_data = {
             'airline': ticket[1],
@@ -482,39 +518,33 @@ class MainWindow(QMainWindow):
             'departure': ticket[8],
             'arrival': ticket[9],
             'price': ticket[10],
-            'passengers': int(self.ui.passengersCount.currentText())  # Добавляем количество пассажиров
+            'passengers': passenger_count  # Добавляем количество пассажиров
         }
         
         dialog = PurchaseDialog(self, flight_data)
         if dialog.exec():
             passengers_info = dialog.get_passenger_info()  # Теперь это список словарей с информацией о пассажирах
-            success = True
-            error_message = ""
-            seat_info = []  # Список для хранения информации о местах
             
-            # Покупаем билет для каждого пассажира
-            for passenger in passengers_info:
-                success, message = self.db.purchase_ticket(
-                    ticket[0],  # flight_id
-                    self.user_id,  # user_id
-                    passenger['name'],
-                    passenger['email'],
-                    passenger['phone']
-                )
-                if success:
-                    # Добавляем информацию о месте и пассажире
-                    seat_number = message.split("Номер места: ")[1]
-                    seat_info.append(f"Пассажир: {passenger['name']}\nМесто: {seat_number}")
-                else:
-                    error_message = message
-                    break
+            # Покупаем билеты всей группе одной транзакцией: либо все, либо ни одного
+            success, error_message, seats = self.db.purchase_tickets_batch(
+                ticket[0],  # flight_id
+                self.user_id,  # user_id
+                passengers_info,
+                travel_class
+            )
+            # Информация о местах и пассажирах
+            seat_info = [f"Пассажир: {passenger['name']}\nМесто: {seat_number}"
+                         for passenger, seat_number in zip(passengers_info, seats)]
             
             if success:
                 # Формируем сообщение с информацией о всех купленных билетах
                 success_message = "Билеты успешно куплены!\n\n"
                 success_message += "\n\n".join(seat_info)
                 QMessageBox.information(self, "Успех", success_message)
-                self.search_tickets()  # Обновляем список билетов
+                # Обновляем список билетов тем же поиском
+                self.search_args = self.results_args
+                self.search_page = 0
+                self.run_search()
             else:
                 QMessageBox.warning(self, "Ошибка", f"Ошибка при покупке билетов: {error_message}")
 
@@ -523,61 +553,77 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Пожалуйста, войдите в систему")
             return
             
-        tickets = self.db.get_user_tickets(self.user_id)
-        if not tickets:
+        if not self.db.count_user_tickets(self.user_id):
             QMessageBox.information(self, "Информация", "У вас нет купленных билетов")
             return
             
-        # Создаем новую книгу Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Мои билеты"
-        
-        # Заголовки
-        headers = [
-            "Номер билета", "Пассажир", "Email", "Телефон", "Место",
-            "Дата покупки", "Авиакомпания", "Аэропорт отправления",
-            "Город отправления", "Аэропорт прибытия", "Город прибытия",
-            "Дата вылета", "Дата прибытия", "Цена"
-        ]
-        
-        # Стили для заголовков
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        
-        # Применяем заголовки и стили
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-            
-        # Заполняем данные
-        for row, ticket in enumerate(tickets, 2):
-            for col, value in enumerate(ticket, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.alignment = Alignment(horizontal="center")
-                
-        # Автоматическая ширина столбцов
-        for column in ws.columns:
-            max_length = 0
-            column = [cell for cell in column]
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column[0].column_letter].width = adjusted_width
-            
-        # Сохраняем файл
+        # Путь к файлу
         desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
         filename = f"tickets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        filepath = os.path.join(desktop_path, filename)
+        self.export_path = os.path.join(desktop_path, filename)
         
-        try:
-            wb.save(filepath)
-            QMessageBox.information(self, "Успех", f"Билеты экспортированы в файл:\n{filepath}")
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить файл:\n{str(e)}")
+        # Выгрузка идет в фоновом потоке, окно показывает прогресс
+        self.export_progress = QProgressDialog("Экспорт билетов...", "Отмена", 0, 100, self)
+        self.export_progress.setWindowTitle("Экспорт в Excel")
+        self.export_progress.setMinimumDuration(500)
+        self.export_progress.canceled.connect(self.cancel_export)
+        self.export_button.setEnabled(False)
+        self.export_executor.submit_with_progress(export_tickets, self.db, self.user_id, self.export_path)
+
+    def cancel_export(self):
+        # Выгрузка остановится на ближайшей проверке и удалит недописанный файл;
+        # ее результат или ошибка отбрасываются исполнителем
+        self.export_executor.abort()
+        self.export_button.setEnabled(True)
+
+    def on_export_finished(self, written):
+        # reset(), а не close(): закрытие окна прогресса считается отменой
+        self.export_progress.reset()
+        self.export_button.setEnabled(True)
+        QMessageBox.information(self, "Успех",
+                                f"Билеты экспортированы в файл ({written} шт.):\n{self.export_path}")
+
+    def on_export_failed(self, message):
+        self.export_progress.reset()
+        self.export_button.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить файл:\n{message}")
+
+    def import_schedule(self):
+        if self.current_role != "admin":
+            QMessageBox.warning(self, "Ошибка", "Недостаточно прав")
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт расписания", "",
+                                              "Расписание (*.csv *.xlsx);;Все файлы (*)")
+        if not path:
+            return
+
+        # Импорт идет в фоновом потоке; число строк заранее неизвестно
+        self.import_progress = QProgressDialog("Импорт расписания...", "Отмена", 0, 0, self)
+        self.import_progress.setWindowTitle("Импорт расписания")
+        self.import_progress.setMinimumDuration(500)
+        self.import_progress.canceled.connect(self.stop_import)
+        self.ui.importScheduleButton.setEnabled(False)
+        self.import_executor.submit_with_progress(import_file, self.db, path)
+
+    def stop_import(self):
+        # Импорт остановится перед следующей порцией (уже загруженные порции сохранены)
+        # и вернет отчет о том, что успел сохранить
+        self.import_executor.stop()
+
+    def on_import_finished(self, report):
+        self.import_progress.reset()
+        self.ui.importScheduleButton.setEnabled(True)
+        message = (f"Импортировано рейсов: {report['imported']}\n"
+                   f"Отклонено строк: {report['rejected']}\n"
+                   f"Скорость: {report['rows_per_sec']:.0f} строк/с")
+        if report['cancelled']:
+            message = "Импорт остановлен, остальные строки файла не загружены.\n" + message
+        if report['errors']:
+            message += "\n\n" + "\n".join(f"Строка {line}: {reason}" for line, reason in report['errors'][:10])
+        QMessageBox.information(self, "Импорт расписания", message)
+
+    def on_import_failed(self, message):
+        self.import_progress.reset()
+        self.ui.importScheduleButton.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Не удалось импортировать расписание:\n{message}")
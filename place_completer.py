@@ -0,0 +1,99 @@
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer
+from PySide6.QtWidgets import QCompleter
+
+from query_executor import QueryExecutor
+
+SUGGESTION_LIMIT = 10
+SUGGESTION_DELAY_MS = 200  # пауза ввода, после которой запрашиваются подсказки
+
+
+class PlaceSuggestionModel(QAbstractListModel):
+    """Подсказки для поля города: в списке показывается подпись (город, аэропорт, IATA),
+    в поле подставляется название города, по которому идет поиск"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.suggestions = []  # [(название города, подпись)]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.suggestions)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, label = self.suggestions[index.row()]
+        if role == Qt.DisplayRole:
+            return label
+        if role == Qt.EditRole:
+            return name
+        return None
+
+    def set_suggestions(self, suggestions):
+        """Обновляет только изменившуюся часть списка"""
+        common = 0
+        while (common < len(suggestions) and common < len(self.suggestions)
+               and suggestions[common] == self.suggestions[common]):
+            common += 1
+        if common < len(self.suggestions):
+            self.beginRemoveRows(QModelIndex(), common, len(self.suggestions) - 1)
+            del self.suggestions[common:]
+            self.endRemoveRows()
+        if common < len(suggestions):
+            self.beginInsertRows(QModelIndex(), common, len(suggestions) - 1)
+            self.suggestions.extend(suggestions[common:])
+            self.endInsertRows()
+
+
+class PlaceCompleter(QCompleter):
+    """Автодополнение города по началу названия, коду IATA или названию аэропорта.
+
+    Подбор выполняет Database.suggest_places (префиксный индекс в памяти),
+    поэтому встроенная фильтрация QCompleter отключена. Запрос уходит в
+    QueryExecutor после паузы ввода; подсказки для устаревшего текста отбрасываются.
+    """
+
+    def __init__(self, line_edit, db, limit=SUGGESTION_LIMIT, delay_ms=SUGGESTION_DELAY_MS):
+        super().__init__(line_edit)
+        self.db = db
+        self.limit = limit
+        self.suggestion_model = PlaceSuggestionModel(self)
+        self.setModel(self.suggestion_model)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        self.setMaxVisibleItems(limit)
+        line_edit.setCompleter(self)
+        self.executor = QueryExecutor(db, self, max_threads=1)
+        self.executor.finished.connect(self.on_suggestions_loaded)
+        self.executor.failed.connect(self.on_suggestions_failed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.request_suggestions)
+        # Только ввод пользователя: подстановка подсказки textEdited не вызывает
+        line_edit.textEdited.connect(self.update_suggestions)
+
+    def update_suggestions(self, text):
+        # Каждое нажатие откладывает запрос и отменяет подсказки для прежнего текста
+        self.executor.abort()
+        if not text.strip():
+            self.timer.stop()
+            self.show_suggestions([])
+            return
+        self.timer.start()
+
+    def request_suggestions(self):
+        self.executor.submit(self.db.suggest_places, self.widget().text(), self.limit)
+
+    def on_suggestions_loaded(self, suggestions):
+        self.show_suggestions(suggestions)
+
+    def on_suggestions_failed(self, message):
+        print(f"Error loading suggestions: {message}")
+        self.show_suggestions([])
+
+    def show_suggestions(self, suggestions):
+        self.suggestion_model.set_suggestions(suggestions)
+        if suggestions and self.widget().hasFocus():
+            self.complete()
+        else:
+            self.popup().hide()
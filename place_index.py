@@ -0,0 +1,109 @@
+import re
+import threading
+from bisect import bisect_left
+
+SEPARATORS = re.compile(r"[\s\-–—.,()'\"]+")
+MIN_FALLBACK_PREFIX = 2
+
+
+def fold(text):
+    """Ключ поиска: регистр без учета (в том числе кириллица), ё = е, дефисы и пробелы не различаются"""
+    return SEPARATORS.sub(' ', text.casefold().replace('ё', 'е')).strip()
+
+
+class PlaceIndex:
+    """Префиксный индекс городов и аэропортов для подсказок при вводе.
+
+    Строится по справочникам ReferenceData в памяти. Ключи разбиты на уровни
+    по приоритету: название города целиком, код IATA, слова в названии
+    города ("Петербург" для "Санкт-Петербург"), название аэропорта и его
+    слова. Каждый уровень - отсортированный список ключей, кандидаты
+    находятся двоичным поиском по префиксу, так что время подсказки не
+    зависит от числа аэропортов. Индекс перестраивается, когда в
+    справочниках появляются новые города или аэропорты.
+    """
+
+    def __init__(self, refdata):
+        self.refdata = refdata
+        self._lock = threading.Lock()
+        self.snapshot = None
+        self.tiers = []  # [(ключи, [(город, подпись), ...])] по убыванию приоритета
+        self.by_name = {}  # свернутое название города или аэропорта, IATA -> [AirportID, ...]
+
+    def ensure_current(self):
+        refdata = self.refdata
+        refdata.ensure_loaded()
+        snapshot = (id(refdata.cities), len(refdata.cities), id(refdata.airports), len(refdata.airports))
+        with self._lock:
+            if snapshot != self.snapshot:
+                self.build()
+                self.snapshot = snapshot
+
+    def build(self):
+        refdata = self.refdata
+        # Копии справочников: их могут дополнять другие потоки
+        cities = dict(refdata.cities)
+        airports = dict(refdata.airports)
+        countries = dict(refdata.countries)
+
+        names, codes, city_words, airport_words = [], [], [], []
+        by_name = {}
+        for city_id, (name, country_id) in cities.items():
+            key = fold(name)
+            country = countries.get(country_id)
+            label = f"{name} ({country})" if country else name
+            names.append((key, name, label))
+            words = key.split(' ')
+            city_words.extend((' '.join(words[i:]), name, label) for i in range(1, len(words)))
+            by_name.setdefault(key, []).extend(refdata.airports_by_city.get(city_id, ()))
+        for airport_id, (airport_name, city_id, iata) in airports.items():
+            city = cities.get(city_id)
+            if city is None:
+                continue
+            name = city[0]
+            label = f"{name} — {airport_name} ({iata})" if iata else f"{name} — {airport_name}"
+            if iata:
+                codes.append((fold(iata), name, label))
+                by_name.setdefault(fold(iata), []).append(airport_id)
+            key = fold(airport_name)
+            words = key.split(' ')
+            airport_words.extend((' '.join(words[i:]), name, label) for i in range(len(words)))
+            by_name.setdefault(key, []).append(airport_id)
+
+        self.tiers = []
+        for entries in (names, codes, city_words, airport_words):
+            entries.sort()
+            self.tiers.append(([key for key, _, _ in entries], [(name, label) for _, name, label in entries]))
+        self.by_name = by_name
+
+    def suggest(self, text, limit=10):
+        """До limit подсказок [(название города, подпись)] для введенного начала названия или кода.
+        Если ничего не найдено, подсказки строятся по самому длинному совпавшему началу (опечатка в конце)."""
+        self.ensure_current()
+        prefix = fold(text)
+        while prefix:
+            suggestions = self.match(prefix, limit)
+            if suggestions or len(prefix) <= MIN_FALLBACK_PREFIX:
+                return suggestions
+            prefix = prefix[:-1].rstrip()
+        return []
+
+    def match(self, prefix, limit):
+        suggestions = []
+        seen = set()
+        for keys, places in self.tiers:
+            index = bisect_left(keys, prefix)
+            while index < len(keys) and len(suggestions) < limit and keys[index].startswith(prefix):
+                name, label = places[index]
+                if name not in seen:
+                    seen.add(name)
+                    suggestions.append((name, label))
+                index += 1
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+    def airports_for(self, text):
+        """Аэропорты по названию города без учета регистра, по коду IATA или названию аэропорта"""
+        self.ensure_current()
+        return list(self.by_name.get(fold(text), ()))
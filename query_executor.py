@@ -0,0 +1,137 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class QueryWorkerSignals(QObject):
+    # QRunnable не является QObject, поэтому сигналы живут в отдельном объекте
+    done = Signal(int, object)
+    error = Signal(int, str)
+    progress = Signal(int, int)
+
+
+class QueryWorker(QRunnable):
+    """Выполняет один запрос к базе в потоке пула"""
+
+    def __init__(self, request_id, fn, args, kwargs, executor, with_progress=False):
+        super().__init__()
+        self.request_id = request_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.executor = executor
+        self.signals = QueryWorkerSignals()
+        if with_progress:
+            self.kwargs = dict(kwargs, progress=self.report_progress, cancelled=self.is_cancelled)
+
+    def report_progress(self, value):
+        self.signals.progress.emit(self.request_id, value)
+
+    def is_cancelled(self):
+        return self.executor.is_cancelled(self.request_id)
+
+    def run(self):
+        # Запрос мог устареть, пока ждал свободного потока
+        if not self.executor.worker_started(self.request_id, threading.get_ident()):
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(self.request_id, str(e))
+        else:
+            self.signals.done.emit(self.request_id, result)
+        finally:
+            self.executor.worker_finished(self.request_id)
+
+
+class QueryExecutor(QObject):
+    """Выполняет запросы к базе вне потока интерфейса.
+
+    Каждый новый submit() отменяет предыдущий запрос: выполняющийся SQL
+    прерывается через ConnectionManager.interrupt(), а результаты устаревших
+    запросов отбрасываются. Сигналы finished/failed приходят в поток интерфейса
+    только для последнего запроса. Долгие операции (submit_with_progress)
+    сами проверяют cancelled() между порциями работы: abort() отменяет
+    операцию вместе с ее результатом, stop() только просит остановиться.
+    """
+    finished = Signal(object)
+    failed = Signal(str)
+    progress = Signal(int)
+
+    def __init__(self, db, parent=None, max_threads=2):
+        super().__init__(parent)
+        self.db = db
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # Потоки не завершаются по таймауту, чтобы их соединения с базой переиспользовались
+        self.pool.setExpiryTimeout(-1)
+        self.current_id = 0
+        self._running = {}  # номер запроса -> идентификатор потока
+        self._stopped = set()  # номера запросов, которых попросили остановиться
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        return self.start(fn, args, kwargs, with_progress=False)
+
+    def submit_with_progress(self, fn, *args, **kwargs):
+        """Как submit(), но fn получает аргументы progress(value) для сигнала progress
+        и cancelled(), который возвращает True после stop(), abort() или нового запроса"""
+        return self.start(fn, args, kwargs, with_progress=True)
+
+    def start(self, fn, args, kwargs, with_progress):
+        with self._lock:
+            self.current_id += 1
+            self._stopped.clear()
+        self.cancel()
+        worker = QueryWorker(self.current_id, fn, args, kwargs, self, with_progress)
+        worker.signals.done.connect(self.on_done)
+        worker.signals.error.connect(self.on_error)
+        worker.signals.progress.connect(self.on_progress)
+        self.pool.start(worker)
+        return self.current_id
+
+    def cancel(self):
+        """Прерывает все выполняющиеся запросы этого исполнителя"""
+        with self._lock:
+            running = list(self._running.values())
+        for thread_id in running:
+            self.db.pool.interrupt(thread_id)
+
+    def stop(self):
+        """Просит текущий запрос остановиться; его результат (например, частичный) будет получен"""
+        with self._lock:
+            self._stopped.add(self.current_id)
+
+    def abort(self):
+        """Отменяет текущий запрос: его результат и ошибка отбрасываются, выполняющийся SQL прерывается"""
+        with self._lock:
+            self.current_id += 1
+        self.cancel()
+
+    def is_cancelled(self, request_id):
+        with self._lock:
+            return request_id != self.current_id or request_id in self._stopped
+
+    def worker_started(self, request_id, thread_id):
+        with self._lock:
+            if request_id != self.current_id:
+                return False
+            self._running[request_id] = thread_id
+            return True
+
+    def worker_finished(self, request_id):
+        with self._lock:
+            self._running.pop(request_id, None)
+            self._stopped.discard(request_id)
+
+    def on_done(self, request_id, result):
+        if request_id == self.current_id:
+            self.finished.emit(result)
+
+    def on_progress(self, request_id, value):
+        if request_id == self.current_id:
+            self.progress.emit(value)
+
+    def on_error(self, request_id, message):
+        if request_id == self.current_id:
+            self.failed.emit(message)
@@ -0,0 +1,368 @@
+import functools
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Верхние границы корзин гистограммы задержек, мс (последняя корзина - все, что дольше)
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+SLOW_QUERY_MS = 100.0
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+WHITESPACE = re.compile(r'\s+')
+MAX_STATEMENTS = 1000  # предел различных текстов запросов в статистике
+
+
+def param_types(params):
+    """Параметры запроса без значений (в журнале не должно быть хешей паролей,
+    солей и личных данных): имена типов по порядку или по именам параметров"""
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def result_rows(result):
+    """Число строк в результате метода Database: список, словарь или кортеж списков"""
+    if isinstance(result, (list, dict)):
+        return len(result)
+    if isinstance(result, tuple) and result and all(isinstance(part, list) for part in result):
+        return sum(len(part) for part in result)
+    return None
+
+
+class Histogram:
+    """Счетчики вызовов одного метода или запроса: время, строки, ошибки и корзины задержек"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0  # мс
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms, rows=None, error=False):
+        self.count += 1
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+        if rows:
+            self.rows += rows
+        if error:
+            self.errors += 1
+        for index, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        """Оценка перцентиля сверху: граница корзины, в которую он попадает"""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': dict(zip([f'<={bound}' for bound in BUCKETS_MS] + ['>'], self.buckets)),
+        }
+
+
+class QueryStats:
+    """Замеры методов Database и отдельных SQL-запросов.
+
+    Методы Database, отмеченные декоратором timed, и каждый запрос через
+    соединения ConnectionManager (InstrumentedConnection) попадают в
+    гистограммы по имени метода и по тексту запроса. Запросы дольше slow_ms
+    записываются в журнал медленных запросов (slow_log, по строке JSON на
+    запрос; без файла - в stderr) вместе с методом, типами параметров и
+    планом EXPLAIN QUERY PLAN; значения параметров пишутся только при
+    log_params=True. snapshot() возвращает накопленную статистику,
+    dump() сохраняет ее в JSON.
+    """
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=None, explain=True, log_params=False):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.explain = explain
+        self.log_params = log_params
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started = time.time()
+        self._normalized = {}  # текст запроса -> он же без лишних пробелов
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}  # имя метода -> Histogram
+            self.statements = {}  # текст запроса -> Histogram
+            self.slow_queries = 0
+
+    def current_method(self):
+        stack = getattr(self._local, 'methods', None)
+        return stack[-1] if stack else None
+
+    def enter(self, name):
+        stack = getattr(self._local, 'methods', None)
+        if stack is None:
+            stack = self._local.methods = []
+        stack.append(name)
+
+    def leave(self):
+        self._local.methods.pop()
+
+    def record_method(self, name, elapsed_ms, rows=None, error=False):
+        with self._lock:
+            histogram = self.methods.get(name)
+            if histogram is None:
+                histogram = self.methods[name] = Histogram()
+            histogram.add(elapsed_ms, rows, error)
+
+    def record_statement(self, conn, sql, params, elapsed_ms, rows=None, error=False, many=False):
+        text = self._normalized.get(sql)
+        if text is None:
+            text = WHITESPACE.sub(' ', sql).strip()
+            if len(self._normalized) < MAX_STATEMENTS:
+                self._normalized[sql] = text
+        with self._lock:
+            histogram = self.statements.get(text)
+            if histogram is None:
+                key = text if len(self.statements) < MAX_STATEMENTS else '(прочие запросы)'
+                histogram = self.statements.setdefault(key, Histogram())
+            histogram.add(elapsed_ms, rows, error)
+        if elapsed_ms >= self.slow_ms:
+            self.log_slow(conn, text, params, elapsed_ms, rows, many)
+
+    def log_slow(self, conn, sql, params, elapsed_ms, rows, many):
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'method': self.current_method(),
+            'ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'sql': sql,
+            'params': None if many else repr(params)[:500] if self.log_params else param_types(params),
+        }
+        if self.explain and not many and sql.upper().startswith(EXPLAINABLE):
+            try:
+                # Запрос плана - напрямую через sqlite3, мимо замеров
+                plan = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+                entry['plan'] = [detail for _, _, _, detail in plan]
+            except sqlite3.Error as e:
+                entry['plan_error'] = str(e)
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.slow_queries += 1
+            if self.slow_log:
+                with open(self.slow_log, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            else:
+                print(f"Slow query: {line}", file=sys.stderr)
+
+    def snapshot(self, top=50):
+        """Статистика по методам и top самым затратным (по суммарному времени) запросам"""
+        with self._lock:
+            methods = {name: histogram.summary() for name, histogram in sorted(self.methods.items())}
+            statements = sorted(self.statements.items(), key=lambda item: -item[1].total)[:top]
+            return {
+                'since': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'slow_ms': self.slow_ms,
+                'slow_queries': self.slow_queries,
+                'methods': methods,
+                'statements': [dict(histogram.summary(), sql=sql) for sql, histogram in statements],
+            }
+
+    def dump(self, path=None, top=50):
+        """Статистика в JSON: в файл path или строкой"""
+        text = json.dumps(self.snapshot(top), ensure_ascii=False, indent=2)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        return text
+
+
+def timed(method):
+    """Замер метода Database: время, число строк результата; исключение считается ошибкой"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self.query_stats
+        if stats is None:
+            return method(self, *args, **kwargs)
+        stats.enter(name)
+        started = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            stats.record_method(name, (time.perf_counter() - started) * 1000, error=True)
+            raise
+        finally:
+            stats.leave()
+        stats.record_method(name, (time.perf_counter() - started) * 1000, result_rows(result))
+        return result
+
+    return wrapper
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, замеряющий запросы.
+
+    Изменения записываются в статистику сразу после execute с числом строк
+    rowcount. SELECT выполняется по мере выборки строк, поэтому его время -
+    сумма execute и всех fetch*/итераций (без работы вызывающего между ними),
+    а строки - действительно полученные; запрос записывается, когда строки
+    выбраны до конца или курсор закрыт, переиспользован или удален.
+    """
+    _pending = None  # [текст, параметры, мс, строк] незавершенного SELECT
+
+    def execute(self, sql, parameters=()):
+        self.finish()
+        stats = self.connection.stats
+        if stats is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        except sqlite3.Error:
+            stats.record_statement(self.connection, sql, parameters, (time.perf_counter() - started) * 1000,
+                                   error=True)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self.description is None:
+            stats.record_statement(self.connection, sql, parameters, elapsed_ms,
+                                   self.rowcount if self.rowcount > 0 else None)
+        else:
+            self._pending = [sql, parameters, elapsed_ms, 0]
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        self.finish()
+        stats = self.connection.stats
+        if stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error:
+            stats.record_statement(self.connection, sql, None, (time.perf_counter() - started) * 1000,
+                                   error=True, many=True)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats.record_statement(self.connection, sql, None, elapsed_ms,
+                               self.rowcount if self.rowcount > 0 else None, many=True)
+        return result
+
+    def fetchone(self):
+        if self._pending is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        try:
+            row = super().fetchone()
+        except sqlite3.Error:
+            self.step(started, 0, error=True)
+            raise
+        self.step(started, row is not None, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        if self._pending is None:
+            return super().fetchmany(size)
+        started = time.perf_counter()
+        try:
+            rows = super().fetchmany(size)
+        except sqlite3.Error:
+            self.step(started, 0, error=True)
+            raise
+        self.step(started, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        if self._pending is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        try:
+            rows = super().fetchall()
+        except sqlite3.Error:
+            self.step(started, 0, error=True)
+            raise
+        self.step(started, len(rows))
+        return rows
+
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.step(started, 0)
+            raise
+        except sqlite3.Error:
+            self.step(started, 0, error=True)
+            raise
+        self.step(started, 1, done=False)
+        return row
+
+    def step(self, started, rows, done=True, error=False):
+        """Добавляет выборку строк к незавершенному SELECT; done - строки кончились"""
+        pending = self._pending
+        pending[2] += (time.perf_counter() - started) * 1000
+        pending[3] += rows
+        if done or error:
+            self.finish(error)
+
+    def finish(self, error=False):
+        """Записывает незавершенный SELECT в статистику"""
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            sql, parameters, elapsed_ms, rows = pending
+            self.connection.stats.record_statement(self.connection, sql, parameters, elapsed_ms, rows,
+                                                   error=error)
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self.finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, все запросы которого проходят через InstrumentedCursor; COMMIT тоже замеряется"""
+    stats = None  # QueryStats, назначается ConnectionManager после настройки соединения
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        super().commit()
+        if self.stats is not None:
+            self.stats.record_statement(self, 'COMMIT', (), (time.perf_counter() - started) * 1000)
@@ -0,0 +1,147 @@
+import sys
+import threading
+import time
+
+
+class ReferenceData:
+    """Справочники стран, городов, аэропортов и авиакомпаний в памяти.
+
+    Загружаются из базы один раз при первом обращении; строки интернируются.
+    Индексы: название -> ID (города, авиакомпании), IATA -> ID (аэропорты,
+    авиакомпании), город -> аэропорты. Записи, добавленные этим процессом,
+    вносятся через add_*; при промахе по названию или ID справочник
+    догружает только строки с ID больше уже известных, поэтому записи,
+    добавленные другими процессами, тоже находятся. Для названий, введенных
+    пользователем (опечатки, начало слова), догрузка при промахе выполняется
+    не чаще раза в miss_refresh_interval секунд.
+    """
+
+    def __init__(self, pool, miss_refresh_interval=5.0):
+        self.pool = pool
+        self.miss_refresh_interval = miss_refresh_interval
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает справочники; при следующем обращении они загрузятся заново"""
+        with self._lock:
+            self.loaded = False
+            self.countries = {}  # CountryID -> Name
+            self.cities = {}  # CityID -> (Name, CountryID)
+            self.airports = {}  # AirportID -> (AirportName, CityID, IATA_Code)
+            self.airlines = {}  # AirlineID -> (Name, IATA_Code)
+            self.cities_by_name = {}  # Name -> [CityID, ...] по возрастанию ID
+            self.airports_by_city = {}  # CityID -> [AirportID, ...] по возрастанию ID
+            self.airport_by_iata = {}
+            self.airline_by_name = {}
+            self.airline_by_iata = {}
+            self.last_ids = {'Country': 0, 'City': 0, 'Airports': 0, 'Airlines': 0}
+            self.refreshed_at = None
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.refresh()
+
+    def refresh(self):
+        """Догружает строки, появившиеся в базе после последней загрузки.
+        Записи, уже внесенные через add_*, пропускаются."""
+        tables = (
+            ('Country', 'SELECT CountryID, Name FROM Country WHERE CountryID > ?', self.add_country),
+            ('City', 'SELECT CityID, Name, CountryID FROM City WHERE CityID > ?', self.add_city),
+            ('Airports', 'SELECT AirportID, AirportName, CityID, IATA_Code FROM Airports WHERE AirportID > ?',
+             self.add_airport),
+            ('Airlines', 'SELECT AirlineID, Name, IATA_Code FROM Airlines WHERE AirlineID > ?', self.add_airline),
+        )
+        with self._lock, self.pool.connection() as conn:
+            for table, query, add in tables:
+                for row in conn.execute(query, (self.last_ids[table],)):
+                    add(*row)
+                    self.last_ids[table] = max(self.last_ids[table], row[0])
+            self.loaded = True
+            self.refreshed_at = time.monotonic()
+
+    @staticmethod
+    def intern(value):
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def add_country(self, country_id, name):
+        with self._lock:
+            self.countries[country_id] = self.intern(name)
+
+    def add_city(self, city_id, name, country_id=None):
+        with self._lock:
+            if city_id in self.cities:
+                return
+            name = self.intern(name)
+            self.cities[city_id] = (name, country_id)
+            self.cities_by_name.setdefault(name, []).append(city_id)
+
+    def add_airport(self, airport_id, name, city_id, iata=None):
+        with self._lock:
+            if airport_id in self.airports:
+                return
+            self.airports[airport_id] = (self.intern(name), city_id, self.intern(iata))
+            self.airports_by_city.setdefault(city_id, []).append(airport_id)
+            if iata:
+                self.airport_by_iata.setdefault(iata.upper(), airport_id)
+
+    def add_airline(self, airline_id, name, iata=None):
+        with self._lock:
+            if airline_id in self.airlines:
+                return
+            name = self.intern(name)
+            self.airlines[airline_id] = (name, self.intern(iata))
+            self.airline_by_name.setdefault(name, airline_id)
+            if iata:
+                self.airline_by_iata.setdefault(iata.upper(), airline_id)
+
+    def lookup(self, index_name, key, throttled=False):
+        """Ищет key в индексе; при промахе один раз догружает новые строки из базы.
+        С throttled=True догрузка при промахе - не чаще раза в miss_refresh_interval секунд."""
+        self.ensure_loaded()
+        index = getattr(self, index_name)
+        value = index.get(key)
+        if value is None and (not throttled or self.refresh_due()):
+            self.refresh()
+            value = index.get(key)
+        return value
+
+    def refresh_due(self):
+        refreshed_at = self.refreshed_at
+        return refreshed_at is None or time.monotonic() - refreshed_at >= self.miss_refresh_interval
+
+    def city_id(self, name):
+        # Как и в запросах к базе, при совпадении названий берется город с меньшим ID
+        city_ids = self.lookup('cities_by_name', name)
+        return city_ids[0] if city_ids else None
+
+    def airline_id(self, name):
+        return self.lookup('airline_by_name', name)
+
+    def airport_id_by_iata(self, code):
+        return self.lookup('airport_by_iata', code.upper())
+
+    def airline_id_by_iata(self, code):
+        return self.lookup('airline_by_iata', code.upper())
+
+    def city_airports(self, city_id):
+        return list(self.lookup('airports_by_city', city_id) or ())
+
+    def airports_for_city_name(self, name):
+        """Все аэропорты городов с указанным названием (введенным пользователем, поэтому
+        промахи не перечитывают справочники при каждом поиске)"""
+        city_ids = self.lookup('cities_by_name', name, throttled=True) or ()
+        return [airport_id for city_id in city_ids for airport_id in self.airports_by_city.get(city_id, ())]
+
+    def airport(self, airport_id):
+        """(название аэропорта, название города, IATA) по ID аэропорта"""
+        airport = self.lookup('airports', airport_id)
+        if airport is None:
+            return None, None, None
+        name, city_id, iata = airport
+        city = self.cities.get(city_id)
+        return name, city[0] if city else None, iata
+
+    def airline_name(self, airline_id):
+        airline = self.lookup('airlines', airline_id)
+        return airline[0] if airline else None
@@ -0,0 +1,174 @@
+import heapq
+import threading
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+EPOCH = datetime(2000, 1, 1)
+
+
+def to_minutes(value):
+    """Дата и время из базы ('YYYY-MM-DD HH:MM[:SS]') в минутах от EPOCH"""
+    return int((datetime.fromisoformat(value) - EPOCH).total_seconds()) // 60
+
+
+class RouteGraph:
+    """Граф рейсов с развертыванием по времени для поиска маршрутов с пересадками.
+
+    Вылеты хранятся по парам аэропортов (откуда -> куда), отсортированными по
+    времени, поэтому рейсы, на которые можно пересесть, находятся двоичным
+    поиском в окне [прилет + min_connection, прилет + max_connection].
+    Вершины поиска - рейсы, метки - (стоимость, длительность). Аэропорты,
+    из которых пункт назначения недостижим за оставшееся число перелетов,
+    отсекаются по статической сети маршрутов. Граф загружается из Flights при
+    первом поиске и дополняется через add_flight(); после массовых изменений
+    расписания вызывается reset().
+
+    Поиск идет без блокировки по снимку (flights, legs, incoming), взятому
+    под ней. add_flight() не меняет списки и словари снимка, а заменяет
+    их копиями (копируется только пара аэропортов нового рейса), поэтому
+    параллельные поиски и добавление рейсов не ждут друг друга.
+    """
+
+    def __init__(self, pool, min_connection=45, max_connection=24 * 60, since=None):
+        self.pool = pool
+        self.min_connection = min_connection  # минут на пересадку, не меньше
+        self.max_connection = max_connection  # и не больше
+        self.since = since  # рейсы раньше этой даты не загружаются (по умолчанию со вчерашнего дня)
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.loaded = False
+            self.flights = {}  # FlightID -> (откуда, куда, вылет, прилет, цена)
+            # откуда -> {куда: ([время вылета], [FlightID])} по возрастанию времени
+            self.legs = {}
+            self.incoming = {}  # куда -> множество аэропортов, откуда есть рейсы
+            self.snapshot = None  # (flights, legs, incoming) загруженного графа для поиска
+
+    def ensure_loaded(self):
+        """Загружает граф при первом обращении; возвращает снимок (flights, legs, incoming)"""
+        snapshot = self.snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            return self.snapshot
+
+    def load(self):
+        since = self.since or (date.today() - timedelta(days=1)).isoformat()
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT FlightID, OriginAirportID, DestinationAirportID, DepartureDate, ArrivalDate, Price
+                FROM Flights WHERE DepartureDate >= ?
+            ''', (since,)).fetchall()
+        flights, legs, incoming = {}, {}, {}
+        by_pair = {}
+        for flight_id, origin, destination, departure, arrival, price in rows:
+            departure, arrival = to_minutes(departure), to_minutes(arrival)
+            flights[flight_id] = (origin, destination, departure, arrival, price or 0)
+            by_pair.setdefault((origin, destination), []).append((departure, flight_id))
+        for (origin, destination), pair_flights in by_pair.items():
+            pair_flights.sort()
+            legs.setdefault(origin, {})[destination] = ([t for t, _ in pair_flights], [f for _, f in pair_flights])
+            incoming.setdefault(destination, set()).add(origin)
+        self.flights, self.legs, self.incoming = flights, legs, incoming
+        self.loaded = True
+        self.snapshot = flights, legs, incoming
+
+    def add_flight(self, flight_id, origin, destination, departure, arrival, price):
+        """Добавляет новый рейс в уже загруженный граф (копированием, снимки поисков не меняются)"""
+        with self._lock:
+            if not self.loaded:
+                return
+            departure, arrival = to_minutes(departure), to_minutes(arrival)
+            # Новый ключ не мешает поискам по снимку: они ищут только рейсы из своих legs
+            self.flights[flight_id] = (origin, destination, departure, arrival, price or 0)
+            times, flight_ids = self.legs.get(origin, {}).get(destination, ((), ()))
+            index = bisect_left(times, departure)
+            pair = ([*times[:index], departure, *times[index:]],
+                    [*flight_ids[:index], flight_id, *flight_ids[index:]])
+            self.legs = dict(self.legs)
+            self.legs[origin] = {**self.legs.get(origin, {}), destination: pair}
+            if origin not in self.incoming.get(destination, ()):
+                self.incoming = dict(self.incoming)
+                self.incoming[destination] = self.incoming.get(destination, frozenset()) | {origin}
+            self.snapshot = self.flights, self.legs, self.incoming
+
+    @staticmethod
+    def reachable(incoming, destinations, max_legs):
+        """reach[k] - аэропорты, из которых destinations достижимы не более чем за k перелетов"""
+        reach = [frozenset(destinations)]
+        for _ in range(max_legs):
+            previous = reach[-1]
+            reach.append(previous | {origin for airport in previous for origin in incoming.get(airport, ())})
+        return reach
+
+    @staticmethod
+    def departures(legs, airport_id, allowed, earliest, latest):
+        """Рейсы из аэропорта в аэропорты allowed с вылетом в [earliest, latest]"""
+        for destination, (times, flight_ids) in legs.get(airport_id, {}).items():
+            if destination in allowed:
+                yield from flight_ids[bisect_left(times, earliest):bisect_left(times, latest + 1)]
+
+    def search(self, origins, destinations, day, max_stops=1, order='price', limit=10,
+               max_duration=48 * 60, max_labels=100000):
+        """Маршруты из любого аэропорта origins в любой из destinations с первым вылетом в день day.
+
+        order='price' - по возрастанию суммарной цены, order='duration' - по времени
+        от первого вылета до последнего прилета. Поиск - Дейкстра по рейсам с
+        ограничениями на число пересадок, длительность маршрута и число
+        рассмотренных меток; каждый рейс получает не более limit меток, так что
+        находятся до limit лучших маршрутов. Возвращает список
+        (цена, длительность в минутах, (FlightID, ...)).
+        """
+        # Поиск по снимку, без блокировки: параллельные поиски не ждут друг друга
+        flights, legs, incoming = self.ensure_loaded()
+        day_start = to_minutes(day)
+        day_end = day_start + 24 * 60
+        by_price = order == 'price'
+        max_legs = max_stops + 1
+
+        destinations = frozenset(destinations)
+        reach = self.reachable(incoming, destinations, max_legs)
+        heap = []
+        for origin in origins:
+            for flight_id in self.departures(legs, origin, reach[max_legs - 1], day_start, day_end - 1):
+                _, _, departure, arrival, price = flights[flight_id]
+                key = (price, arrival - departure) if by_price else (arrival - departure, price)
+                heap.append((key, (flight_id,), departure))
+        heapq.heapify(heap)
+
+        results = []
+        pushed = {}  # FlightID -> число меток, уже поставленных в очередь
+        labels = len(heap)
+        while heap and len(results) < limit and labels <= max_labels:
+            key, path, first_departure = heapq.heappop(heap)
+            _, destination, _, arrival, _ = flights[path[-1]]
+            if destination in destinations:
+                price, duration = key if by_price else (key[1], key[0])
+                results.append((price, duration, path))
+                continue
+            if len(path) >= max_legs:
+                continue
+
+            visited = {flights[f][0] for f in path}
+            visited.add(destination)
+            allowed = reach[max_legs - len(path) - 1] - visited
+            price = key[0] if by_price else key[1]
+            latest = min(arrival + self.max_connection, first_departure + max_duration)
+            for next_id in self.departures(legs, destination, allowed, arrival + self.min_connection, latest):
+                count = pushed.get(next_id, 0)
+                if count >= limit:
+                    continue
+                pushed[next_id] = count + 1
+                next_arrival, next_price = flights[next_id][3:5]
+                duration = next_arrival - first_departure
+                if duration > max_duration:
+                    continue
+                total = price + next_price
+                next_key = (total, duration) if by_price else (duration, total)
+                heapq.heappush(heap, (next_key, path + (next_id,), first_departure))
+                labels += 1
+        return results
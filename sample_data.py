@@ -0,0 +1,310 @@
+"""Детерминированный генератор демонстрационных и нагрузочных данных.
+
+Сеть маршрутов строится от хабов авиакомпаний к городам по их координатам:
+длительность и цена рейса зависят от расстояния, частота - от дальности
+маршрута. Расписание генерируется на каждый день горизонта начиная с
+указанной даты (по умолчанию с сегодняшней), поэтому рейсы всегда доступны
+для поиска. При одинаковом seed и дате результат одинаков.
+
+    python sample_data.py --db airline_system.db --days 30
+"""
+import argparse
+import math
+import random
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from seat_inventory import SEAT_FREE
+
+COUNTRIES = ('Россия', 'США', 'Франция', 'Германия', 'Италия', 'Испания', 'Турция')
+
+# (город, страна, широта, долгота)
+CITIES = (
+    ('Москва', 'Россия', 55.75, 37.62),
+    ('Санкт-Петербург', 'Россия', 59.94, 30.31),
+    ('Сочи', 'Россия', 43.59, 39.73),
+    ('Казань', 'Россия', 55.79, 49.12),
+    ('Екатеринбург', 'Россия', 56.84, 60.61),
+    ('Новосибирск', 'Россия', 55.03, 82.92),
+    ('Калининград', 'Россия', 54.71, 20.51),
+    ('Нью-Йорк', 'США', 40.71, -74.01),
+    ('Париж', 'Франция', 48.86, 2.35),
+    ('Ницца', 'Франция', 43.70, 7.27),
+    ('Берлин', 'Германия', 52.52, 13.40),
+    ('Мюнхен', 'Германия', 48.14, 11.58),
+    ('Рим', 'Италия', 41.90, 12.50),
+    ('Милан', 'Италия', 45.46, 9.19),
+    ('Барселона', 'Испания', 41.39, 2.17),
+    ('Мадрид', 'Испания', 40.42, -3.70),
+    ('Стамбул', 'Турция', 41.01, 28.98),
+    ('Анталья', 'Турция', 36.90, 30.70),
+)
+
+# (название, город, IATA)
+AIRPORTS = (
+    ('Международный аэропорт Шереметьево', 'Москва', 'SVO'),
+    ('Международный аэропорт Домодедово', 'Москва', 'DME'),
+    ('Аэропорт Пулково', 'Санкт-Петербург', 'LED'),
+    ('Международный аэропорт Сочи', 'Сочи', 'AER'),
+    ('Международный аэропорт Казань', 'Казань', 'KZN'),
+    ('Аэропорт Кольцово', 'Екатеринбург', 'SVX'),
+    ('Аэропорт Толмачево', 'Новосибирск', 'OVB'),
+    ('Аэропорт Храброво', 'Калининград', 'KGD'),
+    ('Международный аэропорт Джона Кеннеди', 'Нью-Йорк', 'JFK'),
+    ('Аэропорт Шарль-де-Голль', 'Париж', 'CDG'),
+    ('Аэропорт Лазурный Берег', 'Ницца', 'NCE'),
+    ('Аэропорт Берлин-Бранденбург', 'Берлин', 'BER'),
+    ('Аэропорт Мюнхен', 'Мюнхен', 'MUC'),
+    ('Аэропорт Леонардо да Винчи', 'Рим', 'FCO'),
+    ('Аэропорт Мальпенса', 'Милан', 'MXP'),
+    ('Аэропорт Эль-Прат', 'Барселона', 'BCN'),
+    ('Аэропорт Барахас', 'Мадрид', 'MAD'),
+    ('Аэропорт Стамбул', 'Стамбул', 'IST'),
+    ('Аэропорт Анталья', 'Анталья', 'AYT'),
+)
+
+# (авиакомпания, IATA, хабы, число направлений из каждого хаба)
+AIRLINES = (
+    ('Aeroflot', 'SU', ('SVO',), 14),
+    ('S7 Airlines', 'S7', ('DME', 'OVB'), 8),
+    ('Air France', 'AF', ('CDG',), 6),
+    ('Lufthansa', 'LH', ('BER', 'MUC'), 5),
+    ('Turkish Airlines', 'TK', ('IST',), 8),
+    ('American Airlines', 'AA', ('JFK',), 3),
+)
+
+FIRST_DEPARTURE = 6 * 60  # минут от начала суток
+LAST_DEPARTURE = 22 * 60
+CRUISE_SPEED = 800  # км/ч
+GROUND_MINUTES = 30
+
+
+def distance_km(a, b):
+    """Расстояние по большому кругу между точками (широта, долгота)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+def synthetic_iata(index, used):
+    """Трехбуквенный код, не совпадающий с уже занятыми"""
+    while True:
+        n, letters = index, []
+        for _ in range(3):
+            n, rest = divmod(n, 26)
+            letters.append(chr(ord('A') + rest))
+        code = ''.join(reversed(letters))
+        index += 1
+        if code not in used:
+            used.add(code)
+            return code, index
+
+
+def build_network(rng, extra_cities=0):
+    """Справочники и маршруты: (города, аэропорты, маршруты).
+    Маршрут: (авиакомпания, откуда IATA, куда IATA, км, рейсов в день, дни недели)"""
+    cities = list(CITIES)
+    airports = list(AIRPORTS)
+    coordinates = {name: (lat, lon) for name, _, lat, lon in cities}
+    airport_city = {iata: city for _, city, iata in airports}
+
+    # Дополнительные города для нагрузочных тестов: по одному аэропорту
+    used_codes = set(airport_city)
+    code_index = 0
+    for n in range(extra_cities):
+        name = f'Город {n + 1}'
+        lat, lon = round(rng.uniform(43.0, 62.0), 2), round(rng.uniform(20.0, 90.0), 2)
+        code, code_index = synthetic_iata(code_index, used_codes)
+        cities.append((name, 'Россия', lat, lon))
+        airports.append((f'Аэропорт {name}', name, code))
+        coordinates[name] = (lat, lon)
+        airport_city[code] = name
+
+    def km(origin, destination):
+        return distance_km(coordinates[airport_city[origin]], coordinates[airport_city[destination]])
+
+    routes = {}
+
+    def add_route(airline, origin, destination):
+        if airport_city[origin] == airport_city[destination] or (airline, origin, destination) in routes:
+            return
+        distance = km(origin, destination)
+        if distance < 1500:
+            per_day, weekdays = rng.choice((2, 3)), tuple(range(7))
+        elif distance < 4000:
+            per_day, weekdays = rng.choice((1, 2)), tuple(range(7))
+        else:
+            # Дальние рейсы выполняются не каждый день
+            per_day, weekdays = 1, tuple(sorted(rng.sample(range(7), rng.randint(3, 6))))
+        for key in ((airline, origin, destination), (airline, destination, origin)):
+            routes[key] = (distance, per_day, weekdays)
+
+    real_codes = [iata for _, _, iata in AIRPORTS]
+    for airline, _, hubs, spokes in AIRLINES:
+        for hub in hubs:
+            candidates = [code for code in real_codes if airport_city[code] != airport_city[hub]]
+            for destination in rng.sample(candidates, min(spokes, len(candidates))):
+                add_route(airline, hub, destination)
+
+    # Каждый дополнительный город связан с одним-тремя хабами
+    hubs = [(airline, hub) for airline, _, airline_hubs, _ in AIRLINES for hub in airline_hubs]
+    for _, city, code in airports[len(AIRPORTS):]:
+        for airline, hub in rng.sample(hubs, rng.randint(1, 3)):
+            add_route(airline, hub, code)
+
+    network = [(airline, origin, destination, *params)
+               for (airline, origin, destination), params in sorted(routes.items())]
+    return cities, airports, network
+
+
+def departure_slots(rng, per_day):
+    """Время вылетов в течение суток (минуты), кратное 5 минутам"""
+    step = (LAST_DEPARTURE - FIRST_DEPARTURE) // per_day
+    return [FIRST_DEPARTURE + n * step + rng.randrange(0, max(step, 5), 5) for n in range(per_day)]
+
+
+def schedule(rng, network, start, days, flights=None):
+    """Генерирует рейсы (авиакомпания, откуда, куда, вылет, прилет, цена) день за днем.
+
+    Если задано flights, частота всех маршрутов масштабируется до этого числа
+    рейсов: при нехватке частота растет, затем у каждого маршрута остается
+    равномерно прореженная доля его рейсов по всему горизонту days, так что
+    любой день расписания получает рейсы, а всего их ровно flights."""
+    natural = sum(per_day * sum(1 for n in range(days) if (start + timedelta(days=n)).weekday() in weekdays)
+                  for _, _, _, _, per_day, weekdays in network)
+    scale = flights / natural if flights and natural else 1.0
+
+    timetable = []
+    for airline, origin, destination, distance, per_day, weekdays in network:
+        if scale > 1:
+            per_day, weekdays = min(200, math.ceil(per_day * scale)), tuple(range(7))
+        duration = GROUND_MINUTES + round(distance / CRUISE_SPEED * 60 / 5) * 5
+        base_price = round((2500 + distance * 5.5) * rng.uniform(0.85, 1.25), -2)
+        timetable.append((airline, origin, destination, duration, base_price, weekdays,
+                          sorted(departure_slots(rng, per_day))))
+
+    # Рейсы-кандидаты нумеруются маршрут за маршрутом; из номеров i..i+1 рейс остается,
+    # если между ними проходит граница i * flights / total (равномерный шаг по маршруту)
+    day_weekdays = [(start + timedelta(days=day)).weekday() for day in range(days)]
+    offsets = []
+    total = 0
+    for _, _, _, _, _, weekdays, slots in timetable:
+        offsets.append(total)
+        total += len(slots) * sum(1 for weekday in day_weekdays if weekday in weekdays)
+    keep = min(flights, total) if flights is not None else total
+
+    for day in range(days):
+        current = start + timedelta(days=day)
+        weekend = current.weekday() >= 5
+        for route, (airline, origin, destination, duration, base_price, weekdays, slots) in enumerate(timetable):
+            if current.weekday() not in weekdays:
+                continue
+            for minutes in slots:
+                index = offsets[route]
+                offsets[route] += 1
+                if (index + 1) * keep // total == index * keep // total:
+                    continue
+                departure = current + timedelta(minutes=minutes)
+                arrival = departure + timedelta(minutes=duration)
+                price = round(base_price * rng.uniform(0.9, 1.1) * (1.15 if weekend else 1.0), -2)
+                yield (airline, origin, destination, departure.strftime('%Y-%m-%d %H:%M:%S'),
+                       arrival.strftime('%Y-%m-%d %H:%M:%S'), price)
+
+
+def generate(cursor, seats, seed=1, start_date=None, days=30, extra_cities=0, flights=None, capacity=100):
+    """Записывает справочники, расписание и схемы мест в текущей транзакции cursor.
+
+    Справочники добавляются только если их еще нет (по названию или IATA),
+    рейсы - всегда. Все вставки - executemany, схемы мест - одним
+    INSERT ... SELECT из шаблона салона. Возвращает сводку: число рейсов,
+    диапазон их ID и названия городов и авиакомпаний.
+    """
+    rng = random.Random(seed)
+    if start_date is None:
+        start_date = date.today().isoformat()
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    cities, airports, network = build_network(rng, extra_cities)
+
+    cursor.executemany('INSERT INTO Country (Name) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM Country WHERE Name = ?)',
+                       [(name, name) for name in COUNTRIES])
+    cursor.executemany('''
+        INSERT INTO City (Name, CountryID)
+        SELECT ?, (SELECT MIN(CountryID) FROM Country WHERE Name = ?)
+        WHERE NOT EXISTS (SELECT 1 FROM City WHERE Name = ?)
+    ''', [(name, country, name) for name, country, _, _ in cities])
+    cursor.executemany('''
+        INSERT INTO Airports (AirportName, CityID, IATA_Code)
+        SELECT ?, (SELECT MIN(CityID) FROM City WHERE Name = ?), ?
+        WHERE NOT EXISTS (SELECT 1 FROM Airports WHERE IATA_Code = ?)
+    ''', [(name, city, iata, iata) for name, city, iata in airports])
+    cursor.executemany('''
+        INSERT INTO Airlines (Name, IATA_Code)
+        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM Airlines WHERE Name = ?)
+    ''', [(name, iata, name) for name, iata, _, _ in AIRLINES])
+
+    airline_ids = {}
+    for airline_id, name in cursor.execute('SELECT AirlineID, Name FROM Airlines ORDER BY AirlineID DESC'):
+        airline_ids[name] = airline_id
+    airport_ids = {}
+    for airport_id, iata in cursor.execute(
+            'SELECT AirportID, IATA_Code FROM Airports WHERE IATA_Code IS NOT NULL ORDER BY AirportID DESC'):
+        airport_ids[iata] = airport_id
+
+    last_id = cursor.execute('SELECT COALESCE(MAX(FlightID), 0) FROM Flights').fetchone()[0]
+    rows = schedule(rng, network, start, days, flights)
+    while True:
+        chunk = [(airline_ids[airline], departure, arrival, airport_ids[origin], airport_ids[destination],
+                  price, capacity)
+                 for airline, origin, destination, departure, arrival, price in islice(rows, 10000)]
+        if not chunk:
+            break
+        cursor.executemany('''
+            INSERT INTO Flights (AirlineID, DepartureDate, ArrivalDate,
+                               OriginAirportID, DestinationAirportID, Price, AvailableSeats)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', chunk)
+    first_id, last_new_id = cursor.execute(
+        'SELECT MIN(FlightID), MAX(FlightID) FROM Flights WHERE FlightID > ?', (last_id,)).fetchone()
+
+    # Схема мест: шаблон салона во временной таблице, размноженный по всем новым рейсам
+    cursor.execute('DROP TABLE IF EXISTS temp.seat_template')
+    cursor.execute('CREATE TEMP TABLE seat_template (Position INTEGER PRIMARY KEY, SeatNumber TEXT, '
+                   'Class TEXT, Factor REAL)')
+    cursor.executemany('INSERT INTO temp.seat_template VALUES (?, ?, ?, ?)',
+                       [(position, label, travel_class, factor) for position, (label, travel_class, factor)
+                        in enumerate(islice(seats.layout_seats(), capacity))])
+    cursor.execute('''
+        INSERT INTO Tickets (FlightID, SeatNumber, Price, Status, Class)
+        SELECT f.FlightID, s.SeatNumber, f.Price * s.Factor, ?, s.Class
+        FROM Flights f JOIN temp.seat_template s ON s.Position < f.AvailableSeats
+        WHERE f.FlightID > ?
+        ORDER BY f.FlightID, s.Position
+    ''', (SEAT_FREE, last_id))
+    cursor.execute('DROP TABLE temp.seat_template')
+
+    return {
+        'flights': (last_new_id - first_id + 1) if first_id else 0,
+        'flight_ids': (first_id, last_new_id),
+        'cities': [name for name, _, _, _ in cities],
+        'airlines': [name for name, _, _, _ in AIRLINES],
+        'routes': len(network),
+        'start_date': start_date,
+        'days': days,
+    }
+
+
+if __name__ == "__main__":
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Добавляет в базу сгенерированное расписание рейсов")
+    parser.add_argument('--db', default='airline_system.db', help="файл базы данных")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--start', help="первый день расписания, ГГГГ-ММ-ДД (по умолчанию сегодня)")
+    parser.add_argument('--days', type=int, default=30, help="горизонт расписания в днях")
+    parser.add_argument('--extra-cities', type=int, default=0, help="дополнительные синтетические города")
+    parser.add_argument('--flights', type=int, help="масштабировать расписание до этого числа рейсов")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    db.insert_sample_data(seed=args.seed, start_date=args.start, days=args.days,
+                          extra_cities=args.extra_cities, flights=args.flights)
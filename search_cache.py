@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SearchCache:
+    """Ограниченный LRU-кэш результатов поиска рейсов со сроком жизни записей.
+
+    Ключ: (аэропорты отправления, аэропорты прибытия, дата, класс, пассажиры,
+    ...), где аэропорты - отсортированные кортежи ID, в которые разрешился
+    введенный текст, поэтому "Москва", "москва" и "SVO" с тем же набором
+    аэропортов попадают в одну запись. Записи дополнительно сгруппированы по
+    паре аэропортов и дате, чтобы изменение одного рейса сбрасывало только
+    поиски, в которые он мог попасть.
+
+    У каждой пары аэропортов с датой есть номер поколения, который растет при
+    каждом сбросе. Поиск берет generation(key) до запроса в базу и передает
+    его в put(): если маршрут успели изменить, пока шел запрос, прочитанные до
+    изменения строки в кэш не попадают.
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ключ -> (время записи, строки)
+        self._routes = {}  # (аэропорт отправления, аэропорт прибытия, дата) -> множество ключей
+        self._generations = {}  # (аэропорт отправления, аэропорт прибытия, дата) -> число сбросов
+        self._epoch = 0  # число полных сбросов (clear)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale = 0  # результаты, отброшенные put() из-за сброса во время запроса
+
+    @staticmethod
+    def routes_of(key):
+        origins, destinations, date = key[:3]
+        return [(origin, destination, date) for origin in origins for destination in destinations]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, rows = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(rows)
+                # Запись устарела
+                self._remove(key)
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def generation(self, key):
+        """Отметка для put(): берется до запроса в базу"""
+        with self._lock:
+            return self._generation(key)
+
+    def _generation(self, key):
+        return self._epoch, tuple(self._generations.get(route, 0) for route in self.routes_of(key))
+
+    def put(self, key, rows, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation(key):
+                self.stale += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), tuple(rows))
+            for route in self.routes_of(key):
+                self._routes.setdefault(route, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        for route in self.routes_of(key):
+            keys = self._routes.get(route)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._routes[route]
+
+    def invalidate_route(self, origin, destination, date):
+        """Сбрасывает все закэшированные поиски, в которые входят рейсы
+        из аэропорта origin в аэропорт destination (ID) на указанную дату"""
+        route = (origin, destination, date)
+        with self._lock:
+            self._generations[route] = self._generations.get(route, 0) + 1
+            for key in list(self._routes.get(route, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._routes.clear()
+            # Новая эпоха обесценивает все выданные отметки, поэтому счетчики маршрутов не нужны
+            self._epoch += 1
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'stale': self.stale,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,185 @@
+import threading
+
+# Салон по умолчанию: (класс, число рядов, множитель цены). Economy занимает оставшиеся ряды
+CABIN_LAYOUT = (
+    ('First', 1, 3),
+    ('Business', 3, 2),
+    ('Economy', None, 1),
+)
+SEAT_LETTERS = 'ABCDEF'
+SEAT_FREE = 'Доступен'
+SEAT_SOLD = 'Продан'
+
+
+class SeatsUnavailable(Exception):
+    """Недостаточно свободных мест нужного класса"""
+
+
+class FlightSeatMap:
+    """Схема мест одного рейса: строки Tickets и битовые маски свободных мест по классам"""
+    __slots__ = ('ticket_ids', 'labels', 'classes', 'positions', 'free')
+
+    def __init__(self):
+        self.ticket_ids = []
+        self.labels = []
+        self.classes = []
+        self.positions = {}  # номер места -> индекс бита
+        self.free = {}  # класс -> int, бит i установлен, если место i свободно
+
+    def add(self, ticket_id, label, travel_class, is_free):
+        index = len(self.ticket_ids)
+        self.ticket_ids.append(ticket_id)
+        self.labels.append(label)
+        self.classes.append(travel_class)
+        self.positions[label] = index
+        mask = self.free.get(travel_class, 0)
+        self.free[travel_class] = mask | (1 << index) if is_free else mask
+
+    def pick(self, travel_class, count):
+        """Индексы первых count свободных мест класса (маска не меняется) или None"""
+        mask = self.free.get(travel_class, 0)
+        picked = []
+        for _ in range(count):
+            if not mask:
+                return None
+            lowest = mask & -mask
+            picked.append(lowest.bit_length() - 1)
+            mask ^= lowest
+        return picked
+
+    def mark_sold(self, travel_class, indexes):
+        mask = self.free[travel_class]
+        for index in indexes:
+            mask &= ~(1 << index)
+        self.free[travel_class] = mask
+
+    def mark_free(self, index):
+        travel_class = self.classes[index]
+        self.free[travel_class] = self.free.get(travel_class, 0) | (1 << index)
+
+    def free_count(self, travel_class):
+        return bin(self.free.get(travel_class, 0)).count('1')
+
+
+class SeatInventory:
+    """Распределение мест по рейсам.
+
+    Схема мест хранится в таблице Tickets (одна строка на место, индекс
+    idx_tickets_flight), а в памяти для каждого рейса держится FlightSeatMap,
+    так что поиск и выдача свободного места не зависят от числа проданных билетов.
+    Все изменяющие методы вызываются внутри транзакции на запись; итог каждой
+    выдачи сверяется с таблицей, поэтому устаревший кэш приводит только к
+    перечитыванию схемы рейса, а не к двойной продаже места.
+    """
+
+    def __init__(self):
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def ensure_seat_map(self, cursor, flight_id):
+        """Дополняет схему мест рейса так, чтобы свободных мест было не меньше AvailableSeats"""
+        row = cursor.execute('SELECT Price, AvailableSeats FROM Flights WHERE FlightID = ?',
+                             (flight_id,)).fetchone()
+        if not row:
+            return
+        base_price, available = row
+        existing = cursor.execute('SELECT SeatNumber, Status FROM Tickets WHERE FlightID = ?',
+                                  (flight_id,)).fetchall()
+        missing = (available or 0) - sum(1 for _, status in existing if status == SEAT_FREE)
+        if missing <= 0:
+            return
+
+        used = {label for label, _ in existing}
+        cursor.executemany('''
+            INSERT INTO Tickets (FlightID, SeatNumber, Price, Status, Class)
+            VALUES (?, ?, ?, ?, ?)
+        ''', self.new_seat_rows(flight_id, base_price, missing, used))
+
+    def new_seat_rows(self, flight_id, base_price, count, used=()):
+        """Строки Tickets для count новых мест рейса по CABIN_LAYOUT, пропуская занятые номера"""
+        rows = []
+        for label, travel_class, factor in self.layout_seats():
+            if len(rows) == count:
+                break
+            if label in used:
+                continue
+            rows.append((flight_id, label, (base_price or 0) * factor, SEAT_FREE, travel_class))
+        return rows
+
+    @staticmethod
+    def layout_seats():
+        """Бесконечная последовательность мест салона по CABIN_LAYOUT: (номер, класс, множитель цены)"""
+        row = 1
+        for travel_class, rows, factor in CABIN_LAYOUT:
+            last_row = row + rows if rows is not None else None
+            while last_row is None or row < last_row:
+                for letter in SEAT_LETTERS:
+                    yield f"{row}{letter}", travel_class, factor
+                row += 1
+
+    def load(self, cursor, flight_id):
+        self.ensure_seat_map(cursor, flight_id)
+        seat_map = FlightSeatMap()
+        cursor.execute('''
+            SELECT TicketID, SeatNumber, Class, Status FROM Tickets
+            WHERE FlightID = ? ORDER BY TicketID
+        ''', (flight_id,))
+        for ticket_id, label, travel_class, status in cursor:
+            seat_map.add(ticket_id, label, travel_class, status == SEAT_FREE)
+        with self._lock:
+            self._maps[flight_id] = seat_map
+        return seat_map
+
+    def seat_map(self, cursor, flight_id):
+        with self._lock:
+            seat_map = self._maps.get(flight_id)
+        return seat_map if seat_map is not None else self.load(cursor, flight_id)
+
+    def invalidate(self, flight_id=None):
+        with self._lock:
+            if flight_id is None:
+                self._maps.clear()
+            else:
+                self._maps.pop(flight_id, None)
+
+    def free_seats(self, cursor, flight_id, travel_class):
+        """Число свободных мест класса на рейсе"""
+        return self.seat_map(cursor, flight_id).free_count(travel_class)
+
+    def allocate(self, cursor, flight_id, travel_class, count):
+        """Выдает count мест класса и возвращает их номера; иначе SeatsUnavailable"""
+        for attempt in range(2):
+            seat_map = self.seat_map(cursor, flight_id) if attempt == 0 else self.load(cursor, flight_id)
+            picked = seat_map.pick(travel_class, count)
+            if picked is None:
+                continue
+            ticket_ids = [seat_map.ticket_ids[index] for index in picked]
+            placeholders = ', '.join('?' * len(ticket_ids))
+            # Вызов идет под блокировкой на запись, поэтому между проверкой и
+            # обновлением места никто занять не может
+            still_free = cursor.execute(f'''
+                SELECT COUNT(*) FROM Tickets WHERE TicketID IN ({placeholders}) AND Status = ?
+            ''', (*ticket_ids, SEAT_FREE)).fetchone()[0]
+            if still_free != count:
+                # Кэш устарел (место продано другим процессом) - перечитываем схему рейса
+                continue
+            cursor.execute(f'''
+                UPDATE Tickets SET Status = ?, BookingDate = CURRENT_TIMESTAMP
+                WHERE TicketID IN ({placeholders})
+            ''', (SEAT_SOLD, *ticket_ids))
+            seat_map.mark_sold(travel_class, picked)
+            return [seat_map.labels[index] for index in picked]
+        raise SeatsUnavailable(travel_class)
+
+    def release(self, cursor, flight_id, seat_number):
+        """Возвращает место в продажу"""
+        cursor.execute('''
+            UPDATE Tickets SET Status = ?, BookingDate = NULL
+            WHERE FlightID = ? AND SeatNumber = ? AND Status = ?
+        ''', (SEAT_FREE, flight_id, seat_number, SEAT_SOLD))
+        with self._lock:
+            seat_map = self._maps.get(flight_id)
+        if seat_map is not None and cursor.rowcount:
+            index = seat_map.positions.get(seat_number)
+            if index is not None:
+                seat_map.mark_free(index)
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from database import Database
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Временный каталог на каждый тест: self.workdir, путь к базе self.path"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='anavia_test_')
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        self.path = os.path.join(self.workdir, 'test.db')
+
+    def open_database(self, **options):
+        """База с демонстрационными данными в self.path; закрывается после теста"""
+        db = Database(self.path, **dict({'query_stats': False}, **options))
+        self.addCleanup(db.pool.close_all)
+        return db
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Одна временная база с демонстрационными данными на класс тестов: cls.db"""
+    database_options = {}  # дополнительные аргументы Database
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.mkdtemp(prefix='anavia_test_')
+        cls.path = os.path.join(cls.workdir, 'test.db')
+        cls.db = Database(cls.path, **dict({'query_stats': False}, **cls.database_options))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.pool.close_all()
+        shutil.rmtree(cls.workdir, ignore_errors=True)
@@ -0,0 +1,92 @@
+import http.server
+import threading
+import time
+import unittest
+
+from booking_client import RemoteCancelled, RemoteDatabase, RemoteError
+
+
+class FlakyHandler(http.server.BaseHTTPRequestHandler):
+    """Считает запросы. Первый запрос к /flaky... и /slow рвет соединение без ответа,
+    после ответа на /bye сервер закрывает соединение, как простаивающее"""
+    protocol_version = 'HTTP/1.1'
+
+    def handle_request(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        with server.lock:
+            server.counts[self.path] = server.counts.get(self.path, 0) + 1
+            first = server.counts[self.path] == 1
+        if self.path.startswith('/slow'):
+            time.sleep(2)
+        if first and self.path.startswith(('/flaky', '/slow')):
+            self.close_connection = True
+            return
+        data = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.close_connection = self.path == '/bye'
+
+    do_GET = do_POST = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.counts = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.remote = RemoteDatabase(f'127.0.0.1:{self.server.server_address[1]}', timeout=5)
+
+    def tearDown(self):
+        self.remote.pool.close_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_is_retried(self):
+        self.assertEqual(self.remote.request('GET', '/flaky-get'), {'ok': True})
+        self.assertEqual(self.server.counts['/flaky-get'], 2)
+
+    def test_sent_post_is_not_retried(self):
+        with self.assertRaises(RemoteError):
+            self.remote.request('POST', '/flaky-post', body={'flight_id': 1})
+        self.assertEqual(self.server.counts['/flaky-post'], 1)
+
+    def test_interrupted_post_raises_cancelled(self):
+        errors = []
+
+        def run():
+            try:
+                self.remote.request('POST', '/slow', body={'flight_id': 1})
+            except RemoteError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        while not self.server.counts.get('/slow'):
+            time.sleep(0.01)
+        self.remote.pool.interrupt(thread.ident)
+        thread.join(5)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], RemoteCancelled)
+        time.sleep(2.2)
+        self.assertEqual(self.server.counts['/slow'], 1)
+
+    def test_closed_keep_alive_connection_is_replaced_before_post(self):
+        self.remote.request('GET', '/bye')
+        time.sleep(0.2)  # соединение простаивает, закрытие сервером дошло до клиента
+        self.assertEqual(self.remote.request('POST', '/post', body={}), {'ok': True})
+        self.assertEqual(self.server.counts['/post'], 1)
+        self.assertEqual(self.remote.pool.stats()['opened'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
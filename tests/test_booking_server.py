@@ -0,0 +1,144 @@
+import asyncio
+import os
+import socket
+import threading
+import unittest
+
+from booking_client import RemoteAuthService, RemoteDatabase
+from booking_server import BookingServer
+from database import PasswordHasher
+from tests import DatabaseTestCase
+
+DAY = '2031-03-15'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ServerTestCase(DatabaseTestCase):
+    """Сервер бронирования в отдельном потоке над временной базой"""
+    database_options = {'hasher': PasswordHasher(cost=2 ** 10)}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = BookingServer(cls.db, port=free_port(), read_threads=2)
+        cls.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(cls.loop)
+            cls.task = cls.loop.create_task(cls.server.serve())
+            cls.loop.call_soon(started.set)
+            try:
+                cls.loop.run_until_complete(cls.task)
+            except asyncio.CancelledError:
+                pass
+
+        cls.thread = threading.Thread(target=run, daemon=True)
+        cls.thread.start()
+        started.wait()
+        cls.wait_until_listening()
+
+    @classmethod
+    def wait_until_listening(cls):
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', cls.server.port), timeout=0.1).close()
+                return
+            except OSError:
+                threading.Event().wait(0.05)
+        raise RuntimeError("Сервер не запустился")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.task.cancel)
+        cls.thread.join(5)
+        cls.loop.close()
+        super().tearDownClass()
+
+    def client(self, login=None, password=None):
+        remote = RemoteDatabase(f'127.0.0.1:{self.server.port}')
+        self.addCleanup(remote.pool.close_all)
+        if login:
+            success, role = RemoteAuthService(remote).login(login, password)
+            self.assertTrue(success, role)
+        return remote
+
+
+class ConnectionsTest(ServerTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        assert cls.db.add_flight('Test Air', 'Москва', 'Санкт-Петербург', f'{DAY} 08:00', f'{DAY} 09:30', 4000)
+        assert cls.db.add_flight('Test Air', 'Санкт-Петербург', 'Казань', f'{DAY} 11:00', f'{DAY} 13:00', 3000)
+
+    def test_remote_connections_match_local(self):
+        remote = self.client()
+        local = self.db.search_connections('Москва', 'Казань', DAY, max_stops=1)
+        found = remote.search_connections('Москва', 'Казань', DAY, max_stops=1)
+        self.assertEqual(found, local)
+        self.assertTrue(any(len(route) == 2 for _, _, route in found[0]))
+
+
+class AccountTest(ServerTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        assert cls.db.add_flight('Test Air', 'Москва', 'Казань', f'{DAY} 12:00', f'{DAY} 14:00', 5000)
+
+    def test_legacy_hash_is_replaced_by_writer(self):
+        self.assertEqual(self.db.register_user('legacy', 'legacy@example.com', 'Secret123'),
+                         (True, "Регистрация успешна"))
+        salt = os.urandom(32)
+        with self.db.pool.transaction() as conn:
+            conn.execute('UPDATE users SET password = ?, salt = ? WHERE login = ?',
+                         (PasswordHasher.legacy_hash('Secret123', salt), salt, 'legacy'))
+        threads = self.record_threads('replace_password_hash')
+        self.client('legacy', 'Secret123')
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('booking-write'))
+        self.assertTrue(self.db.get_password_record('legacy')[0].startswith('scrypt$1024$'))
+
+    def record_threads(self, name):
+        threads = []
+        method = getattr(self.db, name)
+
+        def recording(*args):
+            threads.append(threading.current_thread().name)
+            return method(*args)
+
+        setattr(self.db, name, recording)
+        self.addCleanup(delattr, self.db, name)
+        return threads
+
+    def test_register_hashes_on_reader_and_inserts_on_writer(self):
+        hashing = self.record_threads('hash_password')
+        inserting = self.record_threads('insert_user')
+        auth = RemoteAuthService(self.client())
+        self.assertEqual(auth.register('remote1', 'remote1@example.com', 'Secret123'), (True, "Регистрация успешна"))
+        self.assertEqual(auth.register('remote1', 'other@example.com', 'Secret123'),
+                         (False, "Пользователь с таким логином уже существует"))
+        self.assertTrue(all(name.startswith('booking-read') for name in hashing), hashing)
+        self.assertEqual(len(inserting), 2)
+        self.assertTrue(all(name.startswith('booking-write') for name in inserting), inserting)
+        self.client('remote1', 'Secret123')
+
+    def test_purchase(self):
+        remote = self.client('admin', 'admin123')
+        outbound, _ = remote.search_tickets('Москва', 'Казань', DAY, passenger_count=2)
+        flight_id = next(row[0] for row in outbound if row[8].startswith('12:00'))
+        before = remote.count_user_tickets(None)
+        passengers = [{'name': f'Пассажир {i}', 'email': f'p{i}@example.com', 'phone': '+70000000000'}
+                      for i in range(2)]
+        success, message, seats = remote.purchase_tickets_batch(flight_id, None, passengers)
+        self.assertTrue(success, message)
+        self.assertEqual(len(seats), 2)
+        self.assertEqual(remote.count_user_tickets(None), before + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import unittest
+
+from excel_export import PROGRESS_STEP, ExportCancelled, export_tickets
+from tests import DatabaseTestCase
+
+
+class ExcelExportTest(DatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_id = cls.db.get_user_id('admin')
+        with cls.db.pool.connection() as conn:
+            flight_ids = [row[0] for row in conn.execute('SELECT FlightID FROM Flights LIMIT 30')]
+        passengers = [{'name': f'Пассажир {n}', 'email': 'p@example.com', 'phone': '+70000000000'}
+                      for n in range(PROGRESS_STEP // 20)]
+        for flight_id in flight_ids:
+            success, message, _ = cls.db.purchase_tickets_batch(flight_id, cls.user_id, passengers)
+            assert success, message
+        cls.tickets = len(flight_ids) * len(passengers)
+
+    def setUp(self):
+        self.export_path = os.path.join(self.workdir, 'tickets.xlsx')
+        if os.path.exists(self.export_path):
+            os.remove(self.export_path)
+
+    def test_export_writes_all_tickets(self):
+        import openpyxl
+
+        progress = []
+        self.assertEqual(export_tickets(self.db, self.user_id, self.export_path, progress.append), self.tickets)
+        self.assertEqual(progress[-1], 100)
+        wb = openpyxl.load_workbook(self.export_path, read_only=True)
+        self.assertEqual(sum(1 for _ in wb.active.iter_rows()), self.tickets + 1)
+        wb.close()
+
+    def test_cancel_while_writing_leaves_no_file(self):
+        with self.assertRaises(ExportCancelled):
+            export_tickets(self.db, self.user_id, self.export_path, cancelled=lambda: True)
+        self.assertFalse(os.path.exists(self.export_path))
+
+    def test_cancel_during_save_removes_file(self):
+        checks = []
+
+        def cancelled():
+            # Отмена приходит, пока книга сохраняется: все проверки в цикле уже пройдены
+            checks.append(1)
+            return len(checks) > self.tickets // PROGRESS_STEP
+
+        with self.assertRaises(ExportCancelled):
+            export_tickets(self.db, self.user_id, self.export_path, cancelled=cancelled)
+        self.assertFalse(os.path.exists(self.export_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from flight_import import ImportFailed, import_flights
+from tests import TempDirTestCase
+
+HEADER = ('airline', 'from_city', 'to_city', 'departure', 'arrival', 'price')
+
+
+def schedule(count):
+    for n in range(count):
+        day = 1 + n % 28
+        yield ('Import Air', 'Москва', 'Сочи', f'2032-03-{day:02d} {6 + n % 12:02d}:00',
+               f'2032-03-{day:02d} {8 + n % 12:02d}:30', 1000 + n)
+
+
+class FlightImportTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = self.open_database()
+
+    def imported_flights(self):
+        with self.db.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM Flights WHERE DepartureDate LIKE '2032-03-%'").fetchone()[0]
+
+    def test_import_with_header_and_rejects(self):
+        rows = [HEADER, *schedule(30), ('Import Air', 'Москва', '', '2032-03-01 10:00', '2032-03-01 12:00', 1)]
+        report = import_flights(self.db, rows, chunk_size=8)
+        self.assertEqual((report['imported'], report['rejected'], report['cancelled']), (30, 1, False))
+        self.assertEqual(report['errors'][0][0], 32)
+        self.assertEqual(self.imported_flights(), 30)
+        self.assertEqual(len(self.db.search_tickets('Москва', 'Сочи', '2032-03-01')[0]), 2)
+
+    def test_cancel_stops_between_chunks(self):
+        progress = []
+        report = import_flights(self.db, schedule(100), progress.append, chunk_size=10,
+                                cancelled=lambda: len(progress) >= 3)
+        self.assertTrue(report['cancelled'])
+        self.assertEqual(report['imported'], 30)
+        self.assertEqual(self.imported_flights(), 30)
+
+    def test_failure_reports_committed_chunks(self):
+        def broken_file():
+            yield from schedule(25)
+            raise OSError("файл недоступен")
+
+        with self.assertRaises(ImportFailed) as raised:
+            import_flights(self.db, broken_file(), chunk_size=10)
+        self.assertEqual(raised.exception.imported, 20)
+        self.assertIn('20', str(raised.exception))
+        self.assertEqual(self.imported_flights(), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import sqlite3
+import unittest
+
+from database import Database
+from tests import TempDirTestCase
+
+
+class MigrationsTest(TempDirTestCase):
+    def open(self):
+        return self.open_database()
+
+    def raw(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def indexes(self):
+        return {name for name, in self.raw("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    def test_new_database_is_current(self):
+        db = self.open()
+        self.assertEqual(db.schema_version(), Database.SCHEMA_VERSION)
+        self.assertTrue({'idx_flights_route_date', 'idx_tickets_flight', 'idx_purchased_user'} <= self.indexes())
+
+    def test_database_without_sample_data(self):
+        db = self.open_database(seed_sample=False)
+        self.assertEqual(db.schema_version(), Database.SCHEMA_VERSION)
+        self.assertEqual(self.raw('SELECT COUNT(*) FROM Flights')[0][0], 0)
+
+    def test_current_database_runs_no_steps(self):
+        self.open()
+        flights = self.raw('SELECT COUNT(*) FROM Flights')[0][0]
+        self.assertEqual(self.open().migrate(), Database.SCHEMA_VERSION)
+        self.assertEqual(self.raw('SELECT COUNT(*) FROM Flights')[0][0], flights)
+
+    def test_legacy_database_keeps_data(self):
+        """База без версии схемы (до миграций) получает индексы, данные сохраняются"""
+        self.open().pool.close_all()
+        flights = self.raw('SELECT COUNT(*) FROM Flights')[0][0]
+        conn = sqlite3.connect(self.path)
+        for index in ('idx_flights_route_date', 'idx_tickets_flight', 'idx_purchased_user'):
+            conn.execute(f'DROP INDEX {index}')
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+        conn.close()
+
+        db = self.open()
+        self.assertEqual(db.schema_version(), Database.SCHEMA_VERSION)
+        self.assertIn('idx_flights_route_date', self.indexes())
+        self.assertEqual(self.raw('SELECT COUNT(*) FROM Flights')[0][0], flights)
+        self.assertEqual(self.raw("SELECT COUNT(*) FROM users WHERE login = 'admin'")[0][0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import unittest
+
+from database import PasswordHasher, configured_hasher
+from tests import TempDirTestCase
+
+FAST_COST = 2 ** 10
+
+
+class PasswordHasherTest(unittest.TestCase):
+    def setUp(self):
+        self.hasher = PasswordHasher(cost=FAST_COST)
+        self.salt = os.urandom(32)
+
+    def test_hash_format(self):
+        algorithm, cost, digest = self.hasher.hash('secret', self.salt).split('$')
+        self.assertEqual((algorithm, int(cost)), ('scrypt', FAST_COST))
+        self.assertEqual(len(bytes.fromhex(digest)), 64)
+
+    def test_verify(self):
+        stored = self.hasher.hash('secret', self.salt)
+        self.assertTrue(self.hasher.verify(stored, self.salt, 'secret'))
+        self.assertFalse(self.hasher.verify(stored, self.salt, 'Secret'))
+        self.assertFalse(self.hasher.verify('scrypt$bad$00', self.salt, 'secret'))
+
+    def test_legacy_hash_verifies_and_needs_rehash(self):
+        legacy = PasswordHasher.legacy_hash('secret', self.salt)
+        self.assertTrue(self.hasher.verify(legacy, self.salt, 'secret'))
+        self.assertTrue(self.hasher.needs_rehash(legacy))
+        self.assertTrue(self.hasher.needs_rehash(PasswordHasher(cost=FAST_COST * 2).hash('secret', self.salt)))
+        self.assertFalse(self.hasher.needs_rehash(self.hasher.hash('secret', self.salt)))
+
+    def test_pbkdf2(self):
+        hasher = PasswordHasher('pbkdf2_sha256', 1000)
+        stored = hasher.hash('secret', self.salt)
+        self.assertTrue(stored.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.hasher.verify(stored, self.salt, 'secret'))
+
+
+class StoredPasswordsTest(TempDirTestCase):
+    def open(self, hasher):
+        return self.open_database(hasher=hasher)
+
+    def stored_password(self, db, login):
+        return db.get_password_record(login)[0]
+
+    def test_login_upgrades_legacy_hash(self):
+        db = self.open(PasswordHasher(cost=FAST_COST))
+        self.assertEqual(db.register_user('user1', 'user1@example.com', 'secret'), (True, "Регистрация успешна"))
+        salt = os.urandom(32)
+        with db.pool.transaction() as conn:
+            conn.execute('UPDATE users SET password = ?, salt = ? WHERE login = ?',
+                         (PasswordHasher.legacy_hash('secret', salt), salt, 'user1'))
+
+        self.assertIsNone(db.check_credentials('user1', 'wrong'))
+        self.assertNotIn('$', self.stored_password(db, 'user1'))
+        self.assertEqual(db.check_credentials('user1', 'secret'), 'user')
+        self.assertTrue(self.stored_password(db, 'user1').startswith(f'scrypt${FAST_COST}$'))
+        self.assertEqual(db.check_credentials('user1', 'secret'), 'user')
+
+    def test_configured_cost_is_calibrated_once_and_shared(self):
+        hasher = configured_hasher(self.path, target_ms=1)
+        self.assertEqual(hasher.algorithm, 'scrypt')
+        # Второй процесс получает сохраненную стоимость, а не калибрует заново
+        self.assertEqual(configured_hasher(self.path, target_ms=10 ** 6).cost, hasher.cost)
+
+        db = self.open(hasher)
+        self.assertTrue(self.stored_password(db, 'admin').startswith(f'scrypt${hasher.cost}$'))
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute("SELECT value FROM settings WHERE name = 'password_kdf'").fetchone()[0],
+                         f'scrypt${hasher.cost}')
+        conn.close()
+
+    def test_explicit_cost_replaces_stored(self):
+        configured_hasher(self.path, cost=FAST_COST)
+        self.assertEqual(configured_hasher(self.path, cost=FAST_COST * 4).cost, FAST_COST * 4)
+        self.assertEqual(configured_hasher(self.path).cost, FAST_COST * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
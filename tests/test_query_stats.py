@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+import time
+import unittest
+
+from query_stats import InstrumentedConnection, QueryStats
+from tests import TempDirTestCase
+
+SLOW_SQL = 'SELECT slow(value) FROM numbers ORDER BY value'
+
+
+class SlowQueryLogTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_path = os.path.join(self.workdir, 'slow.log')
+        self.stats = QueryStats(slow_ms=50, slow_log=self.log_path)
+        self.conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+        self.addCleanup(self.conn.close)
+        # Каждая строка результата вычисляется ~5 мс, то есть при выборке, а не в execute
+        self.conn.create_function('slow', 1, lambda value: time.sleep(0.005) or value)
+        self.conn.execute('CREATE TABLE numbers (value INTEGER)')
+        self.conn.executemany('INSERT INTO numbers VALUES (?)', [(i,) for i in range(20)])
+        self.conn.stats = self.stats
+
+    def logged(self):
+        with open(self.log_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def statement(self, sql):
+        return next(item for item in self.stats.snapshot()['statements'] if item['sql'] == sql)
+
+    def test_slow_select_is_logged_with_returned_rows(self):
+        rows = self.conn.execute(SLOW_SQL).fetchall()
+        self.assertEqual(len(rows), 20)
+        entry, = self.logged()
+        self.assertEqual(entry['sql'], SLOW_SQL)
+        self.assertEqual(entry['rows'], 20)
+        self.assertGreaterEqual(entry['ms'], 90)
+        self.assertEqual(self.statement(SLOW_SQL)['rows'], 20)
+
+    def test_iteration_and_early_close(self):
+        self.assertEqual(sum(1 for _ in self.conn.execute(SLOW_SQL)), 20)
+        cursor = self.conn.execute(SLOW_SQL)
+        cursor.fetchmany(3)
+        cursor.close()
+        first, second = self.logged()
+        self.assertEqual(first['rows'], 20)
+        self.assertEqual(second['rows'], 3)
+        self.assertEqual(self.statement(SLOW_SQL)['count'], 2)
+
+    def test_time_between_fetches_is_not_counted(self):
+        cursor = self.conn.execute('SELECT value FROM numbers')
+        for _ in cursor:
+            time.sleep(0.01)
+        self.assertEqual(self.logged() if os.path.exists(self.log_path) else [], [])
+        self.assertEqual(self.statement('SELECT value FROM numbers')['rows'], 20)
+
+
+class SlowQueryParamsTest(TempDirTestCase):
+    """Журнал медленных запросов не содержит значений параметров без явного log_params"""
+
+    SQL = 'UPDATE users SET password = ?, salt = ? WHERE login = ?'
+    PARAMS = ('scrypt$16384$' + 'ab' * 32, b'\x01' * 32, 'user1')
+
+    def log_update(self, **options):
+        log_path = os.path.join(self.workdir, 'slow.log')
+        conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+        self.addCleanup(conn.close)
+        conn.execute('CREATE TABLE users (login TEXT, password TEXT, salt BLOB)')
+        conn.stats = QueryStats(slow_ms=0, slow_log=log_path, **options)
+        conn.execute(self.SQL, self.PARAMS)
+        with open(log_path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_values_are_redacted_by_default(self):
+        text = self.log_update()
+        self.assertNotIn('ab' * 32, text)
+        self.assertNotIn('user1', text)
+        entry = json.loads(text)
+        self.assertEqual(entry['params'], ['str', 'bytes', 'str'])
+        self.assertIn('plan', entry)
+
+    def test_values_are_logged_on_request(self):
+        self.assertIn('ab' * 32, self.log_update(log_params=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from tests import TempDirTestCase
+
+
+class ReferenceDataTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = self.open_database()
+        self.refreshes = 0
+        refresh = self.db.refdata.refresh
+
+        def counting_refresh():
+            self.refreshes += 1
+            refresh()
+
+        self.db.refdata.refresh = counting_refresh
+
+    def test_aliases_resolve_to_city_airports(self):
+        moscow = sorted(self.db.airports_for_place('Москва'))
+        self.assertEqual(sorted(self.db.airports_for_place('москва')), moscow)
+        self.assertEqual(len(self.db.airports_for_place('svo')), 1)
+        self.assertIn(self.db.airports_for_place('SVO')[0], moscow)
+
+    def test_mistyped_names_do_not_reload_on_every_search(self):
+        self.db.airports_for_place('Москва')
+        for text in ('Моск', 'москв', 'Мсква', 'Питер', 'Моск'):
+            self.assertEqual(self.db.search_tickets(text, 'Сочи', '2031-01-01'), ([], []))
+        self.assertLessEqual(self.refreshes, 1)
+
+    def test_city_from_another_process_found_after_interval(self):
+        other = self.open_database()
+        self.assertTrue(other.add_flight('Test Air', 'Тверь', 'Сочи', '2031-01-01 08:00', '2031-01-01 11:00', 100))
+
+        self.db.refdata.refreshed_at = None  # интервал догрузки истек
+        self.assertTrue(self.db.airports_for_place('Тверь'))
+        outbound, _ = self.db.search_tickets('Тверь', 'Сочи', '2031-01-01')
+        self.assertEqual(len(outbound), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
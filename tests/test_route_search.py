@@ -0,0 +1,44 @@
+import threading
+import unittest
+
+from tests import DatabaseTestCase
+
+DAY = '2031-04-20'
+
+
+class RouteGraphTest(DatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        assert cls.db.add_flight('Test Air', 'Москва', 'Санкт-Петербург', f'{DAY} 08:00', f'{DAY} 09:30', 4000)
+        cls.graph = cls.db.routes
+        cls.moscow = cls.db.airports_for_place('Москва')
+        cls.kazan = cls.db.airports_for_place('Казань')
+
+    def test_search_does_not_hold_the_lock(self):
+        self.graph.ensure_loaded()
+        done = threading.Event()
+        results = []
+
+        def search():
+            results.append(self.graph.search(self.moscow, self.kazan, DAY))
+            done.set()
+
+        with self.graph._lock:
+            threading.Thread(target=search, daemon=True).start()
+            self.assertTrue(done.wait(5), "поиск ждал блокировки графа")
+
+    def test_add_flight_keeps_search_snapshot(self):
+        flights, legs, incoming = self.graph.ensure_loaded()
+        before = {origin: {destination: (list(times), list(ids)) for destination, (times, ids) in pairs.items()}
+                  for origin, pairs in legs.items()}
+        self.assertTrue(self.db.add_flight('Test Air', 'Санкт-Петербург', 'Казань',
+                                           f'{DAY} 11:00', f'{DAY} 13:00', 3000))
+        self.assertEqual({origin: {destination: (list(times), list(ids)) for destination, (times, ids) in pairs.items()}
+                          for origin, pairs in legs.items()}, before)
+        found = self.graph.search(self.moscow, self.kazan, DAY)
+        self.assertTrue(any(len(path) == 2 for _, _, path in found))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import sample_data
+
+START = datetime(2030, 1, 1)
+DAYS = 30
+
+
+class ScheduleTest(unittest.TestCase):
+    """Масштабированное расписание покрывает весь горизонт и все маршруты"""
+
+    def flights(self, count):
+        rng = random.Random(1)
+        _, _, network = sample_data.build_network(rng)
+        return network, list(sample_data.schedule(rng, network, START, DAYS, count))
+
+    def test_natural_schedule(self):
+        network, rows = self.flights(None)
+        self.assertEqual({row[:3] for row in rows}, {route[:3] for route in network})
+
+    def test_smaller_schedule_spans_all_days(self):
+        network, natural = self.flights(None)
+        for count in (len(network), len(natural) // 10, len(natural) - 1, len(natural) * 3):
+            _, rows = self.flights(count)
+            self.assertEqual(len(rows), count)
+            days = {row[3][:10] for row in rows}
+            self.assertIn(START.strftime('%Y-%m-%d'), days)
+            self.assertIn((START + timedelta(days=DAYS - 1)).strftime('%Y-%m-%d'), days)
+            if count >= len(natural) // 10:
+                self.assertEqual(len(days), DAYS, count)
+                self.assertEqual({row[:3] for row in rows}, {route[:3] for route in network}, count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from search_cache import SearchCache
+from tests import DatabaseTestCase
+
+DAY = '2031-02-10'
+
+
+class SearchCacheTest(unittest.TestCase):
+    def test_invalidate_route_drops_only_matching_airports(self):
+        cache = SearchCache()
+        cache.put(((1, 2), (3,), DAY, 'Economy', 1, 0, 50), ['moscow'])
+        cache.put(((1,), (3,), DAY, 'Economy', 1, 0, 50), ['svo'])
+        cache.put(((2,), (3,), DAY, 'Economy', 1, 0, 50), ['dme'])
+        cache.invalidate_route(1, 3, DAY)
+        self.assertIsNone(cache.get(((1, 2), (3,), DAY, 'Economy', 1, 0, 50)))
+        self.assertIsNone(cache.get(((1,), (3,), DAY, 'Economy', 1, 0, 50)))
+        self.assertEqual(cache.get(((2,), (3,), DAY, 'Economy', 1, 0, 50)), ['dme'])
+
+    def test_put_drops_rows_read_before_invalidation(self):
+        cache = SearchCache()
+        key = ((1, 2), (3,), DAY, 'Economy', 1, 0, 50)
+        generation = cache.generation(key)
+        cache.invalidate_route(2, 3, DAY)
+        cache.put(key, ['stale'], generation)
+        self.assertIsNone(cache.get(key))
+        generation = cache.generation(key)
+        cache.invalidate_route(2, 4, DAY)
+        cache.put(key, ['fresh'], generation)
+        self.assertEqual(cache.get(key), ['fresh'])
+
+    def test_put_drops_rows_read_before_clear(self):
+        cache = SearchCache()
+        key = ((1,), (3,), DAY, 'Economy', 1, 0, 50)
+        generation = cache.generation(key)
+        cache.clear()
+        cache.put(key, ['stale'], generation)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats()['stale'], 1)
+
+
+class SearchInvalidationTest(DatabaseTestCase):
+    """Покупка сбрасывает закэшированный поиск при любом написании города"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_id = cls.db.get_user_id('admin')
+        assert cls.db.add_flight('Test Air', 'Москва', 'Санкт-Петербург', f'{DAY} 09:00', f'{DAY} 10:30', 4000)
+        with cls.db.pool.connection() as conn:
+            cls.flight_id = conn.execute('SELECT MAX(FlightID) FROM Flights').fetchone()[0]
+
+    def free_seats(self, origin, destination):
+        outbound, _ = self.db.search_tickets(origin, destination, DAY, travel_class='First')
+        return {row[0]: row[11] for row in outbound}.get(self.flight_id)
+
+    def test_aliases_share_one_entry(self):
+        self.db.search_cache.clear()
+        self.free_seats('Москва', 'Санкт-Петербург')
+        hits = self.db.search_cache.stats()['hits']
+        self.free_seats('москва', 'санкт-петербург')
+        self.assertEqual(self.db.search_cache.stats()['hits'], hits + 1)
+
+    def test_purchase_invalidates_every_spelling(self):
+        spellings = [('Москва', 'Санкт-Петербург'), ('москва', 'LED'), ('SVO', 'led')]
+        before = {spelling: self.free_seats(*spelling) for spelling in spellings}
+        passengers = [{'name': 'Пассажир', 'email': 'p@example.com', 'phone': '+70000000000'}] * 2
+        success, message, _ = self.db.purchase_tickets_batch(self.flight_id, self.user_id, passengers, 'First')
+        self.assertTrue(success, message)
+        for spelling in spellings:
+            self.assertEqual(self.free_seats(*spelling), before[spelling] - 2, spelling)
+
+    def test_purchase_during_search_is_not_cached(self):
+        """Покупка, завершившаяся между чтением рейсов и записью в кэш, не оставляет старые места"""
+        self.db.search_cache.clear()
+        before = self.free_seats('Москва', 'Санкт-Петербург')
+        self.db.search_cache.clear()
+        render = self.db.render_flight
+        passengers = [{'name': 'Пассажир', 'email': 'p@example.com', 'phone': '+70000000000'}]
+
+        def render_after_purchase(row):
+            # Строки уже прочитаны; покупка другого терминала сбрасывает маршрут
+            del self.db.render_flight
+            success, message, _ = self.db.purchase_tickets_batch(self.flight_id, self.user_id, passengers, 'First')
+            self.assertTrue(success, message)
+            return render(row)
+
+        self.db.render_flight = render_after_purchase
+        self.assertEqual(self.free_seats('Москва', 'Санкт-Петербург'), before)
+        self.assertEqual(self.free_seats('Москва', 'Санкт-Петербург'), before - 1)
+
+    def test_fare_calendar_follows_new_flight(self):
+        fares = self.db.fare_calendar('казань', 'KGD', DAY, days=1)
+        self.db.add_flight('Test Air', 'Казань', 'Калининград', f'{DAY} 07:00', f'{DAY} 10:00', 1)
+        self.assertEqual(self.db.fare_calendar('Казань', 'kgd', DAY, days=1)[DAY], 1)
+        self.assertNotEqual(fares.get(DAY), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
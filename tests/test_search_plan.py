@@ -0,0 +1,40 @@
+import unittest
+
+from database import FARE_CALENDAR_QUERY
+from tests import DatabaseTestCase
+
+ROUTE_INDEX = 'USING INDEX idx_flights_route_date'
+
+
+class SearchPlanTest(DatabaseTestCase):
+    """Поиск рейсов идет по индексу маршрута и даты, а не полным просмотром Flights"""
+
+    def assert_uses_route_index(self, plan):
+        flights = [detail for detail in plan if ' f ' in f' {detail} ']
+        self.assertTrue(flights, plan)
+        for detail in flights:
+            self.assertIn(ROUTE_INDEX, detail)
+            self.assertNotIn('SCAN', detail)
+
+    def test_single_airport_route(self):
+        self.assert_uses_route_index(self.db.explain_search_plan((1,), (2,), '2030-01-01'))
+
+    def test_city_with_several_airports(self):
+        self.assert_uses_route_index(self.db.explain_search_plan((1, 2, 3), (4, 5), '2030-01-01'))
+
+    def test_fare_calendar(self):
+        query, params = self.db.search_query((1,), (2,), '2030-01-01', query=FARE_CALENDAR_QUERY)
+        with self.db.pool.connection() as conn:
+            plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+        self.assert_uses_route_index(plan)
+
+    def test_seat_counts_use_ticket_index(self):
+        plan = self.db.explain_search_plan((1,), (2,), '2030-01-01')
+        tickets = [detail for detail in plan if ' t ' in f' {detail} ']
+        self.assertTrue(tickets, plan)
+        for detail in tickets:
+            self.assertIn('idx_tickets_flight', detail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from seat_inventory import CABIN_LAYOUT, SEAT_LETTERS
+from tests import DatabaseTestCase
+
+DAY = '2031-01-05'
+FIRST_SEATS = CABIN_LAYOUT[0][1] * len(SEAT_LETTERS)
+
+
+class SeatInventoryTest(DatabaseTestCase):
+    """Места выдаются из схемы мест рейса по классам; покупка группы атомарна"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_id = cls.db.get_user_id('admin')
+
+    def setUp(self):
+        self.assertTrue(self.db.add_flight('Test Air', 'Москва', 'Сочи', f'{DAY} 10:00', f'{DAY} 12:30', 5000))
+        with self.db.pool.connection() as conn:
+            self.flight_id = conn.execute('SELECT MAX(FlightID) FROM Flights').fetchone()[0]
+
+    def passengers(self, count):
+        return [{'name': f'Пассажир {n}', 'email': f'p{n}@example.com', 'phone': '+70000000000'}
+                for n in range(count)]
+
+    def free_seats(self, travel_class):
+        with self.db.pool.connection() as conn:
+            return self.db.seats.free_seats(conn.cursor(), self.flight_id, travel_class)
+
+    def test_group_gets_seats_of_its_class(self):
+        success, _, seats = self.db.purchase_tickets_batch(self.flight_id, self.user_id, self.passengers(2), 'First')
+        self.assertTrue(success)
+        self.assertEqual(seats, ['1A', '1B'])
+        self.assertEqual(self.free_seats('First'), FIRST_SEATS - 2)
+
+        success, _, seats = self.db.purchase_tickets_batch(self.flight_id, self.user_id, self.passengers(1),
+                                                           'Business')
+        self.assertTrue(success)
+        self.assertEqual(seats, ['2A'])
+
+    def test_group_larger_than_class_buys_nothing(self):
+        with self.db.pool.connection() as conn:
+            available = conn.execute('SELECT AvailableSeats FROM Flights WHERE FlightID = ?',
+                                     (self.flight_id,)).fetchone()[0]
+        success, _, seats = self.db.purchase_tickets_batch(
+            self.flight_id, self.user_id, self.passengers(FIRST_SEATS + 1), 'First')
+        self.assertFalse(success)
+        self.assertEqual(seats, [])
+        self.assertEqual(self.free_seats('First'), FIRST_SEATS)
+        with self.db.pool.connection() as conn:
+            self.assertEqual(conn.execute('SELECT AvailableSeats FROM Flights WHERE FlightID = ?',
+                                          (self.flight_id,)).fetchone()[0], available)
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM PurchasedTickets WHERE FlightID = ?',
+                                          (self.flight_id,)).fetchone()[0], 0)
+
+    def test_cancel_returns_seat(self):
+        success, _, seats = self.db.purchase_tickets_batch(self.flight_id, self.user_id, self.passengers(1), 'First')
+        self.assertTrue(success)
+        with self.db.pool.connection() as conn:
+            ticket_id = conn.execute('SELECT TicketID FROM PurchasedTickets WHERE FlightID = ? AND SeatNumber = ?',
+                                     (self.flight_id, seats[0])).fetchone()[0]
+        self.assertEqual(self.db.cancel_ticket(ticket_id, self.user_id), (True, "Билет отменен"))
+        self.assertEqual(self.free_seats('First'), FIRST_SEATS)
+
+        # Освободившееся место выдается снова, в том числе после сброса кэша схемы
+        self.db.seats.invalidate()
+        success, _, again = self.db.purchase_tickets_batch(self.flight_id, self.user_id, self.passengers(1), 'First')
+        self.assertEqual(again, seats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+from PySide6.QtCore import QAbstractTableModel, QEvent, QModelIndex, QRect, Qt, Signal
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtWidgets import QStyle, QStyledItemDelegate
+
+
+class TicketsTableModel(QAbstractTableModel):
+    """Модель результатов поиска поверх кортежей из Database.search_tickets.
+
+    Строки хранятся как есть, текст ячеек формируется только при отрисовке,
+    поэтому стоимость отображения зависит от числа видимых строк, а не от
+    размера результата.
+    """
+    HEADERS = ["Авиакомпания", "Откуда", "Куда", "Дата вылета", "Время вылета", "Время прилета", "Цена", "Действия"]
+    ACTION_COLUMN = 7
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            ticket = self.rows[index.row()]
+            column = index.column()
+            if column == 0:
+                return ticket[1]
+            if column == 1:
+                return f"{ticket[3]} ({ticket[4]})"
+            if column == 2:
+                return f"{ticket[5]} ({ticket[6]})"
+            if column in (3, 4, 5):
+                return ticket[column + 4]
+            if column == 6:
+                return f"{ticket[10]:.2f} ₽"
+            return None
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def ticket(self, row):
+        return self.rows[row]
+
+
+class BuyButtonDelegate(QStyledItemDelegate):
+    """Рисует кнопку "Купить" в ячейке вместо отдельного виджета на каждую строку"""
+    clicked = Signal(int)
+
+    BUTTON_WIDTH = 100
+    BUTTON_HEIGHT = 30
+
+    def paint(self, painter, option, index):
+        rect = QRect(0, 0, self.BUTTON_WIDTH, self.BUTTON_HEIGHT)
+        rect.moveCenter(option.rect.center())
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#5e5386" if hovered else "#4e4376"))
+        painter.drawRoundedRect(rect, 4, 4)
+        painter.setPen(QColor("white"))
+        painter.drawText(rect, Qt.AlignCenter, "Купить")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            rect = QRect(0, 0, self.BUTTON_WIDTH, self.BUTTON_HEIGHT)
+            rect.moveCenter(option.rect.center())
+            if rect.contains(event.position().toPoint()):
+                self.clicked.emit(index.row())
+                return True
+        return False